@@ -8,6 +8,7 @@ from flask_socketio import SocketIO
 from config import Config, logger
 from database.database import migrate_database
 from parsers.log import process_logs
+from parsers.log_follower import start_log_follower
 from routes import register_routes
 from routes.main_routes import initialize_proxy_detection
 from routes.stats_routes import realtime_data_thread
@@ -78,16 +79,24 @@ def setup_scheduler_tasks(scheduler):
         has_updates, messages = has_remote_commits_with_messages(repo_path)
         set_commit_notifications(has_updates, messages)
 
-    @scheduler.task("interval", id="do_job_1", seconds=30, misfire_grace_time=900)
-    def init_scheduler():
+    if Config.LOG_INGEST_DAEMON:
+        logger.info("Log ingestion runs in the squidstats-ingest daemon")
+    elif Config.LOG_FOLLOW:
         log_file = os.getenv("SQUID_LOG", "/var/log/squid/access.log")
-        logger.info(f"Development scheduler for file log: {log_file}")
+        logger.info(f"Following log file continuously: {log_file}")
+        start_log_follower(log_file)
+    else:
+
+        @scheduler.task("interval", id="do_job_1", seconds=30, misfire_grace_time=900)
+        def init_scheduler():
+            log_file = os.getenv("SQUID_LOG", "/var/log/squid/access.log")
+            logger.info(f"Development scheduler for file log: {log_file}")
 
-        if not os.path.exists(log_file):
-            logger.error(f"Log file not found: {log_file}")
-            return
-        else:
-            process_logs(log_file)
+            if not os.path.exists(log_file):
+                logger.error(f"Log file not found: {log_file}")
+                return
+            else:
+                process_logs(log_file)
 
     @scheduler.task("interval", id="cleanup_metrics", hours=1, misfire_grace_time=3600)
     def cleanup_old_metrics():
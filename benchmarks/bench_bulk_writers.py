@@ -0,0 +1,84 @@
+"""Measure the ingester's log row writers on the configured database.
+
+Usage: python benchmarks/bench_bulk_writers.py [rows] [batch]
+
+Writes ``rows`` log rows in transactions of ``batch`` rows with the former
+ORM path (bulk_insert_mappings) and with every bulk writer the backend
+supports. Runs on a scratch SQLite file by default; set DATABASE_TYPE and
+DATABASE_STRING_CONNECTION to time a local PostgreSQL or MariaDB instance.
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import report, setup_environment
+
+
+def log_rows(count: int, start: datetime) -> list[dict]:
+    return [
+        {
+            "user_id": index % 500 + 1,
+            "url": f"http://site{index % 5000}.example.com/path/{index % 17}",
+            "domain_rev": f"com.example.site{index % 5000}",
+            "category_id": None,
+            "blacklisted": index % 100 == 0,
+            "response": 200,
+            "request_count": 1,
+            "data_transmitted": 1000 + index % 5000,
+            "created_at": start + timedelta(milliseconds=index),
+        }
+        for index in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    setup_environment()
+
+    from database.bulk_writers import (
+        BULK_WRITERS,
+        BulkWriter,
+        CopyWriter,
+        MultiRowInsertWriter,
+    )
+    from database.database import get_dynamic_models, get_session
+
+    db_type = os.getenv("DATABASE_TYPE", "SQLITE").upper()
+    candidates = {BulkWriter, BULK_WRITERS.get(db_type, BulkWriter)}
+    if db_type != "SQLITE":
+        candidates.add(MultiRowInsertWriter)
+    if db_type in ("POSTGRESQL", "POSTGRES"):
+        candidates.add(CopyWriter)
+    rows = log_rows(count, datetime.now().replace(hour=0, minute=0))
+
+    def orm_write(session, log_model, chunk):
+        session.bulk_insert_mappings(log_model, chunk)
+
+    writers = [("bulk_insert_mappings (ORM)", orm_write)]
+    for writer_class in sorted(candidates, key=lambda cls: cls.name):
+        writer = writer_class()
+        writers.append(
+            (
+                f"{writer.name} writer",
+                lambda session, log_model, chunk, writer=writer: writer.write(
+                    session, log_model.__table__, chunk
+                ),
+            )
+        )
+
+    for offset, (name, write) in enumerate(writers):
+        _, log_model = get_dynamic_models(f"2000010{offset + 1}")
+        session = get_session()
+        start = time.perf_counter()
+        for index in range(0, count, batch):
+            write(session, log_model, rows[index : index + batch])
+            session.commit()
+        report(f"{name} [{db_type}]", count, time.perf_counter() - start, "rows")
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Measure dashboard query latency on SQLite while the ingester is writing.
+
+Usage: python benchmarks/bench_concurrency.py [lines] [readers]
+
+Runs twice, once with the default SQLite settings (WAL, synchronous=NORMAL,
+large page cache, mmap) and once with SQLite's stock rollback journal. Each
+run ingests ``lines`` access.log lines in a separate process while
+``readers`` threads keep running the /reports and /logs queries through
+the read-only engine, then reports the ingest rate and the query latencies.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from common import report, setup_environment, write_access_log
+
+SCRIPT = str(Path(__file__).resolve())
+
+MODES = {
+    "tuned": {},
+    "untuned": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_CACHE_SIZE_MB": "2",
+        "SQLITE_MMAP_SIZE_MB": "0",
+    },
+}
+
+
+def ingest(log_file: str):
+    from parsers.log import process_logs
+
+    process_logs(log_file, max_seconds=0)
+
+
+def reader(stop: threading.Event, latencies: list, errors: list):
+    from database.database import (
+        get_dynamic_models,
+        get_read_session,
+        get_table_suffix,
+    )
+    from services.fetch_data_logs import get_users_logs
+    from services.get_reports import get_important_metrics
+
+    date_suffix = get_table_suffix()
+    user_model, log_model = get_dynamic_models(date_suffix)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            db = get_read_session()
+            try:
+                get_important_metrics(db, user_model, log_model)
+            finally:
+                db.close()
+            # get_users_logs closes the session it is given
+            get_users_logs(get_read_session(), date_suffix, 1)
+        except Exception as e:
+            errors.append(e)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def run(label: str, lines: int, readers: int):
+    workdir = setup_environment()
+    log_file = write_access_log(workdir / "access.log", lines, clients=500)
+
+    from parsers.log import process_logs
+
+    # Create today's tables before the readers start
+    process_logs(str(log_file), max_seconds=0, max_lines=1000)
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    errors: list[Exception] = []
+    threads = [
+        threading.Thread(target=reader, args=(stop, latencies, errors))
+        for _ in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, SCRIPT, "--ingest", str(log_file)], check=True, cwd=workdir
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    report(f"ingest [{label}]", lines - 1000, elapsed)
+    if latencies:
+        latencies.sort()
+        print(
+            f"{'  report queries':<40} {len(latencies):>10} runs"
+            f"  p50 {statistics.median(latencies) * 1000:>8.1f}ms"
+            f"  p95 {latencies[int(len(latencies) * 0.95)] * 1000:>8.1f}ms"
+            f"  max {latencies[-1] * 1000:>8.1f}ms"
+        )
+    print(f"{'  failed queries':<40} {len(errors):>10}")
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--ingest":
+        ingest(sys.argv[2])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    for label, settings in MODES.items():
+        subprocess.run(
+            [sys.executable, SCRIPT, "--mode", label, str(lines), str(readers)],
+            check=True,
+            env={**os.environ, **settings},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure get_dynamic_model with a year of daily tables in the database.
+
+Usage: python benchmarks/bench_dynamic_models.py [days] [requests]
+
+Creates user_/log_YYYYMMDD for ``days`` days and times the model lookups
+of one /get-logs-by-date request, first with the former automap reflection
+of the whole database and then through the cached declarative models
+(cold first lookup and warm requests).
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+
+from common import report, setup_environment
+
+
+def automap_model(db, full_table_name):
+    """The lookup get_dynamic_model used to do on every call."""
+    from sqlalchemy import inspect
+    from sqlalchemy.ext.automap import automap_base
+
+    if not inspect(db.get_bind()).has_table(full_table_name):
+        return None
+    Base = automap_base()
+    Base.prepare(autoload_with=db.get_bind())
+    return getattr(Base.classes, full_table_name, None)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    setup_environment()
+
+    from database.database import create_dynamic_tables, get_engine, get_session
+    from services.fetch_data_logs import get_dynamic_model
+
+    engine = get_engine()
+    start = time.perf_counter()
+    suffixes = [
+        (date.today() - timedelta(days=offset)).strftime("%Y%m%d")
+        for offset in range(days)
+    ]
+    for suffix in suffixes:
+        create_dynamic_tables(engine, suffix)
+    report("create daily tables", days, time.perf_counter() - start, "days")
+
+    db = get_session()
+    suffix = suffixes[days // 2]
+
+    def lookup(get_model, count: int) -> float:
+        start = time.perf_counter()
+        for _ in range(count):
+            for table_name in ("user", "log"):
+                assert get_model(table_name) is not None
+        return time.perf_counter() - start
+
+    count = max(requests // 10, 1)
+    elapsed = lookup(lambda name: automap_model(db, f"{name}_{suffix}"), count)
+    report("automap (whole database)", count, elapsed, "requests")
+
+    elapsed = lookup(lambda name: get_dynamic_model(db, name, suffix), 1)
+    report("cached models (cold)", 1, elapsed, "requests")
+    elapsed = lookup(lambda name: get_dynamic_model(db, name, suffix), requests)
+    report("cached models (warm)", requests, elapsed, "requests")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure raw-table report and audit queries without and with daily indexes.
+
+Usage: python benchmarks/bench_indexes.py [lines] [clients]
+
+Ingests one day, drops the indexes of user_/log_YYYYMMDD, times the queries
+(best of three), recreates the indexes through migrate_database and times
+them again.
+"""
+
+import sys
+import time
+from datetime import date
+
+from common import report, setup_environment, write_access_log
+
+
+def best_of(func, runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    workdir = setup_environment()
+    log_file = write_access_log(workdir / "access.log", lines, clients=clients)
+
+    from sqlalchemy import MetaData, Table
+
+    from database.database import (
+        get_engine,
+        get_session,
+        get_table_suffix,
+        migrate_database,
+    )
+    from parsers.log import process_logs
+    from services.auditoria_service import (
+        find_by_ip,
+        find_by_keyword,
+        find_by_response_code,
+    )
+    from services.fetch_data_logs import get_users_logs
+
+    process_logs(str(log_file), max_seconds=0)
+    date_suffix = get_table_suffix()
+    today = date.today().isoformat()
+
+    # The report pages read the rollups; these still scan the daily tables
+    def queries():
+        return (
+            ("get_users_logs (page 5)", lambda db: get_users_logs(db, date_suffix, 5)),
+            (
+                "find_by_keyword site7.",
+                lambda db: find_by_keyword(db, today, today, "site7."),
+            ),
+            (
+                "find_by_response_code 304",
+                lambda db: find_by_response_code(db, today, today, 304),
+            ),
+            ("find_by_ip", lambda db: find_by_ip(db, today, today, "10.0.0.7")),
+        )
+
+    def run(label: str):
+        for name, query in queries():
+            # get_users_logs closes the session it is given
+            elapsed = best_of(lambda query=query: query(get_session()))
+            report(f"{name} [{label}]", 1, elapsed, "queries")
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        for table_name in (f"user_{date_suffix}", f"log_{date_suffix}"):
+            for index in Table(table_name, MetaData(), autoload_with=conn).indexes:
+                index.drop(conn)
+    run("no indexes")
+
+    migrate_database()
+    run("indexed")
+
+
+if __name__ == "__main__":
+    main()
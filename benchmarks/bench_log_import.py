@@ -0,0 +1,56 @@
+"""Measure the parallel backlog import with a growing number of workers.
+
+Usage: python benchmarks/bench_log_import.py [lines] [max_workers]
+
+Two days of rotated logs are generated (one plain, one gzip) and imported
+into a fresh database per worker count.
+"""
+
+import gzip
+import os
+import shutil
+import sys
+import time
+
+from common import access_log_line, report, setup_environment
+
+
+def write_rotated_logs(workdir, lines: int) -> list[str]:
+    start = time.time() - 2 * 86400
+    plain = workdir / "access.log.1"
+    compressed = workdir / "access.log.2.gz"
+    with gzip.open(compressed, "wt") as f:
+        for index in range(lines // 2):
+            f.write(access_log_line(index, start=start))
+    with open(plain, "w") as f:
+        for index in range(lines // 2):
+            f.write(access_log_line(index, start=start + 86400))
+    return [str(compressed), str(plain)]
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    workdir = setup_environment()
+    paths = write_rotated_logs(workdir, lines)
+
+    import database.database as database
+    from parsers.log_import import import_logs
+
+    workers = 1
+    while workers <= max_workers:
+        database_dir = workdir / f"run-{workers}"
+        database_dir.mkdir()
+        os.environ["DATABASE_STRING_CONNECTION"] = str(database_dir / "squidstats.db")
+        database._engine = database._Session = None
+        database.dynamic_model_cache.clear()
+
+        start = time.perf_counter()
+        import_logs(paths, workers=workers, chunk_size=8 * 1024 * 1024)
+        report(f"import_logs ({workers} workers)", lines, time.perf_counter() - start)
+        shutil.rmtree(database_dir)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
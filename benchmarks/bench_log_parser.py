@@ -0,0 +1,76 @@
+"""Compare parse_log_line with the per-file parser from get_line_parser.
+
+Usage: python benchmarks/bench_log_parser.py [lines]
+
+Runs over four formats: DEFAULT (classic lines with LOG_FORMAT=DEFAULT) and,
+under LOG_FORMAT=DETAILED, classic, pipe and space-separated lines. Each
+timing is the best of five interleaved passes with the garbage collector disabled.
+"""
+
+import gc
+import sys
+import time
+
+from common import access_log_line, report, setup_environment
+
+
+def pipe_line(index: int) -> str:
+    client = index % 100
+    return (
+        f"{1714600800 + index * 0.001:.3f}|10.0.0.{client}|-|user{client}|-|GET|"
+        f"http://site{index % 500}.example.com/path|HTTP/1.1|200|{1000 + index}|"
+        f"-|text/html|HIER_DIRECT|TCP_MISS\n"
+    )
+
+
+def space_line(index: int) -> str:
+    client = index % 100
+    return (
+        f"{1714600800 + index * 0.001:.3f} 10.0.0.{client} - user{client} - GET "
+        f"TCP_MISS http://site{index % 500}.example.com/path HTTP/1.1 200 "
+        f"{1000 + index} text/html\n"
+    )
+
+
+FORMATS = (
+    ("DEFAULT", "DEFAULT", access_log_line),
+    ("DETAILED classic", "DETAILED", access_log_line),
+    ("DETAILED pipe", "DETAILED", pipe_line),
+    ("DETAILED space", "DETAILED", space_line),
+)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    workdir = setup_environment()
+
+    from parsers import log
+
+    gc.disable()
+    for name, log_format, make_line in FORMATS:
+        log.LOG_FORMAT = log_format
+        path = workdir / f"{name.replace(' ', '_')}.log"
+        with open(path, "w") as f:
+            f.writelines(make_line(index) for index in range(lines))
+        with open(path) as f:
+            sample = f.readlines()
+
+        parsers = (
+            ("parse_log_line", log.parse_log_line),
+            ("get_line_parser", log.get_line_parser(str(path))),
+        )
+        # Interleave the passes so both parsers see the same machine load
+        timings = [float("inf")] * len(parsers)
+        for _ in range(5):
+            for index, (parser_name, parse) in enumerate(parsers):
+                start = time.perf_counter()
+                parsed = sum(1 for line in sample if parse(line))
+                timings[index] = min(timings[index], time.perf_counter() - start)
+                assert parsed, f"{parser_name} parsed no {name} lines"
+        for (parser_name, _), elapsed in zip(parsers, timings):
+            report(f"{name}: {parser_name}", lines, elapsed)
+        print(f"{'':<40} speed-up {timings[0] / timings[1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
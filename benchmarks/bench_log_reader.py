@@ -0,0 +1,78 @@
+"""Compare the text-mode access.log loop with the binary LogTailReader.
+
+Usage: python benchmarks/bench_log_reader.py [size_mb]
+
+A file of roughly ``size_mb`` megabytes (default 2048) is generated once in a
+temporary directory; pass a larger size to reproduce multi-GB backlogs.
+"""
+
+import sys
+import time
+
+from common import access_log_line, report, setup_environment
+
+
+def write_sized_log(path, size_mb: int) -> int:
+    block = "".join(access_log_line(index) for index in range(10_000)).encode()
+    target = size_mb * 1024 * 1024
+    written = lines = 0
+    with open(path, "wb") as f:
+        while written < target:
+            f.write(block)
+            written += len(block)
+            lines += 10_000
+    return lines
+
+
+def text_mode(path) -> int:
+    count = position = 0
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            count += 1
+            position += len(line.encode("utf-8"))
+    return count
+
+
+def binary_reader(path) -> int:
+    from parsers.log_reader import LogTailReader, open_log
+
+    count = 0
+    with open_log(path) as f:
+        reader = LogTailReader(f)
+        for _ in reader.read_raw_lines():
+            count += 1
+        assert reader.position == path.stat().st_size
+    return count
+
+
+def binary_reader_decoded(path) -> int:
+    from parsers.log_reader import LogTailReader, open_log
+
+    count = 0
+    with open_log(path) as f:
+        for _ in LogTailReader(f).read_lines():
+            count += 1
+    return count
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    workdir = setup_environment()
+    path = workdir / "access.log"
+    lines = write_sized_log(path, size_mb)
+    print(f"Generated {size_mb} MB, {lines} lines")
+
+    for name, func in (
+        ("text mode + encode()", text_mode),
+        ("LogTailReader.read_raw_lines", binary_reader),
+        ("LogTailReader.read_lines (decoded)", binary_reader_decoded),
+    ):
+        start = time.perf_counter()
+        count = func(path)
+        elapsed = time.perf_counter() - start
+        report(name, count, elapsed)
+        print(f"{'':<40} {size_mb / elapsed:>31,.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Measure memory and latency of get_dynamic_models over a year of days.
+
+Usage: python benchmarks/bench_model_cache.py [days] [cache_size]
+
+Creates user_/log_YYYYMMDD for ``days`` days, then sweeps get_dynamic_models
+over all of them twice, once with a cache large enough for every day and
+once bounded to ``cache_size`` days, reporting the memory kept by the
+models (tracemalloc, after a full collection) and the cache metrics.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from common import report, setup_environment
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    cache_size = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    setup_environment()
+
+    from database import database
+    from database.database import create_dynamic_tables, get_dynamic_models, get_engine
+    from utils.lru import LRUCache
+
+    engine = get_engine()
+    suffixes = [
+        (date.today() - timedelta(days=offset)).strftime("%Y%m%d")
+        for offset in range(days)
+    ]
+    for suffix in suffixes:
+        create_dynamic_tables(engine, suffix)
+
+    for label, max_size in (
+        ("unbounded", days),
+        (f"bounded to {cache_size}", cache_size),
+    ):
+        database.dynamic_model_cache = LRUCache(max_size)
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        for _ in range(2):
+            for suffix in suffixes:
+                get_dynamic_models(suffix)
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        report(f"model lookups ({label})", 2 * days, elapsed, "lookups")
+        print(f"  retained {retained / 1024 / 1024:.1f} MiB, ", end="")
+        print(database.dynamic_model_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure /reports metrics latency as the day's log table grows.
+
+Usage: python benchmarks/bench_reports.py [lines_per_step] [steps]
+
+After each ingest step the rollup-based get_important_metrics is timed
+against the same metrics grouped straight from log_YYYYMMDD.
+"""
+
+import sys
+import time
+
+from common import access_log_line, report, setup_environment
+
+
+def raw_metrics(db, UserModel, LogModel):
+    from sqlalchemy import desc, func
+
+    by_user = (
+        db.query(UserModel.username, func.sum(LogModel.request_count).label("n"))
+        .join(LogModel, UserModel.id == LogModel.user_id)
+        .group_by(UserModel.username)
+        .order_by(desc("n"))
+        .limit(20)
+        .all()
+    )
+    by_data = (
+        db.query(UserModel.username, func.sum(LogModel.data_transmitted).label("d"))
+        .join(LogModel, UserModel.id == LogModel.user_id)
+        .group_by(UserModel.username)
+        .order_by(desc("d"))
+        .limit(20)
+        .all()
+    )
+    pages = (
+        db.query(LogModel.url, func.sum(LogModel.request_count).label("n"))
+        .group_by(LogModel.url)
+        .order_by(desc("n"))
+        .limit(20)
+        .all()
+    )
+    codes = (
+        db.query(LogModel.response, func.sum(LogModel.request_count))
+        .group_by(LogModel.response)
+        .all()
+    )
+    return by_user, by_data, pages, codes
+
+
+def main():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    workdir = setup_environment()
+    log_file = workdir / "access.log"
+    log_file.touch()
+
+    from database.database import get_dynamic_models, get_session, get_table_suffix
+    from parsers.log import process_logs
+    from services.get_reports import get_important_metrics
+
+    start_ts = time.time() - 3600
+    for index in range(steps):
+        with open(log_file, "a") as f:
+            for line in range(index * step, (index + 1) * step):
+                f.write(access_log_line(line, domains=5000, start=start_ts))
+        process_logs(str(log_file), max_seconds=0)
+
+        db = get_session()
+        UserModel, LogModel = get_dynamic_models(get_table_suffix())
+        rows = (index + 1) * step
+        for name, func in (
+            ("raw GROUP BY", raw_metrics),
+            ("rollups (get_important_metrics)", get_important_metrics),
+        ):
+            start = time.perf_counter()
+            func(db, UserModel, LogModel)
+            report(f"{name} @ {rows} rows", 1, time.perf_counter() - start, "pages")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
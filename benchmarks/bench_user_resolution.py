@@ -0,0 +1,36 @@
+"""Measure process_logs throughput on a log with many distinct clients.
+
+Usage: python benchmarks/bench_user_resolution.py [lines] [clients]
+"""
+
+import sys
+import time
+
+from common import report, setup_environment, write_access_log
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    workdir = setup_environment()
+    log_file = write_access_log(workdir / "access.log", lines, clients=clients)
+
+    from parsers.log import process_logs
+
+    start = time.perf_counter()
+    process_logs(str(log_file))
+    report(
+        f"process_logs ({clients} clients, cold)", lines, time.perf_counter() - start
+    )
+
+    # Second file over the same clients: every user is already in user_YYYYMMDD
+    log_file = write_access_log(workdir / "access.log.1", lines, clients=clients)
+    start = time.perf_counter()
+    process_logs(str(log_file))
+    report(
+        f"process_logs ({clients} clients, warm)", lines, time.perf_counter() - start
+    )
+
+
+if __name__ == "__main__":
+    main()
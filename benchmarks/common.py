@@ -0,0 +1,57 @@
+"""Helpers shared by the benchmark scripts.
+
+Benchmarks run against a throw-away SQLite database inside a temporary
+directory unless DATABASE_TYPE/DATABASE_STRING_CONNECTION are already set,
+so they can also be pointed at a local MariaDB or PostgreSQL instance.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+METHODS = ("GET", "POST", "CONNECT")
+STATUSES = ("TCP_MISS/200", "TCP_TUNNEL/200", "TCP_HIT/304", "TCP_DENIED/403")
+
+
+def setup_environment(prefix: str = "squidstats-bench-") -> Path:
+    """Move into a scratch directory and point the database at it."""
+    workdir = Path(tempfile.mkdtemp(prefix=prefix))
+    os.chdir(workdir)
+    os.environ.setdefault("DATABASE_TYPE", "SQLITE")
+    os.environ.setdefault("DATABASE_STRING_CONNECTION", str(workdir / "squidstats.db"))
+    os.environ.setdefault("LOG_FORMAT", "DEFAULT")
+    return workdir
+
+
+def access_log_line(
+    index: int, clients: int = 100, domains: int = 500, start: float = None
+) -> str:
+    """Build a classic (DEFAULT) squid access.log line."""
+    start = start if start is not None else time.time() - 3600
+    client = index % clients
+    status = STATUSES[index // 50 % len(STATUSES)] if index % 50 == 0 else STATUSES[0]
+    return (
+        f"{start + index * 0.001:.3f}    {index % 900 + 10} "
+        f"10.{client // 65536 % 256}.{client // 256 % 256}.{client % 256} "
+        f"{status} {1000 + index % 5000} {METHODS[index % len(METHODS)]} "
+        f"http://site{index % domains}.example.com/path/{index % 17} "
+        f"user{client} HIER_DIRECT/203.0.113.{index % 250} text/html\n"
+    )
+
+
+def write_access_log(path: Path, lines: int, **kwargs) -> Path:
+    start = time.time() - 3600
+    with open(path, "w") as f:
+        for index in range(lines):
+            f.write(access_log_line(index, start=start, **kwargs))
+    return path
+
+
+def report(name: str, count: int, elapsed: float, unit: str = "lines"):
+    rate = count / elapsed if elapsed else float("inf")
+    print(f"{name:<40} {count:>10} {unit} {elapsed:>8.2f}s {rate:>12,.0f} {unit}/s")
@@ -12,6 +12,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _data_file(variable: str, name: str) -> str:
+    """Path set in ``variable``, by default ``name`` next to the SQLite database.
+
+    Relative paths are taken from the application directory so the web app,
+    the scheduler and the ingest daemon all use the same file whatever
+    directory they start in; an empty value disables the file.
+    """
+    path = os.getenv(variable)
+    if path is not None:
+        return os.path.join(APP_DIR, path) if path else ""
+    if os.getenv("DATABASE_TYPE", "SQLITE").upper() == "SQLITE":
+        database = os.getenv("DATABASE_STRING_CONNECTION", "squidstats.db")
+        database = os.path.abspath(database.removeprefix("sqlite:///"))
+        return os.path.join(os.path.dirname(database), name)
+    return os.path.join(APP_DIR, name)
+
 
 class Config:
     SCHEDULER_API_ENABLED = True
@@ -29,3 +48,63 @@ class Config:
 
     # Log parsing mode: 'DETAILED' (current behavior) or 'DEFAULT' (classic Squid format)
     LOG_FORMAT = os.getenv("LOG_FORMAT", "DETAILED").upper()
+
+    # Ingest mode: 'RAW' (one row per log line) or 'AGGREGATE' (fold lines by
+    # user/url/response over LOG_AGGREGATE_WINDOW seconds before writing)
+    LOG_INGEST_MODE = os.getenv("LOG_INGEST_MODE", "RAW").upper()
+    LOG_AGGREGATE_WINDOW = int(os.getenv("LOG_AGGREGATE_WINDOW", "60"))
+
+    # Budget of a single process_logs run (0 lines = unlimited); keep the
+    # time below the 30 s scheduler interval
+    LOG_RUN_MAX_SECONDS = float(os.getenv("LOG_RUN_MAX_SECONDS", "25"))
+    LOG_RUN_MAX_LINES = int(os.getenv("LOG_RUN_MAX_LINES", "0"))
+
+    # Lines per commit: starts at LOG_BATCH_SIZE and adapts to the measured
+    # commit time between LOG_BATCH_MIN and LOG_BATCH_MAX; commits slower than
+    # LOG_BATCH_TARGET_SECONDS halve it
+    LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+    LOG_BATCH_MIN = int(os.getenv("LOG_BATCH_MIN", "100"))
+    LOG_BATCH_MAX = int(os.getenv("LOG_BATCH_MAX", "5000"))
+    LOG_BATCH_TARGET_SECONDS = float(os.getenv("LOG_BATCH_TARGET_SECONDS", "1.0"))
+
+    # Follow access.log continuously instead of polling it every 30 s
+    LOG_FOLLOW = os.getenv("LOG_FOLLOW", "false").lower() == "true"
+    LOG_FOLLOW_MAX_DELAY = float(os.getenv("LOG_FOLLOW_MAX_DELAY", "0.5"))
+    LOG_FOLLOW_POLL_INTERVAL = float(os.getenv("LOG_FOLLOW_POLL_INTERVAL", "1.0"))
+
+    # Leave ingestion to the squidstats-ingest daemon (./squidstats-ingest),
+    # which reports its status on INGEST_STATUS_SOCKET (by default next to the
+    # SQLite database, like LOG_SPOOL_FILE; empty disables it)
+    LOG_INGEST_DAEMON = os.getenv("LOG_INGEST_DAEMON", "false").lower() == "true"
+    INGEST_STATUS_SOCKET = _data_file("INGEST_STATUS_SOCKET", "ingest.sock")
+
+    # Batches the database cannot take are spooled here and replayed later
+    # (empty disables the spool); batches it keeps rejecting with integrity
+    # errors, or spooled batches failing LOG_SPOOL_MAX_ATTEMPTS replays, are
+    # set aside in LOG_SPOOL_FILE + ".rejected"
+    LOG_SPOOL_FILE = _data_file("LOG_SPOOL_FILE", "ingest.spool")
+    LOG_SPOOL_RETRY_SECONDS = float(os.getenv("LOG_SPOOL_RETRY_SECONDS", "5"))
+    LOG_SPOOL_MAX_ATTEMPTS = int(os.getenv("LOG_SPOOL_MAX_ATTEMPTS", "10"))
+
+    # Seconds a cached report of the current day stays valid in memory; closed
+    # days are also persisted and only dropped when their rollups change
+    REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "30"))
+
+    # Audit drill-down queries: 'UNION' (one UNION ALL over the daily tables) or
+    # 'PARALLEL' (one query per day on AUDIT_WORKERS pooled connections)
+    AUDIT_QUERY_MODE = os.getenv("AUDIT_QUERY_MODE", "UNION").upper()
+    AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", "4"))
+
+    # Seconds before the cached list of tables is read again from the database,
+    # for daily tables created by another process (0 = only on invalidation)
+    TABLE_CATALOG_REFRESH = float(os.getenv("TABLE_CATALOG_REFRESH", "60"))
+
+    # Days whose ORM models are kept in memory (least recently used are dropped)
+    DYNAMIC_MODEL_CACHE_SIZE = int(os.getenv("DYNAMIC_MODEL_CACHE_SIZE", "120"))
+
+    # SQLite connection settings; WAL lets reports read while the ingester writes
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "64"))
+    SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
@@ -0,0 +1,141 @@
+"""Append-only row writers used by the ingester, one per database backend.
+
+A writer appends a batch of homogeneous row dicts to a table through the
+caller's session, inside its open transaction, so the rows commit or roll
+back together with the read checkpoint. :func:`get_bulk_writer` picks the
+fastest path for ``DATABASE_TYPE``:
+
+- SQLite: one prepared INSERT executed for every row (``executemany``).
+- MySQL/MariaDB: multi-row ``INSERT ... VALUES (...), (...)`` statements.
+- PostgreSQL: ``COPY ... FROM STDIN`` through psycopg2 or psycopg 3.
+
+Writers never return ids; rows whose ids are needed afterwards (users,
+aggregated rows) keep going through the ORM.
+"""
+
+import io
+import os
+from datetime import date, datetime
+
+from sqlalchemy import insert
+
+
+class BulkWriter:
+    """Prepared ``executemany`` of a single INSERT; works on every backend."""
+
+    name = "executemany"
+
+    def write(self, session, table, rows: list[dict]):
+        if rows:
+            session.execute(insert(table), rows)
+
+
+class MultiRowInsertWriter(BulkWriter):
+    """``INSERT ... VALUES`` with ``chunk_size`` rows per statement."""
+
+    name = "multirow"
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self._statements: dict[tuple, str] = {}
+
+    def _statement(self, dialect, table, columns: tuple[str, ...], count: int) -> str:
+        key = (table.name, columns, count)
+        sql = self._statements.get(key)
+        if sql is None:
+            preparer = dialect.identifier_preparer
+            marker = "?" if dialect.paramstyle == "qmark" else "%s"
+            values = "(" + ", ".join([marker] * len(columns)) + ")"
+            sql = (
+                f"INSERT INTO {preparer.format_table(table)} "
+                f"({', '.join(preparer.quote(column) for column in columns)}) "
+                f"VALUES {', '.join([values] * count)}"
+            )
+            self._statements[key] = sql
+        return sql
+
+    def write(self, session, table, rows: list[dict]):
+        if not rows:
+            return
+        connection = session.connection()
+        columns = tuple(rows[0])
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start : start + self.chunk_size]
+            sql = self._statement(connection.dialect, table, columns, len(chunk))
+            params = tuple(row[column] for row in chunk for column in columns)
+            connection.exec_driver_sql(sql, params)
+
+
+def _copy_value(value) -> str:
+    """A value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return str(value)
+
+
+def copy_text(rows: list[dict], columns: tuple[str, ...]) -> str:
+    return "".join(
+        "\t".join(_copy_value(row[column]) for column in columns) + "\n" for row in rows
+    )
+
+
+class CopyWriter(BulkWriter):
+    """``COPY table (columns) FROM STDIN`` on the session's own connection."""
+
+    name = "copy"
+
+    def write(self, session, table, rows: list[dict]):
+        if not rows:
+            return
+        connection = session.connection()
+        driver = connection.dialect.driver
+        if driver not in ("psycopg2", "psycopg"):
+            # pg8000 and others: no COPY support wired in
+            super().write(session, table, rows)
+            return
+        preparer = connection.dialect.identifier_preparer
+        columns = tuple(rows[0])
+        sql = (
+            f"COPY {preparer.format_table(table)} "
+            f"({', '.join(preparer.quote(column) for column in columns)}) FROM STDIN"
+        )
+        data = copy_text(rows, columns)
+        cursor = connection.connection.cursor()
+        try:
+            if driver == "psycopg2":
+                cursor.copy_expert(sql, io.StringIO(data))
+            else:
+                with cursor.copy(sql) as copy:
+                    copy.write(data)
+        finally:
+            cursor.close()
+
+
+BULK_WRITERS = {
+    "SQLITE": BulkWriter,
+    "MYSQL": MultiRowInsertWriter,
+    "MARIADB": MultiRowInsertWriter,
+    "POSTGRESQL": CopyWriter,
+    "POSTGRES": CopyWriter,
+}
+
+
+def get_bulk_writer(db_type: str | None = None) -> BulkWriter:
+    """Writer for ``db_type`` (``DATABASE_TYPE`` by default)."""
+    db_type = (db_type or os.getenv("DATABASE_TYPE", "SQLITE")).upper()
+    return BULK_WRITERS.get(db_type, BulkWriter)()
@@ -0,0 +1,88 @@
+"""Process-wide cache of the table names of each database.
+
+Requests look daily tables up here instead of querying the database
+catalog. The list is read once per engine, kept up to date by
+``create_dynamic_tables`` and re-read every ``TABLE_CATALOG_REFRESH``
+seconds, so days created by an ingester in another process show up too.
+Call :meth:`TableCatalog.invalidate` after dropping or creating tables by
+other means.
+"""
+
+import re
+import threading
+import time
+import weakref
+
+from sqlalchemy import inspect
+
+from config import Config
+
+TABLE_CATALOG_REFRESH = getattr(Config, "TABLE_CATALOG_REFRESH", 60)
+
+_DAILY_LOG_TABLE = re.compile(r"log_(\d{8})$")
+
+
+class TableCatalog:
+    def __init__(self, refresh_seconds: float = TABLE_CATALOG_REFRESH):
+        self.refresh_seconds = refresh_seconds
+        # engine -> (loaded at, table names)
+        self._tables = weakref.WeakKeyDictionary()
+        # engine -> engine on the same database whose entry it uses
+        self._owners = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def tables(self, bind) -> frozenset[str]:
+        """Table names of the database behind ``bind`` (engine or connection)."""
+        entry = self._tables.get(self._key(bind))
+        if entry is None or (
+            self.refresh_seconds and time.monotonic() - entry[0] >= self.refresh_seconds
+        ):
+            entry = self.load(bind)
+        return entry[1]
+
+    def load(self, bind) -> tuple[float, frozenset[str]]:
+        names = frozenset(inspect(bind).get_table_names())
+        entry = (time.monotonic(), names)
+        with self._lock:
+            self._tables[self._key(bind)] = entry
+            self.loads += 1
+        return entry
+
+    def _key(self, bind):
+        return self._owners.get(bind.engine, bind.engine)
+
+    def share(self, bind, owner):
+        """Make ``bind`` use the entry of ``owner``, an engine on the same database."""
+        self._owners[bind.engine] = owner.engine
+
+    def has(self, bind, table_name: str) -> bool:
+        return table_name in self.tables(bind)
+
+    def add(self, bind, *table_names: str):
+        """Record tables this process has just created."""
+        with self._lock:
+            key = self._key(bind)
+            entry = self._tables.get(key)
+            if entry is not None:
+                self._tables[key] = (entry[0], entry[1].union(table_names))
+
+    def invalidate(self, bind=None):
+        """Forget the tables of ``bind`` (every engine if None)."""
+        with self._lock:
+            if bind is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(self._key(bind), None)
+
+    def daily_suffixes(self, bind) -> list[str]:
+        """Date suffixes that have both user_ and log_ tables, oldest first."""
+        tables = self.tables(bind)
+        return sorted(
+            match.group(1)
+            for match in map(_DAILY_LOG_TABLE.match, tables)
+            if match and f"user_{match.group(1)}" in tables
+        )
+
+
+table_catalog = TableCatalog()
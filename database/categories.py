@@ -0,0 +1,185 @@
+"""Domain categories and blacklist flags stored on every log row.
+
+The ingester tags each row at write time with the id of the social-media
+category its host belongs to (``log.category_id``) and whether it is in
+BLACKLIST_DOMAINS (``log.blacklisted``), so those reports are indexed
+equality lookups instead of URL pattern scans. Matching goes through a
+suffix trie, so its cost does not grow with the size of the lists.
+
+Stored rows follow the lists they were tagged with; when a list changes,
+:func:`retag_if_changed` (run by ``migrate_database``) tags them again.
+"""
+
+import hashlib
+import logging
+import re
+
+from sqlalchemy import MetaData, Table, bindparam, inspect, or_, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from config import Config
+from database.database import DomainCategory, get_session
+from utils.domain_matcher import DomainMatcher
+from utils.domains import normalize_domain
+from utils.social_media import SOCIAL_MEDIA_DOMAINS
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_CATEGORY = "blacklist"
+
+
+def blacklist_entries() -> list[str]:
+    value = getattr(Config, "BLACKLIST_DOMAINS", "") or ""
+    return [entry.strip() for entry in value.split(",") if entry.strip()]
+
+
+def blacklist_domains(entries: list[str]) -> list[str]:
+    """Entries matched by domain; bare words keep matching the URL text."""
+    return [entry for entry in entries if "." in entry]
+
+
+def configured_categories() -> dict[str, list[str]]:
+    categories = {name: list(domains) for name, domains in SOCIAL_MEDIA_DOMAINS.items()}
+    categories[BLACKLIST_CATEGORY] = blacklist_domains(blacklist_entries())
+    return categories
+
+
+def fingerprint(domains: list[str]) -> str:
+    normalized = sorted({normalize_domain(domain) for domain in domains} - {""})
+    return hashlib.sha256("\n".join(normalized).encode()).hexdigest()
+
+
+class DomainTagger:
+    """Maps a ``domain_rev`` value to its ``(category_id, blacklisted)`` tags."""
+
+    def __init__(self, category_ids: dict[str, int], categories: dict[str, list]):
+        self.category_ids = category_ids
+        self.categories = DomainMatcher()
+        self.blacklist = DomainMatcher()
+        for name, domains in categories.items():
+            for domain in domains:
+                if name == BLACKLIST_CATEGORY:
+                    self.blacklist.add(domain, True)
+                else:
+                    self.categories.add(domain, category_ids[name])
+        self.blacklist_fingerprint = fingerprint(categories.get(BLACKLIST_CATEGORY, []))
+        self._cache: dict[str, tuple[int | None, bool]] = {}
+
+    def tag(self, domain_rev: str) -> tuple[int | None, bool]:
+        tags = self._cache.get(domain_rev)
+        if tags is None:
+            if len(self._cache) >= 100000:
+                self._cache.clear()
+            tags = self._cache[domain_rev] = (
+                self.categories.match(domain_rev),
+                self.blacklist.match(domain_rev) is not None,
+            )
+        return tags
+
+    def tags_blacklist(self, domains: list[str]) -> bool:
+        """Whether ``log.blacklisted`` was computed from exactly ``domains``."""
+        return fingerprint(domains) == self.blacklist_fingerprint
+
+
+def load_category_ids(session, names) -> dict[str, int]:
+    """Ids of the category rows called ``names``, creating the missing ones."""
+    ids = {row.name: row.id for row in session.query(DomainCategory)}
+    missing = [name for name in names if name not in ids]
+    if missing:
+        try:
+            session.add_all(DomainCategory(name=name) for name in missing)
+            session.commit()
+        except IntegrityError:
+            # Created meanwhile by another process
+            session.rollback()
+        ids = {row.name: row.id for row in session.query(DomainCategory)}
+    return ids
+
+
+_tagger: DomainTagger | None = None
+
+
+def get_domain_tagger(session=None) -> DomainTagger:
+    global _tagger
+    if _tagger is None:
+        own_session = session is None
+        session = session or get_session()
+        try:
+            categories = configured_categories()
+            _tagger = DomainTagger(load_category_ids(session, categories), categories)
+        finally:
+            if own_session:
+                session.close()
+    return _tagger
+
+
+def retag_table(engine, table_name: str, tagger: DomainTagger) -> int:
+    """Recompute the tags of one daily log table; returns the tagged domains."""
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    if "category_id" not in table.c or "domain_rev" not in table.c:
+        return 0
+    with engine.begin() as conn:
+        conn.execute(
+            table.update()
+            .where(or_(table.c.category_id.isnot(None), table.c.blacklisted.is_(True)))
+            .values(category_id=None, blacklisted=False)
+        )
+        domains = conn.execute(
+            select(table.c.domain_rev).where(table.c.domain_rev.isnot(None)).distinct()
+        ).scalars()
+        params = []
+        for domain_rev in domains:
+            category_id, blacklisted = tagger.tag(domain_rev)
+            if category_id is not None or blacklisted:
+                params.append(
+                    {
+                        "_domain": domain_rev,
+                        "_category": category_id,
+                        "_black": blacklisted,
+                    }
+                )
+        if params:
+            conn.execute(
+                table.update()
+                .where(table.c.domain_rev == bindparam("_domain"))
+                .values(
+                    category_id=bindparam("_category"),
+                    blacklisted=bindparam("_black"),
+                ),
+                params,
+            )
+    return len(params)
+
+
+def retag_if_changed():
+    """Tag the stored rows again if a category or the blacklist changed."""
+    session = get_session()
+    try:
+        categories = configured_categories()
+        ids = load_category_ids(session, categories)
+        fingerprints = {
+            name: fingerprint(domains) for name, domains in categories.items()
+        }
+        rows = session.query(DomainCategory).filter(
+            DomainCategory.name.in_(fingerprints)
+        )
+        stale = [row for row in rows if row.fingerprint != fingerprints[row.name]]
+        if not stale:
+            return
+        logger.info(
+            f"Domain lists changed ({', '.join(row.name for row in stale)}), "
+            "retagging stored logs"
+        )
+        tagger = DomainTagger(ids, categories)
+        engine = session.get_bind()
+        for table_name in inspect(engine).get_table_names():
+            if re.match(r"log_\d{8}$", table_name):
+                retag_table(engine, table_name, tagger)
+        for row in stale:
+            row.fingerprint = fingerprints[row.name]
+        session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Error retagging stored logs: {e}")
+        session.rollback()
+    finally:
+        session.close()
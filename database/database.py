@@ -2,25 +2,39 @@ import logging
 import os
 import re
 from datetime import date, datetime
-from typing import Any
 from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 from sqlalchemy import (
     BigInteger,
+    Boolean,
     Column,
+    Date,
     DateTime,
+    Index,
     Integer,
+    MetaData,
+    SmallInteger,
     String,
+    Table,
     Text,
+    UniqueConstraint,
+    bindparam,
     create_engine,
+    event,
     func,
     inspect,
+    select,
     text,
 )
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from config import Config
+from database.catalog import table_catalog
+from utils.domains import url_domain_key
+from utils.lru import LRUCache
+
 # Cargar variables de entorno desde .env
 load_dotenv()
 
@@ -32,7 +46,20 @@ logger = logging.getLogger(__name__)
 Base = declarative_base()
 _engine = None
 _Session = None
-dynamic_model_cache: dict[str, Any] = {}
+_read_engine = None
+_ReadSession = None
+
+SQLITE_JOURNAL_MODE = getattr(Config, "SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = getattr(Config, "SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_MB = int(getattr(Config, "SQLITE_CACHE_SIZE_MB", 64))
+SQLITE_MMAP_SIZE_MB = int(getattr(Config, "SQLITE_MMAP_SIZE_MB", 256))
+SQLITE_BUSY_TIMEOUT_MS = int(getattr(Config, "SQLITE_BUSY_TIMEOUT_MS", 10000))
+
+
+# Per-day ORM models built by get_dynamic_models; every day holds its own
+# declarative registry, so the cache is bounded and evicted models are rebuilt
+# on their next use
+dynamic_model_cache = LRUCache(getattr(Config, "DYNAMIC_MODEL_CACHE_SIZE", 120))
 
 
 def get_table_suffix() -> str:
@@ -55,11 +82,35 @@ class User(DailyBase):
     created_at = Column(DateTime, default=datetime.now)
 
 
+# Host with its labels reversed (see utils.domains); byte order keeps every
+# domain and its subdomains in one index range, also on PostgreSQL
+DOMAIN_KEY_TYPE = String(255).with_variant(String(255, collation="C"), "postgresql")
+
+
+# Single-column indexes of every log_YYYYMMDD table (named ix_<table>_<column>)
+DAILY_LOG_INDEXES = (
+    "user_id",
+    "response",
+    "created_at",
+    "domain_rev",
+    "category_id",
+    "blacklisted",
+)
+
+
+def user_key_index(user_table_name: str) -> Index:
+    """Unique (username, ip) index of a user_YYYYMMDD table."""
+    return Index(f"ux_{user_table_name}_username_ip", "username", "ip", unique=True)
+
+
 class Log(DailyBase):
     __tablename__ = "log_base"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, nullable=False)
     url = Column(Text, nullable=False)
+    domain_rev = Column(DOMAIN_KEY_TYPE, index=True)
+    category_id = Column(SmallInteger, index=True)
+    blacklisted = Column(Boolean, index=True)
     response = Column(Integer, nullable=False)
     request_count = Column(Integer, default=1)
     data_transmitted = Column(BigInteger, default=0)
@@ -83,10 +134,115 @@ class DeniedLog(Base):
     method = Column(String(255), nullable=False)
     status = Column(String(255), nullable=False)
     response = Column(Integer, nullable=True)
+    request_count = Column(Integer, default=1)
+    data_transmitted = Column(BigInteger, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class UserDailyStats(Base):
+    """Requests and bytes per user and day, kept up to date by the ingester."""
+
+    __tablename__ = "rollup_user_daily"
+    __table_args__ = (UniqueConstraint("day", "username", "ip"),)
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    username = Column(String(255), nullable=False)
+    ip = Column(String(255), nullable=False)
+    request_count = Column(BigInteger, default=0)
+    data_transmitted = Column(BigInteger, default=0)
+    # Rows stored in log_YYYYMMDD; fewer than request_count when aggregating
+    log_rows = Column(BigInteger, default=0)
+
+
+class DomainDailyStats(Base):
+    """Requests and bytes per domain, user and day."""
+
+    __tablename__ = "rollup_domain_daily"
+    __table_args__ = (UniqueConstraint("day", "domain", "username"),)
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    domain = Column(String(255), nullable=False)
+    username = Column(String(255), nullable=False)
+    request_count = Column(BigInteger, default=0)
+    data_transmitted = Column(BigInteger, default=0)
+
+
+class ResponseDailyStats(Base):
+    """Requests and bytes per HTTP response code, user and day."""
+
+    __tablename__ = "rollup_response_daily"
+    __table_args__ = (UniqueConstraint("day", "response", "username"),)
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    response = Column(Integer, nullable=False)
+    username = Column(String(255), nullable=False)
+    request_count = Column(BigInteger, default=0)
+    data_transmitted = Column(BigInteger, default=0)
+
+
+class HourlyStats(Base):
+    """Requests and bytes per hour of the day and user."""
+
+    __tablename__ = "rollup_hourly"
+    __table_args__ = (UniqueConstraint("day", "hour", "username"),)
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    hour = Column(Integer, nullable=False)
+    username = Column(String(255), nullable=False)
+    request_count = Column(BigInteger, default=0)
     data_transmitted = Column(BigInteger, default=0)
+
+
+class UserDirectory(Base):
+    """Every username the ingester has seen, for the user pickers."""
+
+    __tablename__ = "user_directory"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(255), nullable=False, unique=True)
+    # Lower-cased username in byte order, so prefix searches are index ranges
+    username_key = Column(DOMAIN_KEY_TYPE, nullable=False, index=True)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+    last_ip = Column(String(255))
+
+
+# Tables written by the ingester's rollup flush
+ROLLUP_MODELS = (
+    UserDailyStats,
+    DomainDailyStats,
+    ResponseDailyStats,
+    HourlyStats,
+    UserDirectory,
+)
+
+
+class ReportCache(Base):
+    """Computed report metrics of closed days and the rollup version they saw."""
+
+    __tablename__ = "report_cache"
+    name = Column(String(64), primary_key=True)
+    day = Column(Date, primary_key=True)
+    payload = Column(Text, nullable=False)
+    # rollup_version() of the day when the payload was computed
+    version = Column(BigInteger, default=0)
     created_at = Column(DateTime, default=datetime.now)
 
 
+class DomainCategory(Base):
+    """Domain list tagged at ingest; its id is stored in log.category_id.
+
+    ``fingerprint`` identifies the domains the stored rows were tagged with;
+    a mismatch makes startup retag the daily tables. The blacklist has a row
+    too, although its rows are flagged through ``log.blacklisted``.
+    """
+
+    __tablename__ = "domain_categories"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64), nullable=False, unique=True)
+    fingerprint = Column(String(64), nullable=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
 class SystemMetrics(Base):
     __tablename__ = "system_metrics"
     id = Column(Integer, primary_key=True)
@@ -250,6 +406,36 @@ def create_database_if_not_exists():
             raise
 
 
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    """PRAGMAs run on every new SQLite connection."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+        # Negative cache_size is in KiB
+        f"PRAGMA cache_size = {-1024 * SQLITE_CACHE_SIZE_MB}",
+        f"PRAGMA mmap_size = {1024 * 1024 * SQLITE_MMAP_SIZE_MB}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # Stored in the database file; readers pick it up from there
+        pragmas.insert(0, f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    return pragmas
+
+
+def configure_sqlite(engine, read_only: bool = False):
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
 def get_engine():
     global _engine
     if _engine is not None:
@@ -257,9 +443,31 @@ def get_engine():
     create_database_if_not_exists()
     db_url = get_database_url()
     _engine = create_engine(db_url, echo=False, future=True)
+    if _engine.dialect.name == "sqlite":
+        configure_sqlite(_engine)
     return _engine
 
 
+def get_read_engine():
+    """Engine for report and audit queries.
+
+    On SQLite this is a second pool of ``query_only`` connections: with WAL
+    they read the last committed data without waiting for the ingester's
+    open transaction. Other backends use the main engine.
+    """
+    global _read_engine
+    if _read_engine is not None:
+        return _read_engine
+    engine = get_engine()
+    if engine.dialect.name != "sqlite":
+        _read_engine = engine
+        return _read_engine
+    _read_engine = create_engine(engine.url, echo=False, future=True)
+    configure_sqlite(_read_engine, read_only=True)
+    table_catalog.share(_read_engine, engine)
+    return _read_engine
+
+
 def get_session():
     global _Session
     engine = get_engine()
@@ -269,15 +477,28 @@ def get_session():
     return _Session()
 
 
+def get_read_session():
+    """Session on :func:`get_read_engine`; never use it to write."""
+    global _ReadSession
+    if _ReadSession is None:
+        # Creates the tables on first use
+        get_session().close()
+        _ReadSession = sessionmaker(bind=get_read_engine())
+    return _ReadSession()
+
+
 def table_exists(engine, table_name: str) -> bool:
-    inspector = inspect(engine)
-    return inspector.has_table(table_name)
+    return table_catalog.has(engine, table_name)
 
 
 def create_dynamic_tables(engine, date_suffix: str = None):
     LogMetadata.__table__.create(engine, checkfirst=True)
     DeniedLog.__table__.create(engine, checkfirst=True)
     SystemMetrics.__table__.create(engine, checkfirst=True)
+    for model in ROLLUP_MODELS:
+        model.__table__.create(engine, checkfirst=True)
+    ReportCache.__table__.create(engine, checkfirst=True)
+    DomainCategory.__table__.create(engine, checkfirst=True)
 
     user_table_name, log_table_name = get_dynamic_table_names(date_suffix)
 
@@ -301,6 +522,7 @@ def create_dynamic_tables(engine, date_suffix: str = None):
 
         class DynamicUser(DynamicBase):
             __tablename__ = user_table_name
+            __table_args__ = (user_key_index(user_table_name),)
             id = Column(Integer, primary_key=True)
             username = Column(String(255), nullable=False)
             ip = Column(String(255), nullable=False)
@@ -309,14 +531,18 @@ def create_dynamic_tables(engine, date_suffix: str = None):
         class DynamicLog(DynamicBase):
             __tablename__ = log_table_name
             id = Column(Integer, primary_key=True)
-            user_id = Column(Integer, nullable=False)
+            user_id = Column(Integer, nullable=False, index=True)
             url = Column(Text, nullable=False)
-            response = Column(Integer, nullable=False)
+            domain_rev = Column(DOMAIN_KEY_TYPE, index=True)
+            category_id = Column(SmallInteger, index=True)
+            blacklisted = Column(Boolean, index=True)
+            response = Column(Integer, nullable=False, index=True)
             request_count = Column(Integer, default=1)
             data_transmitted = Column(BigInteger, default=0)
-            created_at = Column(DateTime, default=datetime.now)
+            created_at = Column(DateTime, default=datetime.now, index=True)
 
         DynamicBase.metadata.create_all(engine, checkfirst=True)
+        table_catalog.add(engine, user_table_name, log_table_name)
 
 
 def get_dynamic_table_names(date_suffix: str = None) -> tuple[str, str]:
@@ -327,8 +553,9 @@ def get_dynamic_table_names(date_suffix: str = None) -> tuple[str, str]:
 
 def get_dynamic_models(date_suffix: str):
     cache_key = f"user_log_{date_suffix}"
-    if cache_key in dynamic_model_cache:
-        return dynamic_model_cache[cache_key]
+    models = dynamic_model_cache.get(cache_key)
+    if models is not None:
+        return models
 
     engine = get_engine()
     user_table_name, log_table_name = get_dynamic_table_names(date_suffix)
@@ -352,6 +579,7 @@ def get_dynamic_models(date_suffix: str):
 
     class DynamicUser(DynamicBase):
         __tablename__ = user_table_name
+        __table_args__ = (user_key_index(user_table_name),)
         id = Column(Integer, primary_key=True, autoincrement=True)
         username = Column(String(255), nullable=False)
         ip = Column(String(255), nullable=False)
@@ -360,14 +588,17 @@ def get_dynamic_models(date_suffix: str):
     class DynamicLog(DynamicBase):
         __tablename__ = log_table_name
         id = Column(Integer, primary_key=True, autoincrement=True)
-        user_id = Column(Integer, nullable=False)
+        user_id = Column(Integer, nullable=False, index=True)
         url = Column(Text, nullable=False)
-        response = Column(Integer, nullable=False)
+        domain_rev = Column(DOMAIN_KEY_TYPE, index=True)
+        category_id = Column(SmallInteger, index=True)
+        blacklisted = Column(Boolean, index=True)
+        response = Column(Integer, nullable=False, index=True)
         request_count = Column(Integer, default=1)
         data_transmitted = Column(BigInteger, default=0)
-        created_at = Column(DateTime, default=datetime.now)
+        created_at = Column(DateTime, default=datetime.now, index=True)
 
-    dynamic_model_cache[cache_key] = (DynamicUser, DynamicLog)
+    dynamic_model_cache.put(cache_key, (DynamicUser, DynamicLog))
     return DynamicUser, DynamicLog
 
 
@@ -448,10 +679,24 @@ def migrate_database():
                         logger.info(
                             f"No migration needed for {table_name}.{column_name}"
                         )
+            # Columns added after the first release
+            _add_missing_columns(conn, inspector)
             # Also check dynamic tables (user_YYYYMMDD, log_YYYYMMDD)
             _migrate_dynamic_tables(conn, inspector, db_type)
             conn.commit()
             logger.info("Database migration completed successfully")
+        # Requests read the table list from the catalog from now on
+        table_catalog.load(engine)
+        backfill_log_domains()
+        # Tag stored rows again when the category or blacklist domains changed
+        from database.categories import retag_if_changed
+
+        retag_if_changed()
+        # Fill the rollup tables for days logged before they existed
+        from database.rollups import backfill_rollups, backfill_user_directory
+
+        backfill_user_directory()
+        backfill_rollups()
     except Exception as e:
         logger.warning(
             f"Migration warning (this might be expected if already migrated): {e}"
@@ -551,6 +796,30 @@ def _migrate_column(conn, table_name, column_name, expected_spec, db_type):
         logger.error(f"Failed to migrate {table_name}.{column_name}: {e}")
 
 
+def _add_missing_columns(conn, inspector):
+    missing_columns = {
+        "denied_logs": {"request_count": "INTEGER DEFAULT 1"},
+        "rollup_user_daily": {"log_rows": "BIGINT DEFAULT 0"},
+        "report_cache": {"version": "BIGINT DEFAULT 0"},
+    }
+    for table_name, columns in missing_columns.items():
+        if not inspector.has_table(table_name):
+            continue
+        current_columns = {col["name"] for col in inspector.get_columns(table_name)}
+        for column_name, column_spec in columns.items():
+            if column_name in current_columns:
+                continue
+            try:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_spec}"
+                    )
+                )
+                logger.info(f"Added column {table_name}.{column_name}")
+            except Exception as e:
+                logger.error(f"Failed to add column {table_name}.{column_name}: {e}")
+
+
 def _migrate_dynamic_tables(conn, inspector, db_type):
     # Get all table names that match the dynamic pattern
     all_tables = inspector.get_table_names()
@@ -585,3 +854,117 @@ def _migrate_dynamic_tables(conn, inspector, db_type):
                     )
                 else:
                     logger.info(f"No migration needed for {table_name}.{column_name}")
+    # Log columns added after the first release
+    added_columns = {
+        "domain_rev": (
+            'VARCHAR(255) COLLATE "C"'
+            if db_type in ("POSTGRESQL", "POSTGRES")
+            else "VARCHAR(255)"
+        ),
+        "category_id": "SMALLINT",
+        "blacklisted": "BOOLEAN",
+    }
+    log_tables = [t for t in all_tables if re.match(r"log_\d{8}$", t)]
+    for table_name in log_tables:
+        columns = {col["name"] for col in inspector.get_columns(table_name)}
+        for column_name, column_type in added_columns.items():
+            if column_name in columns:
+                continue
+            try:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table_name} "
+                        f"ADD COLUMN {column_name} {column_type}"
+                    )
+                )
+                logger.info(f"Added column {table_name}.{column_name}")
+            except Exception as e:
+                logger.error(f"Failed to add column {table_name}.{column_name}: {e}")
+    _add_daily_indexes(conn, inspector, all_tables)
+
+
+def _add_daily_indexes(conn, inspector, all_tables):
+    """Create the indexes of days stored before they were defined."""
+    for table_name in all_tables:
+        if re.match(r"log_\d{8}$", table_name):
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            for column_name in DAILY_LOG_INDEXES:
+                index_name = f"ix_{table_name}_{column_name}"
+                if index_name in existing:
+                    continue
+                try:
+                    with conn.begin_nested():
+                        conn.execute(
+                            text(
+                                f"CREATE INDEX {index_name} "
+                                f"ON {table_name} ({column_name})"
+                            )
+                        )
+                    logger.info(f"Created index {index_name}")
+                except Exception as e:
+                    logger.error(f"Failed to create index {index_name}: {e}")
+        elif re.match(r"user_\d{8}$", table_name):
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            index_name = f"ux_{table_name}_username_ip"
+            fallback_name = f"ix_{table_name}_username_ip"
+            if index_name in existing or fallback_name in existing:
+                continue
+            try:
+                with conn.begin_nested():
+                    conn.execute(
+                        text(
+                            f"CREATE UNIQUE INDEX {index_name} "
+                            f"ON {table_name} (username, ip)"
+                        )
+                    )
+                logger.info(f"Created index {index_name}")
+            except Exception as e:
+                # Days ingested with duplicated users keep a plain index
+                logger.warning(f"Duplicated users in {table_name}, not unique: {e}")
+                try:
+                    with conn.begin_nested():
+                        conn.execute(
+                            text(
+                                f"CREATE INDEX {fallback_name} "
+                                f"ON {table_name} (username, ip)"
+                            )
+                        )
+                except Exception as e:
+                    logger.error(f"Failed to create index {fallback_name}: {e}")
+
+
+def backfill_log_domains(chunk_size: int = 10000):
+    """Fill ``domain_rev`` of log rows stored before the column existed."""
+    engine = get_engine()
+    tables = [
+        t for t in inspect(engine).get_table_names() if re.match(r"log_\d{8}$", t)
+    ]
+    for table_name in tables:
+        table = Table(table_name, MetaData(), autoload_with=engine)
+        if "domain_rev" not in table.c:
+            continue
+        stmt = (
+            table.update()
+            .where(table.c.id == bindparam("_id"))
+            .values(domain_rev=bindparam("_domain_rev"))
+        )
+        filled = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(table.c.id, table.c.url)
+                    .where(table.c.domain_rev.is_(None))
+                    .limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                conn.execute(
+                    stmt,
+                    [
+                        {"_id": row.id, "_domain_rev": url_domain_key(row.url)}
+                        for row in rows
+                    ],
+                )
+            filled += len(rows)
+        if filled:
+            logger.info(f"Filled domain_rev of {filled} rows in {table_name}")
@@ -0,0 +1,387 @@
+"""Incremental maintenance of the rollup_* tables.
+
+The ingester adds every stored log line to a :class:`RollupAccumulator` and
+flushes it in the same transaction as the rows and the read checkpoint, so
+the rollups always match the committed raw tables. Reports and audits read
+the rollups instead of grouping the raw ``log_YYYYMMDD`` rows.
+
+The same flush keeps ``user_directory`` (one row per username with when
+and from where it was last seen) for the user pickers.
+"""
+
+import logging
+import re
+from datetime import date, datetime, time
+
+from sqlalchemy import and_, case, delete, func, inspect, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.database import (
+    DomainDailyStats,
+    HourlyStats,
+    ReportCache,
+    ResponseDailyStats,
+    UserDailyStats,
+    UserDirectory,
+    get_dynamic_models,
+    get_session,
+)
+from utils.domains import url_host
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_VALUES = ("request_count", "data_transmitted")
+ROLLUP_KEYS = (
+    (UserDailyStats, ("day", "username", "ip")),
+    (DomainDailyStats, ("day", "domain", "username")),
+    (ResponseDailyStats, ("day", "response", "username")),
+    (HourlyStats, ("day", "hour", "username")),
+)
+# Summed columns per rollup; only the user rollup counts raw log rows
+ROLLUP_FIELDS = {
+    model: (*ROLLUP_VALUES, "log_rows") if model is UserDailyStats else ROLLUP_VALUES
+    for model, _ in ROLLUP_KEYS
+}
+
+# Rows read per round trip when rebuilding a day from its raw tables
+BACKFILL_CHUNK_SIZE = 10000
+
+# Bumped for a day every time this process commits rollup changes for it;
+# in-memory report caches compare it to detect stale entries
+_generations: dict[date, int] = {}
+
+
+def rollup_generation(day: date) -> int:
+    return _generations.get(day, 0)
+
+
+def rollup_version(session, day: date) -> int:
+    """Requests rolled up for ``day``; grows with every batch committed for it.
+
+    Unlike :func:`rollup_generation` it is read from the database, so it
+    also sees batches committed by another process.
+    """
+    return (
+        session.query(func.coalesce(func.sum(UserDailyStats.request_count), 0))
+        .filter(UserDailyStats.day == day)
+        .scalar()
+    )
+
+
+def upsert_increments(session, model, key_fields: tuple[str, ...], rows: list[dict]):
+    """Add ``rows`` to ``model``, incrementing the rows whose key already exists."""
+    table = model.__table__
+    values = ROLLUP_FIELDS[model]
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_fields),
+            set_={field: table.c[field] + stmt.excluded[field] for field in values},
+        )
+        session.execute(stmt, rows)
+        return
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {field: table.c[field] + stmt.inserted[field] for field in values}
+        )
+        session.execute(stmt, rows)
+        return
+    # Any other backend: update first, insert the keys that matched nothing
+    for row in rows:
+        condition = and_(*(table.c[field] == row[field] for field in key_fields))
+        result = session.execute(
+            update(table)
+            .where(condition)
+            .values({field: table.c[field] + row[field] for field in values})
+        )
+        if result.rowcount == 0:
+            session.execute(table.insert(), row)
+
+
+def upsert_users(session, rows: list[dict]):
+    """Merge ``rows`` into user_directory, widening the first/last seen times."""
+    table = UserDirectory.__table__
+    dialect = session.get_bind().dialect.name
+
+    def merged(new):
+        # last_ip first: MySQL applies the assignments in order
+        return {
+            "last_ip": case(
+                (new.last_seen >= table.c.last_seen, new.last_ip),
+                else_=table.c.last_ip,
+            ),
+            "first_seen": case(
+                (new.first_seen < table.c.first_seen, new.first_seen),
+                else_=table.c.first_seen,
+            ),
+            "last_seen": case(
+                (new.last_seen > table.c.last_seen, new.last_seen),
+                else_=table.c.last_seen,
+            ),
+        }
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["username"], set_=merged(stmt.excluded)
+        )
+        session.execute(stmt, rows)
+        return
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(merged(stmt.inserted))
+        session.execute(stmt, rows)
+        return
+    for row in rows:
+        current = session.execute(
+            select(table).where(table.c.username == row["username"])
+        ).first()
+        if current is None:
+            session.execute(table.insert(), row)
+            continue
+        values = {
+            "first_seen": min(current.first_seen, row["first_seen"]),
+            "last_seen": max(current.last_seen, row["last_seen"]),
+        }
+        if row["last_seen"] >= current.last_seen:
+            values["last_ip"] = row["last_ip"]
+        session.execute(
+            update(table).where(table.c.username == row["username"]).values(values)
+        )
+
+
+def _user_rows(users: dict[str, list]) -> list[dict]:
+    return [
+        {
+            "username": username,
+            "username_key": username.lower()[:255],
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+            "last_ip": last_ip,
+        }
+        for username, (first_seen, last_seen, last_ip) in sorted(users.items())
+    ]
+
+
+class RollupAccumulator:
+    """Sums log lines per rollup key until the surrounding batch is committed.
+
+    :meth:`flush` writes the sums without committing; pending sums are only
+    dropped by :meth:`committed`, so a rolled back batch is written again by
+    the next flush.
+    """
+
+    def __init__(self):
+        self.pending = {model: {} for model, _ in ROLLUP_KEYS}
+        # username -> [first seen, last seen, last ip]
+        self.users: dict[str, list] = {}
+
+    def add(
+        self,
+        day: date,
+        hour: int,
+        username: str,
+        ip: str,
+        url: str,
+        response: int,
+        request_count: int,
+        data_transmitted: int,
+        seen_at: datetime | None = None,
+        log_rows: int = 1,
+    ):
+        """Account for one log line, or for one stored row of ``request_count``.
+
+        ``log_rows`` is how many rows of the raw ``log_YYYYMMDD`` table the
+        line adds: 0 when it was folded into a row another line opened.
+        """
+        domain = url_host(url)
+        data_transmitted = data_transmitted or 0
+        sums = self.pending[UserDailyStats].get((day, username, ip))
+        if sums is None:
+            self.pending[UserDailyStats][(day, username, ip)] = [
+                request_count,
+                data_transmitted,
+                log_rows,
+            ]
+        else:
+            sums[0] += request_count
+            sums[1] += data_transmitted
+            sums[2] += log_rows
+        for model, key in (
+            (DomainDailyStats, (day, domain, username)),
+            (ResponseDailyStats, (day, response, username)),
+            (HourlyStats, (day, hour, username)),
+        ):
+            sums = self.pending[model].get(key)
+            if sums is None:
+                self.pending[model][key] = [request_count, data_transmitted]
+            else:
+                sums[0] += request_count
+                sums[1] += data_transmitted
+        seen_at = seen_at or datetime.combine(day, time(hour))
+        user = self.users.get(username)
+        if user is None:
+            self.users[username] = [seen_at, seen_at, ip]
+        elif seen_at < user[0]:
+            user[0] = seen_at
+        elif seen_at >= user[1]:
+            user[1] = seen_at
+            user[2] = ip
+
+    def has_pending(self) -> bool:
+        return bool(self.users) or any(self.pending.values())
+
+    def pending_days(self) -> set[date]:
+        return {key[0] for sums in self.pending.values() for key in sums}
+
+    def flush(self, session):
+        for model, key_fields in ROLLUP_KEYS:
+            sums = self.pending[model]
+            if not sums:
+                continue
+            value_fields = ROLLUP_FIELDS[model]
+            upsert_increments(
+                session,
+                model,
+                key_fields,
+                [
+                    {**dict(zip(key_fields, key)), **dict(zip(value_fields, values))}
+                    for key, values in sums.items()
+                ],
+            )
+        if self.users:
+            upsert_users(session, _user_rows(self.users))
+
+    def committed(self):
+        for day in self.pending_days():
+            _generations[day] = _generations.get(day, 0) + 1
+        for sums in self.pending.values():
+            sums.clear()
+        self.users.clear()
+
+    def discard(self):
+        """Drop the pending sums without writing them."""
+        for sums in self.pending.values():
+            sums.clear()
+        self.users.clear()
+
+
+def rebuild_rollups(session, date_suffix: str) -> int:
+    """Recompute the rollups of one day from its raw tables; returns rows read."""
+    user_model, log_model = get_dynamic_models(date_suffix)
+    if user_model is None or log_model is None:
+        return 0
+    day = datetime.strptime(date_suffix, "%Y%m%d").date()
+    for model in (*(model for model, _ in ROLLUP_KEYS), ReportCache):
+        session.execute(delete(model).where(model.day == day))
+    accumulator = RollupAccumulator()
+    rows = session.execute(
+        select(
+            user_model.username,
+            user_model.ip,
+            log_model.url,
+            log_model.response,
+            log_model.request_count,
+            log_model.data_transmitted,
+            log_model.created_at,
+        )
+        .join(user_model, user_model.id == log_model.user_id)
+        .execution_options(yield_per=BACKFILL_CHUNK_SIZE)
+    )
+    count = 0
+    for row in rows:
+        accumulator.add(
+            day,
+            row.created_at.hour if row.created_at else 0,
+            row.username,
+            row.ip,
+            row.url,
+            row.response,
+            row.request_count or 1,
+            row.data_transmitted,
+            row.created_at,
+        )
+        count += 1
+    accumulator.flush(session)
+    session.commit()
+    accumulator.committed()
+    return count
+
+
+def backfill_rollups():
+    """Rebuild the rollups of every logged day that has none yet."""
+    session = get_session()
+    try:
+        tables = inspect(session.get_bind()).get_table_names()
+        days = sorted(
+            name[4:]
+            for name in tables
+            if re.match(r"log_\d{8}$", name) and f"user_{name[4:]}" in tables
+        )
+        # Days rolled up before log_rows existed have it at 0 and are rebuilt
+        done = {
+            day.strftime("%Y%m%d")
+            for (day,) in session.query(UserDailyStats.day)
+            .group_by(UserDailyStats.day)
+            .having(func.sum(UserDailyStats.log_rows) > 0)
+        }
+        for date_suffix in days:
+            if date_suffix in done:
+                continue
+            _, log_model = get_dynamic_models(date_suffix)
+            if (
+                log_model is None
+                or not session.query(func.count(log_model.id)).scalar()
+            ):
+                continue
+            rows = rebuild_rollups(session, date_suffix)
+            logger.info(f"Built rollups for {date_suffix} from {rows} log rows")
+    except SQLAlchemyError as e:
+        logger.error(f"Error backfilling rollups: {e}")
+        session.rollback()
+    finally:
+        session.close()
+
+
+def backfill_user_directory():
+    """Fill an empty user_directory from the per-day user rollups.
+
+    Only days are known there, so the first and last seen times of these
+    users are midnight of their first and last logged day.
+    """
+    session = get_session()
+    try:
+        if session.query(UserDirectory.id).first() is not None:
+            return
+        rows = session.execute(
+            select(
+                UserDailyStats.username,
+                UserDailyStats.ip,
+                func.min(UserDailyStats.day).label("first_day"),
+                func.max(UserDailyStats.day).label("last_day"),
+            ).group_by(UserDailyStats.username, UserDailyStats.ip)
+        )
+        users: dict[str, list] = {}
+        for row in rows:
+            first_seen = datetime.combine(row.first_day, time())
+            last_seen = datetime.combine(row.last_day, time())
+            user = users.setdefault(row.username, [first_seen, last_seen, row.ip])
+            user[0] = min(user[0], first_seen)
+            if last_seen > user[1]:
+                user[1], user[2] = last_seen, row.ip
+        if users:
+            upsert_users(session, _user_rows(users))
+            session.commit()
+            logger.info(f"Filled user_directory with {len(users)} users")
+    except SQLAlchemyError as e:
+        logger.error(f"Error backfilling user_directory: {e}")
+        session.rollback()
+    finally:
+        session.close()
@@ -0,0 +1,101 @@
+from collections import deque
+
+
+class BatchSizer:
+    """Picks how many lines the ingester buffers before each commit.
+
+    Hill climbing on the measured commit time per line: the size keeps
+    moving in the same direction while that time falls, turns around when
+    it rises, and is halved by a failed commit (lock timeouts, a lost
+    connection) or one slower than ``target_seconds``. The size stays
+    within ``min_size`` and ``max_size``.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        min_size: int,
+        max_size: int,
+        target_seconds: float,
+        step: float = 1.25,
+        tolerance: float = 0.05,
+    ):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.size = min(max(size, self.min_size), self.max_size)
+        self.target_seconds = target_seconds
+        self.step = step
+        self.tolerance = tolerance
+        self.direction = 1
+        # Seconds per line of the previous successful commit
+        self.per_line = None
+        self.grown = self.shrunk = 0
+
+    def record(self, lines: int, seconds: float, failed: bool = False):
+        """Account for one commit of ``lines`` parsed lines."""
+        if failed or seconds > self.target_seconds:
+            self.direction = -1
+            self.per_line = None
+            self._resize(self.size // 2)
+            return
+        if lines < self.size:
+            # Flushed early (timer, end of run): says nothing about the size
+            return
+        per_line = seconds / lines
+        if self.per_line is not None:
+            if per_line > self.per_line * (1 + self.tolerance):
+                self.direction = -self.direction
+            elif per_line >= self.per_line * (1 - self.tolerance):
+                # No measurable difference: stay here
+                self.per_line = per_line
+                return
+        self.per_line = per_line
+        if self.direction > 0:
+            self._resize(int(self.size * self.step) + 1)
+        else:
+            self._resize(int(self.size / self.step))
+
+    def _resize(self, size: int):
+        size = min(max(size, self.min_size), self.max_size)
+        if size > self.size:
+            self.grown += 1
+        elif size < self.size:
+            self.shrunk += 1
+        self.size = size
+
+
+class CommitTimings:
+    """Per-commit timings of an ingester run."""
+
+    def __init__(self, recent: int = 100):
+        self.commits = self.failed = self.lines = 0
+        self.seconds = self.slowest = 0.0
+        self.recent = deque(maxlen=recent)
+
+    def add(self, lines: int, seconds: float, failed: bool = False):
+        if failed:
+            self.failed += 1
+        else:
+            self.commits += 1
+            self.lines += lines
+        self.seconds += seconds
+        self.slowest = max(self.slowest, seconds)
+        self.recent.append(seconds)
+
+    def stats(self) -> dict:
+        recent = sorted(self.recent)
+        attempts = self.commits + self.failed
+        return {
+            "commits": self.commits,
+            "failed_commits": self.failed,
+            "avg_commit_ms": round(self.seconds / attempts * 1000, 2)
+            if attempts
+            else 0.0,
+            "p95_commit_ms": round(recent[int(len(recent) * 0.95)] * 1000, 2)
+            if recent
+            else 0.0,
+            "slowest_commit_ms": round(self.slowest * 1000, 2),
+            "lines_per_commit": round(self.lines / self.commits, 1)
+            if self.commits
+            else 0.0,
+        }
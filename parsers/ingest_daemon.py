@@ -0,0 +1,86 @@
+"""squidstats-ingest: follow access.log in a process of its own.
+
+Run it with the ``squidstats-ingest`` script at the top of the repository or
+``python -m parsers.ingest_daemon`` (utils/squidstats-ingest.service installs
+it as a systemd unit) and set ``LOG_INGEST_DAEMON=true`` so the web app stops
+ingesting by itself. SIGTERM and SIGINT commit the buffered lines and exit;
+SIGHUP reopens the log file. The daemon reports its status on the
+``INGEST_STATUS_SOCKET`` Unix socket.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from database.database import migrate_database
+from parsers.log_follower import LogFollower
+from services.ingest_status import INGEST_STATUS_SOCKET, StatusServer
+
+logger = logging.getLogger(__name__)
+
+
+def run(log_file: str, socket_path: str = INGEST_STATUS_SOCKET, migrate=True):
+    if migrate:
+        try:
+            migrate_database()
+        except SQLAlchemyError as e:
+            logger.error(f"Database migration failed: {e}")
+
+    follower = LogFollower(log_file)
+    started_at = time.time()
+
+    def status() -> dict:
+        return {
+            "pid": os.getpid(),
+            "started_at": started_at,
+            "uptime": time.time() - started_at,
+            **follower.status(),
+        }
+
+    def stop(signum, frame):
+        logger.info(f"{signal.Signals(signum).name} received, stopping")
+        follower.stop()
+
+    def reopen(signum, frame):
+        logger.info("SIGHUP received, reopening the log file")
+        follower.request_reopen()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, reopen)
+
+    server = StatusServer(socket_path, status) if socket_path else None
+    if server is not None:
+        server.start()
+        logger.info(f"Ingest status on {socket_path}")
+    try:
+        # Returns once stopped, after committing what was read
+        follower.run()
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="squidstats-ingest",
+        description="Follow the squid access.log and write it to the database",
+    )
+    parser.add_argument("--log-file", default=Config.SQUID_LOG)
+    parser.add_argument(
+        "--socket", default=INGEST_STATUS_SOCKET, help="status socket ('' disables it)"
+    )
+    parser.add_argument(
+        "--skip-migrate", action="store_true", help="do not run migrate_database"
+    )
+    args = parser.parse_args()
+    run(args.log_file, args.socket, migrate=not args.skip_migrate)
+
+
+if __name__ == "__main__":
+    main()
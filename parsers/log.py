@@ -1,11 +1,15 @@
+import gzip
 import logging
 import os
 import time
 from datetime import datetime
 
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from config import Config
+from database.bulk_writers import get_bulk_writer
+from database.categories import get_domain_tagger
 from database.database import (
     Base,
     DeniedLog,
@@ -16,6 +20,12 @@ from database.database import (
     get_session,
     table_exists,
 )
+from database.rollups import RollupAccumulator
+from parsers.batch_sizer import BatchSizer, CommitTimings
+from parsers.log_aggregator import LogAggregator
+from parsers.log_reader import LogTailReader, open_log
+from parsers.spool import FoldedLines, LogSpool, line_count
+from utils.domains import url_domain_key
 
 logging.basicConfig(
     level=logging.INFO,
@@ -49,12 +59,78 @@ class DatabaseManager:
 
 
 # Constants for fields and batch
-BATCH_SIZE = 500
+BATCH_SIZE = getattr(Config, "LOG_BATCH_SIZE", 500)
 MAX_RETRIES = 3
 
+# Lines per commit adapt to the measured commit time within these bounds
+LOG_BATCH_MIN = getattr(Config, "LOG_BATCH_MIN", 100)
+LOG_BATCH_MAX = getattr(Config, "LOG_BATCH_MAX", 5000)
+LOG_BATCH_TARGET_SECONDS = getattr(Config, "LOG_BATCH_TARGET_SECONDS", 1.0)
+
+# Per-run budget so one scheduler tick never runs into the next one
+LOG_RUN_MAX_SECONDS = getattr(Config, "LOG_RUN_MAX_SECONDS", 25)
+LOG_RUN_MAX_LINES = getattr(Config, "LOG_RUN_MAX_LINES", 0)
+
+# Parsed batches the database rejected wait in this file until it answers again
+LOG_SPOOL_FILE = getattr(Config, "LOG_SPOOL_FILE", "ingest.spool")
+LOG_SPOOL_RETRY_SECONDS = getattr(Config, "LOG_SPOOL_RETRY_SECONDS", 5)
+LOG_SPOOL_MAX_ATTEMPTS = getattr(Config, "LOG_SPOOL_MAX_ATTEMPTS", 10)
+
 # Log parsing mode controlled by .env LOG_FORMAT: 'DETAILED' or 'DEFAULT'
 LOG_FORMAT = getattr(Config, "LOG_FORMAT", "DETAILED").upper()
 
+# Ingest mode controlled by .env LOG_INGEST_MODE: 'RAW' or 'AGGREGATE'
+LOG_INGEST_MODE = getattr(Config, "LOG_INGEST_MODE", "RAW").upper()
+LOG_AGGREGATE_WINDOW = getattr(Config, "LOG_AGGREGATE_WINDOW", 60)
+LOG_AGGREGATE_KEY = (
+    "user_id",
+    "url",
+    "domain_rev",
+    "category_id",
+    "blacklisted",
+    "response",
+)
+DENIED_AGGREGATE_KEY = ("username", "ip", "url", "method", "status", "response")
+
+# Number of daily tables whose models and user caches an ingester keeps
+# around; a backlog read after midnight still writes to the previous day
+DAYS_KEPT = 2
+
+# Aggregators outlive a single scheduler run so rows of the current window
+# keep being incremented instead of duplicated
+_log_aggregators: dict[str, LogAggregator] = {}
+_denied_aggregator: LogAggregator | None = None
+# Likewise the batch size learned by earlier runs
+_batch_sizer: BatchSizer | None = None
+
+
+def get_log_aggregator(date_suffix: str, log_model) -> LogAggregator:
+    aggregator = _log_aggregators.get(date_suffix)
+    if aggregator is None:
+        aggregator = LogAggregator(
+            log_model, LOG_AGGREGATE_KEY, LOG_AGGREGATE_WINDOW, BATCH_SIZE
+        )
+        _log_aggregators[date_suffix] = aggregator
+    return aggregator
+
+
+def get_denied_aggregator() -> LogAggregator:
+    global _denied_aggregator
+    if _denied_aggregator is None:
+        _denied_aggregator = LogAggregator(
+            DeniedLog, DENIED_AGGREGATE_KEY, LOG_AGGREGATE_WINDOW, BATCH_SIZE
+        )
+    return _denied_aggregator
+
+
+def get_batch_sizer() -> BatchSizer:
+    global _batch_sizer
+    if _batch_sizer is None:
+        _batch_sizer = BatchSizer(
+            BATCH_SIZE, LOG_BATCH_MIN, LOG_BATCH_MAX, LOG_BATCH_TARGET_SECONDS
+        )
+    return _batch_sizer
+
 
 def find_last_parent_proxy(log_file: str, lines_to_check: int = 5000) -> str | None:
     if not os.path.exists(log_file):
@@ -109,17 +185,63 @@ def get_file_inode(filepath):
         raise
 
 
+def parse_epoch(field: str) -> float | None:
+    """Squid's ``%ts.%03tu`` field as epoch seconds, or None if it is not one."""
+    try:
+        return float(field)
+    except ValueError:
+        return None
+
+
+def batch_created_at(lines, fallback: datetime, memo: dict | None = None):
+    """Return ``(created_at, date_suffix)`` for each parsed line of a batch.
+
+    Conversions are done once per distinct second and shared by every line
+    logged in it, so a batch costs a handful of ``fromtimestamp`` calls
+    instead of one datetime per line. Lines without a timestamp get
+    ``fallback``.
+    """
+    memo = {} if memo is None else memo
+    fallback_stamp = (fallback, fallback.strftime("%Y%m%d"))
+    stamps = []
+    for log_data in lines:
+        timestamp = log_data.get("timestamp")
+        if timestamp is None:
+            stamps.append(fallback_stamp)
+            continue
+        second = int(timestamp)
+        stamp = memo.get(second)
+        if stamp is None:
+            created_at = datetime.fromtimestamp(second)
+            stamp = memo[second] = (created_at, created_at.strftime("%Y%m%d"))
+        stamps.append(stamp)
+    return stamps
+
+
+SQUID_METHODS = frozenset(
+    ("CONNECT", "GET", "POST", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE", "PATCH")
+)
+
+
+def is_ignored_error(line) -> bool:
+    """Squid error pseudo-requests that are never stored.
+
+    Squid writes them in lower case, so only lines containing ``rror:`` pay
+    for the case-insensitive check.
+    """
+    if not isinstance(line, str) or ("rror:" not in line and "RROR:" not in line):
+        return False
+    line_lower = line.lower()
+    return (
+        "error:transaction-end-before-headers" in line_lower
+        or "error:invalid-request" in line_lower
+    )
+
+
 def parse_log_line(line):
     # Universal ignore for specific squid error entries (apply regardless of LOG_FORMAT)
-    try:
-        line_lower = line.lower() if isinstance(line, str) else ""
-        if (
-            "error:transaction-end-before-headers" in line_lower
-            or "error:invalid-request" in line_lower
-        ):
-            return None
-    except Exception:
-        pass
+    if is_ignored_error(line):
+        return None
 
     if LOG_FORMAT == "DEFAULT":
         return parse_log_line_default(line)
@@ -129,25 +251,16 @@ def parse_log_line(line):
         return None
     if "|" in line:
         return parse_log_line_pipe_format(line)
-    parts = line.split()
+    return parse_log_line_split(line, line.split())
+
+
+def parse_log_line_split(line: str, parts: list[str]):
+    """DETAILED line that is not pipe-separated, already split on whitespace."""
     # Classic Squid format: timestamp elapsed ip code/status bytes method url rfc931 peerstatus/peerhost type
-    if len(parts) >= 10 and (
-        len(parts) > 5
-        and parts[5]
-        in (
-            "CONNECT",
-            "GET",
-            "POST",
-            "HEAD",
-            "PUT",
-            "DELETE",
-            "OPTIONS",
-            "TRACE",
-            "PATCH",
-        )
-    ):
+    if len(parts) >= 10 and parts[5] in SQUID_METHODS:
         try:
             return {
+                "timestamp": parse_epoch(parts[0]),
                 "ip": parts[2],
                 # Keep current behavior: if '-', set None
                 "username": parts[2] if parts[2] != "-" else None,
@@ -164,7 +277,7 @@ def parse_log_line(line):
             logger.error(f"Error parsing classic squid log line: {line.strip()} - {e}")
             return None
     # If not classic, try the space format
-    return parse_log_line_space_format(line)
+    return parse_log_line_space_format(line, parts)
 
 
 def parse_log_line_default(line: str):
@@ -195,6 +308,7 @@ def parse_log_line_default(line: str):
         data_transmitted = int(bytes_str) if bytes_str.isdigit() else 0
 
         return {
+            "timestamp": parse_epoch(parts[0]),
             "ip": ip,
             "username": username,
             "url": url,
@@ -218,6 +332,7 @@ def parse_log_line_pipe_format(line):
         if username == "-":
             return None
         return {
+            "timestamp": parse_epoch(parts[0]),
             "ip": parts[1],
             "username": username,
             "url": parts[6],
@@ -232,12 +347,14 @@ def parse_log_line_pipe_format(line):
         return None
 
 
-def parse_log_line_space_format(line):
+def parse_log_line_space_format(line, parts: list[str] | None = None):
     try:
-        parts = line.split()
+        if parts is None:
+            parts = line.split()
         if len(parts) < 11 or parts[3] == "-":
             return None
         return {
+            "timestamp": parse_epoch(parts[0]),
             "ip": parts[1],
             "username": parts[3],
             "url": parts[7],
@@ -254,13 +371,16 @@ def parse_log_line_space_format(line):
 
 def detect_log_format(log_file, sample_lines=10):
     try:
-        with open(log_file, encoding="utf-8", errors="replace") as f:
+        opener = gzip.open if log_file.endswith(".gz") else open
+        with opener(log_file, "rt", encoding="utf-8", errors="replace") as f:
             pipe_count = 0
             space_count = 0
+            sampled = 0
 
             for i, line in enumerate(f):
                 if i >= sample_lines:
                     break
+                sampled += 1
 
                 if (
                     "|" in line and line.count("|") > 5
@@ -269,6 +389,8 @@ def detect_log_format(log_file, sample_lines=10):
                 elif len(line.split()) > 10:  # Space format typically has many fields
                     space_count += 1
 
+            if not sampled:
+                return "auto"
             format_detected = "pipe" if pipe_count > space_count else "space"
             return format_detected
 
@@ -277,7 +399,838 @@ def detect_log_format(log_file, sample_lines=10):
         return "auto"  # Fallback to automatic per-line detection
 
 
-def process_logs(log_file):
+def _fast_default(line):
+    # Dropped wherever the error appears, like parse_log_line does
+    if ("rror:" in line or "RROR:" in line) and is_ignored_error(line):
+        return None
+    # Only the first eight fields are used; leave the rest unsplit
+    parts = line.split(None, 8)
+    if len(parts) < 7:
+        return None
+    url = parts[6]
+    if "cache_object://" in url:
+        return None
+    try:
+        timestamp = float(parts[0])
+    except ValueError:
+        timestamp = None
+    try:
+        ip, status, bytes_str = parts[2], parts[3], parts[4]
+        user_field = parts[7] if len(parts) > 7 else "-"
+        _, slash, code = status.rpartition("/")
+        return {
+            "timestamp": timestamp,
+            "ip": ip,
+            "username": user_field if user_field != "-" else ip,
+            "url": url,
+            "response": int(code) if slash and code.isdigit() else 0,
+            "data_transmitted": int(bytes_str) if bytes_str.isdigit() else 0,
+            "method": parts[5],
+            "status": status,
+            "is_denied": "TCP_DENIED" in status,
+        }
+    except ValueError:
+        return parse_log_line(line)
+
+
+def _fast_split(line):
+    if "|" in line or "cache_object://" in line:
+        return parse_log_line(line)
+    if ("rror:" in line or "RROR:" in line) and is_ignored_error(line):
+        return None
+    # Classic lines use ten fields, the space format eleven
+    parts = line.split(None, 11)
+    if len(parts) < 10 or parts[5] not in SQUID_METHODS:
+        return parse_log_line_space_format(line, parts)
+    try:
+        timestamp = float(parts[0])
+    except ValueError:
+        timestamp = None
+    try:
+        ip, status, bytes_str = parts[2], parts[3], parts[4]
+        _, slash, code = status.rpartition("/")
+        return {
+            "timestamp": timestamp,
+            "ip": ip,
+            "username": ip if ip != "-" else None,
+            "url": parts[6],
+            "response": int(code) if slash and code.isdigit() else 0,
+            "data_transmitted": int(bytes_str) if bytes_str.isdigit() else 0,
+            "method": parts[5],
+            "status": status,
+            "is_denied": "TCP_DENIED" in status,
+        }
+    except ValueError:
+        return parse_log_line(line)
+
+
+def _fast_pipe(line):
+    if "|" not in line:
+        return parse_log_line(line)
+    if ("rror:" in line or "RROR:" in line) and is_ignored_error(line):
+        return None
+    if "cache_object://" in line:
+        return None
+    return parse_log_line_pipe_format(line)
+
+
+def make_line_parser(log_format: str):
+    """Return a line parser specialised for one ``detect_log_format`` result.
+
+    The parsers behave like :func:`parse_log_line` but skip its per-line format
+    checks, split each line once and only as far as the fields they use. A
+    line that does not look like the detected format, or that fails to
+    convert, is handed to :func:`parse_log_line`.
+    """
+    if LOG_FORMAT == "DEFAULT":
+        return _fast_default
+    if log_format == "pipe":
+        return _fast_pipe
+    if log_format == "space":
+        return _fast_split
+    return parse_log_line
+
+
+def get_line_parser(log_file: str):
+    """Line parser for ``log_file``, detected from its first lines."""
+    if LOG_FORMAT == "DEFAULT":
+        return make_line_parser("default")
+    return make_line_parser(detect_log_format(log_file))
+
+
+def preload_user_cache(session, user_model) -> dict[tuple[str, str], int]:
+    return {
+        (row.username, row.ip): row.id
+        for row in session.query(user_model.id, user_model.username, user_model.ip)
+    }
+
+
+def resolve_users(session, user_model, user_cache, user_keys) -> int:
+    """Insert the unknown (username, ip) pairs and load their ids into the cache.
+
+    New users are written with a single multi-row INSERT and their ids are
+    read back with one SELECT, so a batch costs one commit however many new
+    clients it contains. Pairs without a username or IP cannot be stored and
+    stay out of the cache, so only their lines are skipped. Returns the
+    number of users inserted.
+    """
+    # dict.fromkeys: a pair listed twice must not be inserted twice
+    missing = [
+        (username, ip)
+        for username, ip in dict.fromkeys(user_keys)
+        if username and ip and (username, ip) not in user_cache
+    ]
+    if not missing:
+        return 0
+
+    def load_ids():
+        rows = (
+            session.query(user_model.id, user_model.username, user_model.ip)
+            .filter(user_model.username.in_({username for username, _ in missing}))
+            .all()
+        )
+        for row in rows:
+            user_cache[(row.username, row.ip)] = row.id
+
+    now = datetime.now()
+    try:
+        session.execute(
+            insert(user_model),
+            [
+                {"username": username, "ip": ip, "created_at": now}
+                for username, ip in missing
+            ],
+        )
+    except IntegrityError:
+        # Another writer added some of these users first (unique username, ip)
+        session.rollback()
+        load_ids()
+        missing = [key for key in missing if key not in user_cache]
+        inserted = 0
+        # One at a time so a pair the database refuses costs only its lines
+        for username, ip in missing:
+            try:
+                session.execute(
+                    insert(user_model),
+                    [{"username": username, "ip": ip, "created_at": now}],
+                )
+                session.commit()
+                inserted += 1
+            except IntegrityError as e:
+                session.rollback()
+                logger.error(f"Usuario no creado: {(username, ip)}: {e.orig}")
+        load_ids()
+        session.commit()
+        return inserted
+    load_ids()
+    session.commit()
+    return len(missing)
+
+
+def save_checkpoint(session, position: int, inode: int):
+    """Stage the read offset in the current transaction.
+
+    Committed together with the rows read up to ``position``, so a run killed
+    halfway resumes exactly after the last committed batch.
+    """
+    metadata = session.query(LogMetadata).first()
+    if not metadata:
+        metadata = LogMetadata()
+        session.add(metadata)
+    metadata.last_position = position
+    metadata.last_inode = inode
+    metadata.updated_at = datetime.now()
+
+
+class DayTables:
+    """Models, user cache and aggregator of one user_/log_YYYYMMDD pair."""
+
+    def __init__(self, session, date_suffix: str, aggregate: bool):
+        self.date_suffix = date_suffix
+        self.day = datetime.strptime(date_suffix, "%Y%m%d").date()
+        self.user_model, self.log_model = get_dynamic_models(date_suffix)
+        self.user_cache = preload_user_cache(session, self.user_model)
+        logger.info(
+            f"Preloaded {len(self.user_cache)} users from {self.user_model.__tablename__}"
+        )
+        self.aggregator = (
+            get_log_aggregator(date_suffix, self.log_model) if aggregate else None
+        )
+
+
+class LogIngester:
+    """Reads access.log from the stored checkpoint and writes it in batches.
+
+    An instance can do a single pass (``process_logs``) or be kept alive by the
+    follower, which reuses its open file handle, user caches and session. Rows
+    are stamped with squid's own timestamp and written to the daily tables of
+    the day they were logged. Batches the database fails to take go to the
+    ``LOG_SPOOL_FILE`` spool and are replayed, in order, before newer ones.
+    """
+
+    def __init__(self, log_file: str, session):
+        self.log_file = log_file
+        self.session = session
+        self.aggregate = LOG_INGEST_MODE == "AGGREGATE"
+        self.reader = None
+        self.current_inode = None
+        self._file = None
+        self.parse_line = parse_log_line
+        self.format_detected = False
+        self.tagger = None
+        self.days: dict[str, DayTables] = {}
+        self.pending_lines, self.pending_denied = [], []
+        self.logs_to_insert: dict = {}
+        self.denied_to_insert = []
+        self.rollups = RollupAccumulator()
+        self.writer = get_bulk_writer()
+        self.spool = LogSpool(LOG_SPOOL_FILE) if LOG_SPOOL_FILE else None
+        # Batches the database keeps rejecting, kept aside for inspection
+        self.rejected = (
+            LogSpool(f"{LOG_SPOOL_FILE}.rejected") if self.spool is not None else None
+        )
+        # Parsed lines behind the staged rows, spooled if their commit fails;
+        # folded when aggregating since the aggregates can span a whole window
+        self.uncommitted = FoldedLines(LOG_AGGREGATE_WINDOW) if self.aggregate else []
+        self.spool_retry_at = 0.0
+        # (position, inode) of a spooled batch -> failed replays
+        self.replay_failures: dict[tuple[int, int], int] = {}
+        self.processed_lines = self.inserted_logs = 0
+        self.inserted_users = self.inserted_denied = 0
+        self.spooled_lines = self.replayed_lines = self.rejected_lines = 0
+        self.last_commit = None
+        self.sizer = get_batch_sizer()
+        self.timings = CommitTimings()
+        # Parsed lines staged since the last commit
+        self.batch_lines = 0
+        # Monotonic time of the oldest line not yet committed
+        self.oldest_pending = None
+        self.start_time = time.time()
+        self.denied_aggregator = get_denied_aggregator() if self.aggregate else None
+        self.stats_before = {}
+        if self.aggregate:
+            self._track(self.denied_aggregator)
+
+    def _track(self, aggregator):
+        if aggregator not in self.stats_before:
+            self.stats_before[aggregator] = aggregator.stats()
+
+    def day(self, date_suffix: str) -> DayTables:
+        day = self.days.get(date_suffix)
+        if day is None:
+            day = self.days[date_suffix] = DayTables(
+                self.session, date_suffix, self.aggregate
+            )
+            if day.aggregator is not None:
+                self._track(day.aggregator)
+        return day
+
+    @property
+    def aggregators(self) -> list:
+        if not self.aggregate:
+            return []
+        return [self.denied_aggregator] + [day.aggregator for day in self.days.values()]
+
+    def _prune_days(self):
+        """Forget all but the most recent ``DAYS_KEPT`` days once committed."""
+        for date_suffix in sorted(self.days)[:-DAYS_KEPT]:
+            del self.days[date_suffix]
+            _log_aggregators.pop(date_suffix, None)
+
+    def open(self):
+        """Open the log at the stored checkpoint, handling rotation and truncation."""
+        current_inode = get_file_inode(self.log_file)
+        file_size = os.path.getsize(self.log_file)
+        metadata = self.session.query(LogMetadata).first()
+        checkpoint = (metadata.last_position, metadata.last_inode) if metadata else None
+        if self.spool:
+            # Spooled lines were read already, they only wait for the database
+            checkpoint = self.spool.checkpoints()[-1]
+        last_position = 0
+        if checkpoint:
+            last_position, last_inode = checkpoint
+            if last_inode != current_inode:
+                logger.info(
+                    f"Inode changed: {last_inode} -> {current_inode}. Resetting position."
+                )
+                last_position = 0
+            elif file_size < last_position:
+                logger.warning(
+                    f"File truncated (size: {file_size} < position: {last_position})"
+                )
+                last_position = 0
+        logger.info(f"Reading from position: {last_position}")
+        self._file = open_log(self.log_file)
+        self.reader = LogTailReader(self._file, last_position)
+        self.current_inode = current_inode
+        self.format_detected = False
+        self.detect_format()
+        self.tagger = get_domain_tagger(self.session)
+
+    def detect_format(self):
+        """Bind the parser for this file's format once it has a first line."""
+        if os.fstat(self._file.fileno()).st_size == 0:
+            return
+        self.parse_line = get_line_parser(self.log_file)
+        self.format_detected = True
+        logger.info(f"Parsing {self.log_file} with {self.parse_line.__name__}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def rotated(self) -> bool:
+        """True once log_file is a different file (logrotate) or was truncated."""
+        try:
+            if get_file_inode(self.log_file) != self.current_inode:
+                return True
+            return os.path.getsize(self.log_file) < self.reader.position
+        except FileNotFoundError:
+            # Between logrotate's rename and squid reopening its log
+            return False
+
+    def reopen(self):
+        """Finish the current file and continue with the one now at log_file."""
+        # Lines squid wrote to the old file before reopening its log
+        self.read_available()
+        self.commit_batch()
+        self.close()
+        self.open()
+
+    def has_pending(self) -> bool:
+        return bool(
+            self.pending_lines
+            or self.pending_denied
+            or any(self.logs_to_insert.values())
+            or self.denied_to_insert
+            or self.rollups.has_pending()
+            or any(aggregator.pending for aggregator in self.aggregators)
+        )
+
+    def commit_batch(self, position: int | None = None) -> bool:
+        if position is None:
+            position = self.reader.position
+        if self.spool and not self.replay_spool():
+            # Newer lines queue behind the spooled ones
+            return self.spool_batch(position)
+        try:
+            return self.write_batch(position, self.current_inode)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {e}")
+            if self.spool is None:
+                return False
+            self.spool_retry_at = time.monotonic() + LOG_SPOOL_RETRY_SECONDS
+            return self.spool_batch(position)
+
+    def write_batch(self, position: int, inode: int) -> bool:
+        """Stage the buffered lines and commit them with the checkpoint.
+
+        Integrity errors are retried; a batch still failing after
+        ``MAX_RETRIES`` attempts is set aside by :meth:`reject_batch` so it
+        cannot hold back the ones after it. Other database errors are raised
+        with every staged row still queued.
+        """
+        session = self.session
+        retry_count = 0
+        while retry_count < MAX_RETRIES:
+            start = time.perf_counter()
+            try:
+                self.stage_pending_lines()
+                for log_model, rows in self.logs_to_insert.items():
+                    self.writer.write(session, log_model.__table__, rows)
+                self.writer.write(session, DeniedLog.__table__, self.denied_to_insert)
+                for aggregator in self.aggregators:
+                    aggregator.flush(session)
+                self.rollups.flush(session)
+                save_checkpoint(session, position, inode)
+                session.commit()
+                self._timed(time.perf_counter() - start)
+                # Rows stay queued until committed so a failed batch is
+                # retried by the next commit, never dropped
+                self.inserted_logs += sum(map(len, self.logs_to_insert.values()))
+                self.logs_to_insert.clear()
+                self.inserted_denied += len(self.denied_to_insert)
+                self.denied_to_insert.clear()
+                for aggregator in self.aggregators:
+                    aggregator.committed()
+                self.rollups.committed()
+                self.uncommitted.clear()
+                self.last_commit = time.time()
+                self._prune_days()
+                self.oldest_pending = None
+                return True
+            except IntegrityError as e:
+                logger.warning(f"Integrity error (retry {retry_count + 1}): {e}")
+                session.rollback()
+                for aggregator in self.aggregators:
+                    aggregator.rolled_back()
+                retry_count += 1
+            except SQLAlchemyError:
+                session.rollback()
+                for aggregator in self.aggregators:
+                    aggregator.rolled_back()
+                self._timed(time.perf_counter() - start, failed=True)
+                raise
+        self.reject_batch(position, inode)
+        return False
+
+    def reject_batch(self, position: int, inode: int) -> bool:
+        """Move the staged batch to the rejected file and commit past it.
+
+        Returns False when the batch could not be written aside and stays
+        queued.
+        """
+        self.uncommitted.extend(self.pending_lines + self.pending_denied)
+        lines = list(self.uncommitted)
+        count = line_count(lines)
+        if self.rejected is None:
+            logger.error(
+                f"Dropping a batch the database keeps rejecting (up to {position})"
+            )
+        elif lines:
+            try:
+                self.rejected.append(lines, position, inode)
+            except OSError as e:
+                # Keep the batch queued rather than lose it
+                logger.error(f"Could not set aside {count} rejected lines: {e}")
+                return False
+            logger.error(
+                f"Set aside {count} lines the database keeps rejecting "
+                f"in {self.rejected.path}"
+            )
+        self.rejected_lines += count
+        self.discard_staged()
+        save_checkpoint(self.session, position, inode)
+        self.session.commit()
+        return True
+
+    def _timed(self, seconds: float, failed: bool = False):
+        self.timings.add(self.batch_lines, seconds, failed)
+        self.sizer.record(self.batch_lines, seconds, failed)
+        if not failed:
+            self.batch_lines = 0
+
+    def spool_batch(self, position: int) -> bool:
+        """Move every line not yet committed to the spool."""
+        self.uncommitted.extend(self.pending_lines + self.pending_denied)
+        lines = list(self.uncommitted)
+        if lines:
+            try:
+                self.spool.append(lines, position, self.current_inode)
+            except OSError as e:
+                logger.error(f"Could not spool {len(lines)} lines: {e}")
+                return False
+            self.spooled_lines += line_count(lines)
+            logger.warning(
+                f"Spooled {line_count(lines)} lines until the database is back"
+            )
+        self.discard_staged()
+        return True
+
+    def discard_staged(self):
+        """Forget buffered and staged rows whose lines are in the spool."""
+        self.uncommitted.clear()
+        self.pending_lines.clear()
+        self.pending_denied.clear()
+        self.batch_lines = 0
+        self.logs_to_insert.clear()
+        self.denied_to_insert.clear()
+        self.rollups.discard()
+        for aggregator in self.aggregators:
+            aggregator.discard()
+        self.oldest_pending = None
+
+    def replay_spool(self) -> bool:
+        """Write the spooled batches to the database; True once it is empty.
+
+        Each batch is committed with its own checkpoint, so the stored
+        checkpoint tells which batches an interrupted replay already wrote.
+        Attempts are at most every ``LOG_SPOOL_RETRY_SECONDS``; a batch whose
+        replay failed ``LOG_SPOOL_MAX_ATTEMPTS`` times, whatever the error,
+        is set aside so the ones behind it can go through.
+        """
+        if not self.spool:
+            return True
+        if time.monotonic() < self.spool_retry_at:
+            return False
+        live = self.pending_lines, self.pending_denied
+        self.pending_lines, self.pending_denied = [], []
+        replayed = 0
+        failing = None
+        try:
+            metadata = self.session.query(LogMetadata).first()
+            checkpoints = self.spool.checkpoints()
+            start = 0
+            if metadata:
+                stored = (metadata.last_position, metadata.last_inode)
+                for index, checkpoint in enumerate(checkpoints):
+                    if checkpoint == stored:
+                        start = index + 1
+            for index, record in enumerate(self.spool.records()):
+                if index < start:
+                    continue
+                for log_data in record.lines:
+                    pending = (
+                        self.pending_denied
+                        if log_data["is_denied"]
+                        else self.pending_lines
+                    )
+                    pending.append(log_data)
+                failing = record
+                # A record failing integrity checks is set aside by write_batch
+                self.write_batch(record.position, record.inode)
+                failing = None
+                replayed += line_count(record.lines)
+        except SQLAlchemyError as e:
+            self.spool_retry_at = time.monotonic() + LOG_SPOOL_RETRY_SECONDS
+            if failing is not None and self._replay_failed(failing, e):
+                # Go on with the batches behind it right away
+                self.spool_retry_at = 0.0
+                return False
+            logger.warning(f"Database still unavailable, keeping the spool: {e}")
+            self.discard_staged()
+            return False
+        finally:
+            self.pending_lines, self.pending_denied = live
+            self.replayed_lines += replayed
+        self.spool.clear()
+        self.replay_failures.clear()
+        logger.info(f"Replayed {replayed} spooled lines")
+        return True
+
+    def _replay_failed(self, record, error) -> bool:
+        """Count a failed replay of ``record``; True once it was set aside."""
+        key = (record.position, record.inode)
+        failures = self.replay_failures[key] = self.replay_failures.get(key, 0) + 1
+        if failures < LOG_SPOOL_MAX_ATTEMPTS:
+            return False
+        logger.error(
+            f"Spooled batch up to {record.position} failed {failures} replays: {error}"
+        )
+        try:
+            if not self.reject_batch(record.position, record.inode):
+                return False
+        except SQLAlchemyError as e:
+            # The database is unreachable after all; the batch stays spooled
+            logger.warning(f"Could not commit past the spooled batch: {e}")
+            self.session.rollback()
+            return False
+        del self.replay_failures[key]
+        return True
+
+    def stage_pending_lines(self):
+        """Date the buffered lines, resolve their users and queue their rows.
+
+        Timestamps are converted for the whole batch at once; each line goes
+        to the daily tables of the day squid logged it. Users are resolved
+        before the lines leave the buffers, so a database error there leaves
+        the batch buffered for the retry.
+        """
+        now = datetime.now()
+        memo = {}
+        lines, denied = self.pending_lines, self.pending_denied
+        by_day = {}
+        if lines:
+            stamps = batch_created_at(lines, now, memo)
+            for log_data, (created_at, date_suffix) in zip(lines, stamps):
+                by_day.setdefault(date_suffix, []).append((log_data, created_at))
+        days = []
+        for date_suffix, entries in sorted(by_day.items()):
+            day = self.day(date_suffix)
+            user_keys = {(data["username"], data["ip"]) for data, _ in entries}
+            self.inserted_users += resolve_users(
+                self.session, day.user_model, day.user_cache, user_keys
+            )
+            days.append((day, entries))
+        self.pending_lines, self.pending_denied = [], []
+        self.batch_lines += len(lines) + len(denied)
+        if self.spool is not None:
+            self.uncommitted.extend(lines + denied)
+        for day, entries in days:
+            self._stage_day(day, entries)
+        if denied:
+            stamps = batch_created_at(denied, now, memo)
+            for log_data, (created_at, _) in zip(denied, stamps):
+                request_count = log_data.get("request_count", 1)
+                if self.aggregate:
+                    self.denied_aggregator.add(
+                        log_data,
+                        log_data.get("data_transmitted", 0),
+                        created_at,
+                        request_count,
+                    )
+                    continue
+                self.denied_to_insert.append(
+                    {
+                        "username": log_data["username"],
+                        "ip": log_data["ip"],
+                        "url": log_data["url"],
+                        "method": log_data.get("method", ""),
+                        "status": log_data.get("status", ""),
+                        "response": log_data.get("response"),
+                        "request_count": request_count,
+                        "data_transmitted": log_data.get("data_transmitted", 0),
+                        "created_at": created_at,
+                    }
+                )
+
+    def _stage_day(self, day: DayTables, entries):
+        rows = self.logs_to_insert.setdefault(day.log_model, [])
+        for log_data, created_at in entries:
+            user_key = (log_data["username"], log_data["ip"])
+            user_id = day.user_cache.get(user_key)
+            if user_id is None:
+                logger.error(f"Usuario no creado: {user_key}. Saltando línea")
+                continue
+            # Above 1 for lines the spool kept folded
+            request_count = log_data.get("request_count", 1)
+            domain_rev = url_domain_key(log_data["url"])
+            category_id, blacklisted = self.tagger.tag(domain_rev)
+            if self.aggregate:
+                new_row = day.aggregator.add(
+                    {
+                        "user_id": user_id,
+                        "url": log_data["url"],
+                        "domain_rev": domain_rev,
+                        "category_id": category_id,
+                        "blacklisted": blacklisted,
+                        "response": log_data["response"],
+                    },
+                    log_data["data_transmitted"],
+                    created_at,
+                    request_count,
+                )
+            else:
+                new_row = True
+                rows.append(
+                    {
+                        "user_id": user_id,
+                        "url": log_data["url"],
+                        "domain_rev": domain_rev,
+                        "category_id": category_id,
+                        "blacklisted": blacklisted,
+                        "response": log_data["response"],
+                        "request_count": request_count,
+                        "data_transmitted": log_data["data_transmitted"],
+                        "created_at": created_at,
+                    }
+                )
+            self.rollups.add(
+                day.day,
+                created_at.hour,
+                log_data["username"],
+                log_data["ip"],
+                log_data["url"],
+                log_data["response"],
+                request_count,
+                log_data["data_transmitted"],
+                created_at,
+                log_rows=int(new_row),
+            )
+
+    def ingest_line(self, line: str):
+        log_data = self.parse_line(line)
+        if not log_data:
+            return
+        denied = log_data["is_denied"]
+        pending = self.pending_denied if denied else self.pending_lines
+        pending.append(log_data)
+        count = len(pending)
+        if count < self.sizer.size:
+            return
+        if self.aggregate and not self.aggregates_due():
+            return
+        if self.commit_batch():
+            if denied and not self.aggregate:
+                logger.info(
+                    f"Batch denied_logs inserted successfully. Records: {count}"
+                )
+        else:
+            logger.error("Error committing batch. Continuing with next batch")
+
+    def aggregates_due(self) -> bool:
+        """Fold the buffered lines in; True once an aggregation window is due."""
+        try:
+            self.stage_pending_lines()
+        except SQLAlchemyError as e:
+            logger.error(f"Error resolving users for batch: {e}")
+            self.session.rollback()
+            return True
+        return any(aggregator.due() for aggregator in self.aggregators)
+
+    def read_available(
+        self, max_seconds: float | None = None, max_lines: int | None = None
+    ) -> int:
+        """Ingest the complete lines available now; returns how many were read.
+
+        The budget is checked every ``BATCH_SIZE`` lines, leaving the rest of
+        the backlog for the next call.
+        """
+        start_time = time.time()
+        read_lines = 0
+        if not self.format_detected:
+            # Files opened empty, typically right after logrotate
+            self.detect_format()
+        for line in self.reader.read_lines():
+            read_lines += 1
+            self.ingest_line(line)
+            if read_lines % BATCH_SIZE == 0 and (
+                (max_seconds and time.time() - start_time >= max_seconds)
+                or (max_lines and read_lines >= max_lines)
+            ):
+                logger.info(
+                    f"Run budget reached after {read_lines} lines; "
+                    "the rest of the backlog is left for the next run"
+                )
+                break
+        self.processed_lines += read_lines
+        if read_lines and self.oldest_pending is None and self.has_pending():
+            self.oldest_pending = time.monotonic()
+        return read_lines
+
+    def flush_if_due(self, max_age: float) -> bool:
+        """Commit buffered rows once the oldest has waited ``max_age`` seconds.
+
+        When aggregating, lines that old are only folded in; the aggregates
+        are written once per ``LOG_AGGREGATE_WINDOW``.
+        """
+        if self.oldest_pending is None:
+            if self.spool:
+                # Nothing new to write; drain the spool once the database is back
+                self.replay_spool()
+            return False
+        if time.monotonic() - self.oldest_pending < max_age:
+            return False
+        if self.aggregate and not self.aggregates_due():
+            return False
+        if not self.commit_batch():
+            logger.error("Error committing batch. Continuing with next batch")
+        return True
+
+    def flush_delay(self, max_age: float) -> float | None:
+        """Seconds until :meth:`flush_if_due` has work to do; None when idle."""
+        if self.oldest_pending is None:
+            return None
+        delay = max(0.0, max_age - (time.monotonic() - self.oldest_pending))
+        if delay or not self.aggregate or self.pending_lines or self.pending_denied:
+            return delay
+        # Everything is folded in: wait for the first window to close
+        delays = [aggregator.seconds_until_due() for aggregator in self.aggregators]
+        return min((d for d in delays if d is not None), default=None)
+
+    def status(self) -> dict:
+        """Counters of this ingester, for the daemon's status socket."""
+        return {
+            "position": self.reader.position if self._file is not None else None,
+            "processed_lines": self.processed_lines,
+            "inserted_logs": self.inserted_logs,
+            "inserted_users": self.inserted_users,
+            "inserted_denied": self.inserted_denied,
+            "spooled_lines": self.spooled_lines,
+            "replayed_lines": self.replayed_lines,
+            "rejected_lines": self.rejected_lines,
+            "spool_bytes": self.spool.size if self.spool is not None else 0,
+            "pending_seconds": (
+                time.monotonic() - self.oldest_pending
+                if self.oldest_pending is not None
+                else None
+            ),
+            "last_commit": self.last_commit,
+            "batch_size": self.sizer.size,
+            **self.timings.stats(),
+        }
+
+    def log_stats(self):
+        elapsed = time.time() - self.start_time
+        logger.info(f"Processing completed. Lines: {self.processed_lines}")
+        logger.info(
+            f"Logs inserted: {self.inserted_logs}, New users: {self.inserted_users}, Denied: {self.inserted_denied}"
+        )
+        if self.spooled_lines or self.replayed_lines or self.rejected_lines:
+            logger.info(
+                f"Spooled lines: {self.spooled_lines}, "
+                f"replayed from the spool: {self.replayed_lines}, "
+                f"rejected: {self.rejected_lines}"
+            )
+        timings = self.timings.stats()
+        logger.info(
+            f"Batch size: {self.sizer.size} "
+            f"(bounds {self.sizer.min_size}-{self.sizer.max_size}, "
+            f"grown {self.sizer.grown}x, shrunk {self.sizer.shrunk}x); "
+            f"commits: {timings['commits']} ({timings['failed_commits']} failed), "
+            f"{timings['lines_per_commit']} lines each, "
+            f"avg {timings['avg_commit_ms']} ms, p95 {timings['p95_commit_ms']} ms, "
+            f"slowest {timings['slowest_commit_ms']} ms"
+        )
+        totals = {}
+        for aggregator, before in self.stats_before.items():
+            name = "denied" if aggregator is self.denied_aggregator else "log"
+            total = totals.setdefault(name, [0, 0, 0])
+            after = aggregator.stats()
+            for index, field in enumerate(("rows_in", "rows_out", "rows_updated")):
+                total[index] += after[field] - before[field]
+        for name, (rows_in, rows_out, rows_updated) in sorted(totals.items()):
+            logger.info(
+                f"Aggregated {name} rows: in={rows_in}, out={rows_out}, "
+                f"updated={rows_updated}, ratio={rows_in / max(rows_out, 1):.1f}x"
+            )
+        logger.info(
+            f"Time: {elapsed:.2f}s, Speed: {self.processed_lines / max(elapsed, 1e-6):.2f} lps"
+        )
+
+
+def process_logs(
+    log_file, max_seconds: float | None = None, max_lines: int | None = None
+):
+    """Ingest new access.log lines, stopping once the run budget is spent.
+
+    The budget (``LOG_RUN_MAX_SECONDS``/``LOG_RUN_MAX_LINES`` by default) is
+    checked every ``BATCH_SIZE`` lines; the remaining backlog is picked up by
+    the next run from the committed checkpoint.
+    """
+    max_seconds = LOG_RUN_MAX_SECONDS if max_seconds is None else max_seconds
+    max_lines = LOG_RUN_MAX_LINES if max_lines is None else max_lines
     if not os.path.exists(log_file):
         logger.error(f"File not found: {log_file}")
         return
@@ -294,173 +1247,21 @@ def process_logs(log_file):
             logger.error(f"Error creating dynamic tables: {e}")
             return
     try:
-        current_inode = get_file_inode(log_file)
-        file_size = os.path.getsize(log_file)
-        date_suffix = datetime.now().strftime("%Y%m%d")
-        DynamicUser, DynamicLog = get_dynamic_models(date_suffix)
         with DatabaseManager() as session:
-            metadata = session.query(LogMetadata).first()
-            last_position = metadata.last_position if metadata else 0
-            if metadata:
-                if metadata.last_inode != current_inode:
+            ingester = LogIngester(log_file, session)
+            ingester.open()
+            try:
+                ingester.read_available(max_seconds, max_lines)
+                if ingester.reader.pending_bytes:
                     logger.info(
-                        f"Inode changed: {metadata.last_inode} -> {current_inode}. Resetting position."
+                        f"Leaving {ingester.reader.pending_bytes} bytes of an incomplete line for the next run"
                     )
-                    last_position = 0
-                elif file_size < last_position:
-                    logger.warning(
-                        f"File truncated (size: {file_size} < position: {last_position})"
-                    )
-                    last_position = 0
-            logger.info(f"Reading from position: {last_position}")
-            user_cache = {}
-            logs_to_insert, new_users_to_insert, denied_to_insert = [], [], []
-            processed_lines = inserted_logs = inserted_users = inserted_denied = 0
-            start_time = time.time()
-
-            def commit_batch():
-                nonlocal inserted_logs, inserted_users, inserted_denied
-                retry_count = 0
-                user_table, log_table = get_dynamic_table_names()
-                while retry_count < MAX_RETRIES:
-                    try:
-                        if new_users_to_insert:
-                            session.bulk_save_objects(new_users_to_insert)
-                            session.flush()
-                            for user in new_users_to_insert:
-                                user_cache[(user.username, user.ip)] = user.id
-                            inserted_users += len(new_users_to_insert)
-                            new_users_to_insert.clear()
-                        if logs_to_insert:
-                            session.bulk_insert_mappings(DynamicLog, logs_to_insert)
-                            inserted_logs += len(logs_to_insert)
-                            logs_to_insert.clear()
-                        if denied_to_insert:
-                            session.bulk_save_objects(denied_to_insert)
-                            inserted_denied += len(denied_to_insert)
-                            denied_to_insert.clear()
-                        session.commit()
-                        return True
-                    except IntegrityError as e:
-                        logger.warning(
-                            f"Integrity error (retry {retry_count + 1}): {e}"
-                        )
-                        session.rollback()
-                        retry_count += 1
-                        if new_users_to_insert:
-                            for user in new_users_to_insert:
-                                key = (user.username, user.ip)
-                                if key in user_cache:
-                                    del user_cache[key]
-                    except SQLAlchemyError as e:
-                        logger.error(f"Database error: {e}")
-                        session.rollback()
-                        break
-                return False
-
-            with open(log_file, encoding="utf-8", errors="replace") as f:
-                f.seek(last_position)
-                current_position = last_position
-                for line in f:
-                    processed_lines += 1
-                    current_position += len(line.encode("utf-8"))
-                    log_data = parse_log_line(line)
-                    if not log_data:
-                        continue
-                    if log_data["is_denied"]:
-                        denied_entry = DeniedLog(
-                            username=log_data["username"],
-                            ip=log_data["ip"],
-                            url=log_data["url"],
-                            method=log_data.get("method", ""),
-                            status=log_data.get("status", ""),
-                            response=log_data.get("response"),
-                            data_transmitted=log_data.get("data_transmitted", 0),
-                            created_at=datetime.now(),
-                        )
-                        denied_to_insert.append(denied_entry)
-                        if len(denied_to_insert) >= BATCH_SIZE:
-                            if commit_batch():
-                                logger.info(
-                                    f"Batch denied_logs inserted successfully. Records: {BATCH_SIZE}"
-                                )
-                            else:
-                                logger.error(
-                                    "Error committing denied batch. Continuing with next batch"
-                                )
-                        continue
-                    user_key = (log_data["username"], log_data["ip"])
-                    user_id = user_cache.get(user_key)
-                    if user_id is None:
-                        existing_user = (
-                            session.query(DynamicUser)
-                            .filter_by(username=log_data["username"], ip=log_data["ip"])
-                            .first()
-                        )
-                        if existing_user:
-                            user_id = existing_user.id
-                            user_cache[user_key] = user_id
-                        else:
-                            new_user = DynamicUser(
-                                username=log_data["username"], ip=log_data["ip"]
-                            )
-                            new_users_to_insert.append(new_user)
-                            user_cache[user_key] = None
-                            user_id = None
-                    if user_id is None:
-                        if not commit_batch():
-                            logger.error(
-                                "Critical error committing batch. Aborting batch"
-                            )
-                            continue
-                        existing_user = (
-                            session.query(DynamicUser)
-                            .filter_by(username=log_data["username"], ip=log_data["ip"])
-                            .first()
-                        )
-                        if existing_user:
-                            user_id = existing_user.id
-                            user_cache[user_key] = user_id
-                        else:
-                            logger.error(
-                                f"Usuario no creado: {user_key}. Saltando línea"
-                            )
-                            continue
-                    logs_to_insert.append(
-                        {
-                            "user_id": user_id,
-                            "url": log_data["url"],
-                            "response": log_data["response"],
-                            "request_count": 1,
-                            "data_transmitted": log_data["data_transmitted"],
-                            "created_at": datetime.now(),
-                        }
-                    )
-                    if len(logs_to_insert) >= BATCH_SIZE:
-                        if not commit_batch():
-                            logger.error(
-                                "Error committing batch. Continuing with next batch"
-                            )
-            # Commit any remaining items that didn't fill a full batch
-            if logs_to_insert or new_users_to_insert or denied_to_insert:
-                if not commit_batch():
+                # Commit the remaining items together with the final offset
+                if not ingester.commit_batch():
                     logger.error("Final commit_batch failed for remaining items")
-            if not metadata:
-                metadata = LogMetadata()
-                session.add(metadata)
-            metadata.last_position = current_position
-            metadata.last_inode = current_inode
-            # Align with LogMetadata model's column
-            metadata.updated_at = datetime.now()
-            session.commit()
-            elapsed = time.time() - start_time
-            logger.info(f"Processing completed. Lines: {processed_lines}")
-            logger.info(
-                f"Logs inserted: {inserted_logs}, New users: {inserted_users}, Denied: {inserted_denied}"
-            )
-            logger.info(
-                f"Time: {elapsed:.2f}s, Speed: {processed_lines / elapsed:.2f} lps"
-            )
+            finally:
+                ingester.close()
+            ingester.log_stats()
     except Exception as e:
         logger.critical(f"Critical error in process_logs: {e}", exc_info=True)
         raise
@@ -0,0 +1,163 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+
+
+class LogAggregator:
+    """Folds parsed log lines in memory and upserts one row per key and window.
+
+    Lines sharing the same key inside a flush window are collapsed into a
+    single row whose ``request_count`` and ``data_transmitted`` are the sums of
+    the folded lines. Rows written earlier in the same window stay "open" and
+    later flushes increment them instead of inserting new ones.
+    """
+
+    def __init__(
+        self, model, key_fields: tuple[str, ...], window_seconds: int, max_pending=500
+    ):
+        self.model = model
+        self.key_fields = key_fields
+        self.window_seconds = max(1, int(window_seconds))
+        self.max_pending = max_pending
+        self.pending: dict[tuple, list] = {}
+        self.open_rows: dict[tuple, int] = {}
+        self._inflight: dict[tuple, list] = {}
+        self._staged_rows: dict[tuple, int] = {}
+        self._last_flush = time.monotonic()
+        self._latest_window = 0
+        self._pending_out = self._pending_updated = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.rows_updated = 0
+
+    def _window(self, timestamp: float) -> int:
+        return int(timestamp // self.window_seconds)
+
+    def add(
+        self,
+        values: dict,
+        data_transmitted: int,
+        created_at: datetime | None = None,
+        request_count: int = 1,
+    ) -> bool:
+        """Fold ``request_count`` lines in; True when they open a new row."""
+        created_at = created_at or datetime.now()
+        window = self._window(created_at.timestamp())
+        if window > self._latest_window:
+            self._latest_window = window
+        key = (window,) + tuple(values[field] for field in self.key_fields)
+        self.rows_in += request_count
+        entry = self.pending.get(key)
+        if entry is None:
+            self.pending[key] = [request_count, data_transmitted or 0, created_at]
+            return key not in self.open_rows
+        entry[0] += request_count
+        entry[1] += data_transmitted or 0
+        return False
+
+    def due(self) -> bool:
+        if len(self.pending) >= self.max_pending:
+            return True
+        return bool(self.pending) and (
+            time.monotonic() - self._last_flush >= self.window_seconds
+        )
+
+    def seconds_until_due(self) -> float | None:
+        if not self.pending:
+            return None
+        if len(self.pending) >= self.max_pending:
+            return 0.0
+        elapsed = time.monotonic() - self._last_flush
+        return max(0.0, self.window_seconds - elapsed)
+
+    def flush(self, session):
+        """Write pending aggregates through ``session`` without committing.
+
+        Call :meth:`committed` or :meth:`rolled_back` once the surrounding
+        transaction has been resolved.
+        """
+        self._last_flush = time.monotonic()
+        if not self.pending:
+            return
+        self._inflight, self.pending = self.pending, {}
+
+        new_rows, increments = [], []
+        for key, (count, data, created_at) in self._inflight.items():
+            row_id = self.open_rows.get(key)
+            if row_id is not None:
+                increments.append({"_id": row_id, "_count": count, "_data": data})
+                continue
+            row = self.model(
+                **dict(zip(self.key_fields, key[1:])),
+                request_count=count,
+                data_transmitted=data,
+                created_at=created_at,
+            )
+            new_rows.append((key, row))
+
+        if new_rows:
+            session.add_all([row for _, row in new_rows])
+            session.flush()
+            for key, row in new_rows:
+                self._staged_rows[key] = row.id
+            # Keep the session light: the rows are tracked through open_rows
+            for _, row in new_rows:
+                session.expunge(row)
+
+        if increments:
+            table = self.model.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("_id"))
+                .values(
+                    request_count=table.c.request_count + bindparam("_count"),
+                    data_transmitted=table.c.data_transmitted + bindparam("_data"),
+                )
+            )
+            session.execute(stmt, increments)
+
+        self._pending_out = len(new_rows)
+        self._pending_updated = len(increments)
+
+    def committed(self):
+        if not self._inflight:
+            return
+        self.open_rows.update(self._staged_rows)
+        self.rows_out += self._pending_out
+        self.rows_updated += self._pending_updated
+        self._inflight = {}
+        self._staged_rows = {}
+        self._prune_closed_windows()
+
+    def rolled_back(self):
+        """Put the in-flight aggregates back so the next flush retries them."""
+        for key, (count, data, created_at) in self._inflight.items():
+            entry = self.pending.get(key)
+            if entry is None:
+                self.pending[key] = [count, data, created_at]
+            else:
+                entry[0] += count
+                entry[1] += data
+        self._inflight = {}
+        self._staged_rows = {}
+
+    def discard(self):
+        """Drop every aggregate not yet committed (e.g. once it was spooled)."""
+        self.pending = {}
+        self._inflight = {}
+        self._staged_rows = {}
+
+    def _prune_closed_windows(self):
+        self.open_rows = {
+            key: row_id
+            for key, row_id in self.open_rows.items()
+            if key[0] >= self._latest_window
+        }
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_updated": self.rows_updated,
+        }
@@ -0,0 +1,193 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+from config import Config
+from database.database import get_session
+from parsers.log import LogIngester
+
+logger = logging.getLogger(__name__)
+
+# Commit buffered rows once the oldest has waited this long (seconds)
+LOG_FOLLOW_MAX_DELAY = getattr(Config, "LOG_FOLLOW_MAX_DELAY", 0.5)
+# Longest sleep between checks; the only wake-up source without inotify
+LOG_FOLLOW_POLL_INTERVAL = getattr(Config, "LOG_FOLLOW_POLL_INTERVAL", 1.0)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Waits for changes to one file through inotify on its directory.
+
+    Watching the directory rather than the file keeps working across
+    logrotate's rename/create of access.log.
+    """
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.name = os.path.basename(path).encode()
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO
+        mask |= IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """Block until the file changes or ``timeout`` expires."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        changed = False
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+            changed = changed or name == self.name
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback for systems without inotify: wakes up on a fixed interval."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def wait(self, timeout: float) -> bool:
+        time.sleep(min(timeout, self.interval))
+        return True
+
+    def close(self):
+        pass
+
+
+def make_watcher(path: str, poll_interval: float = LOG_FOLLOW_POLL_INTERVAL):
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError) as e:
+        logger.info(f"inotify not available ({e}); polling every {poll_interval}s")
+        return PollingWatcher(poll_interval)
+
+
+class LogFollower:
+    """Tails access.log continuously, committing batches within a fraction
+    of a second instead of waiting for the next scheduler run.
+
+    The file stays open between reads; logrotate is detected through the
+    inode check in ``get_file_inode`` and the old file is drained before
+    switching to the new one.
+    """
+
+    def __init__(
+        self,
+        log_file: str,
+        max_delay: float = LOG_FOLLOW_MAX_DELAY,
+        poll_interval: float = LOG_FOLLOW_POLL_INTERVAL,
+    ):
+        self.log_file = log_file
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.reopen_event = threading.Event()
+        self.ingester = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def request_reopen(self):
+        """Finish the open file and reopen log_file (e.g. on SIGHUP)."""
+        self.reopen_event.set()
+
+    def status(self) -> dict:
+        status = {
+            "log_file": self.log_file,
+            "following": not self.stop_event.is_set(),
+        }
+        ingester = self.ingester
+        if ingester is not None and ingester.reader is not None:
+            status.update(ingester.status())
+        return status
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if not os.path.exists(self.log_file):
+                logger.error(f"Log file not found: {self.log_file}")
+                self.stop_event.wait(self.poll_interval)
+                continue
+            session = get_session()
+            watcher = make_watcher(self.log_file, self.poll_interval)
+            self.ingester = None
+            try:
+                self.ingester = LogIngester(self.log_file, session)
+                self.ingester.open()
+                self._follow(watcher)
+            except Exception as e:
+                logger.error(f"Error following {self.log_file}: {e}", exc_info=True)
+                self.stop_event.wait(self.poll_interval)
+            finally:
+                if self.ingester is not None:
+                    self.ingester.close()
+                watcher.close()
+                session.close()
+        logger.info(f"Stopped following {self.log_file}")
+
+    def _follow(self, watcher):
+        ingester = self.ingester
+        logger.info(f"Following {self.log_file}")
+        try:
+            while not self.stop_event.is_set():
+                ingester.read_available()
+                ingester.flush_if_due(self.max_delay)
+                if self.reopen_event.is_set() or ingester.rotated():
+                    self.reopen_event.clear()
+                    logger.info(f"Switching to the file now at {self.log_file}")
+                    ingester.reopen()
+                    continue
+                timeout = self.poll_interval
+                delay = ingester.flush_delay(self.max_delay)
+                if delay is not None:
+                    timeout = min(timeout, delay)
+                watcher.wait(timeout)
+        finally:
+            if not ingester.commit_batch():
+                logger.error("Final commit_batch failed for remaining items")
+
+
+_follower = None
+_follower_lock = threading.Lock()
+
+
+def start_log_follower(log_file: str) -> LogFollower:
+    """Start the follower in a daemon thread (once per process)."""
+    global _follower
+    with _follower_lock:
+        if _follower is None:
+            _follower = LogFollower(log_file)
+            threading.Thread(
+                target=_follower.run, name="log-follower", daemon=True
+            ).start()
+    return _follower
@@ -0,0 +1,305 @@
+"""Bulk import of rotated access.log files (access.log.1, access.log.2.gz, ...).
+
+Plain files are split into byte ranges aligned on line boundaries and parsed in
+a process pool. Compressed files cannot be split, so the parent decompresses
+them as a stream and hands the workers blocks of the same size, read only as
+the workers free up.
+Rows are routed to the ``log_YYYYMMDD`` table of the day squid logged them and
+users are merged into that day's ``user_YYYYMMDD`` table by the parent process,
+which is the only one talking to the database.
+
+Usage: python -m parsers.log_import [--workers N] [--chunk-mb N] [FILE ...]
+
+Without files, the rotated siblings of ``SQUID_LOG`` are imported, oldest
+first. The live log is always left to ``process_logs``/the follower, which
+track it through their own checkpoint. Imported rows are appended, so each
+file should be imported once.
+"""
+
+import argparse
+import glob
+import gzip
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from database.bulk_writers import get_bulk_writer
+from database.categories import get_domain_tagger
+from database.database import DeniedLog, get_dynamic_models, get_session
+from database.rollups import RollupAccumulator
+from parsers.log import (
+    batch_created_at,
+    get_line_parser,
+    preload_user_cache,
+    resolve_users,
+)
+from utils.domains import url_domain_key
+
+logger = logging.getLogger(__name__)
+
+# Size of the byte range (or decompressed block) handed to each worker
+IMPORT_CHUNK_SIZE = 32 * 1024 * 1024
+# Chunks in flight per worker; bounds the parsed rows waiting for the parent
+IMPORT_QUEUE_DEPTH = 2
+
+
+def rotated_logs(log_file: str) -> list[str]:
+    """Rotated siblings of ``log_file``, oldest (highest suffix) first."""
+
+    def rotation_index(path):
+        match = re.match(r"\.(\d+)", path[len(log_file) :])
+        return int(match.group(1)) if match else 0
+
+    paths = [
+        path
+        for path in glob.glob(glob.escape(log_file) + ".*")
+        if rotation_index(path) > 0
+    ]
+    return sorted(paths, key=rotation_index, reverse=True)
+
+
+def split_ranges(path: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """Split a plain log into ``(start, end)`` byte ranges ending on a newline."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def gzip_blocks(path: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """Decompress ``path`` lazily into blocks of about ``chunk_size`` bytes.
+
+    Each block ends on a newline, so no line is split between two workers.
+    """
+    with gzip.open(path, "rb") as f:
+        while block := f.read(chunk_size):
+            yield block + f.readline()
+
+
+def import_tasks(path: str, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """The ``parse_range`` tasks of one file, produced as they are consumed."""
+    fallback_ts = os.path.getmtime(path)
+    if path.endswith(".gz"):
+        for block in gzip_blocks(path, chunk_size):
+            yield path, block, fallback_ts
+        return
+    for byte_range in split_ranges(path, chunk_size):
+        yield path, byte_range, fallback_ts
+
+
+def _read_chunk(path: str, chunk: tuple[int, int] | bytes) -> list[bytes]:
+    if isinstance(chunk, bytes):
+        return chunk.splitlines(keepends=True)
+    start, end = chunk
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).splitlines(keepends=True)
+
+
+def parse_range(task) -> tuple[int, dict]:
+    """Parse one chunk of a log in a worker process.
+
+    ``task`` is ``(path, chunk, fallback_ts)``, the chunk being a
+    ``(start, end)`` byte range of a plain file or a decompressed block.
+    Returns the number of lines read and, per date suffix, the log rows as
+    ``(username, ip, url, response, data_transmitted, created_at)`` tuples and
+    the denied rows as dicts ready for ``denied_logs``. Lines without a
+    timestamp are dated ``fallback_ts`` (the file's mtime).
+    """
+    path, chunk, fallback_ts = task
+    parse_line = get_line_parser(path)
+    parsed = []
+    lines = 0
+    for raw in _read_chunk(path, chunk):
+        lines += 1
+        try:
+            line = raw.decode()
+        except UnicodeDecodeError:
+            line = raw.decode("utf-8", errors="replace")
+        log_data = parse_line(line)
+        if log_data:
+            parsed.append(log_data)
+
+    days = {}
+    stamps = batch_created_at(parsed, datetime.fromtimestamp(fallback_ts))
+    for log_data, (created_at, date_suffix) in zip(parsed, stamps):
+        logs, denied = days.setdefault(date_suffix, ([], []))
+        if log_data["is_denied"]:
+            denied.append(
+                {
+                    "username": log_data["username"],
+                    "ip": log_data["ip"],
+                    "url": log_data["url"],
+                    "method": log_data.get("method", ""),
+                    "status": log_data.get("status", ""),
+                    "response": log_data.get("response"),
+                    "data_transmitted": log_data.get("data_transmitted", 0),
+                    "request_count": 1,
+                    "created_at": created_at,
+                }
+            )
+            continue
+        logs.append(
+            (
+                log_data["username"],
+                log_data["ip"],
+                log_data["url"],
+                log_data["response"],
+                log_data["data_transmitted"],
+                created_at,
+            )
+        )
+    return lines, days
+
+
+class BacklogImporter:
+    """Writes the rows parsed by the workers, one transaction per range."""
+
+    def __init__(self, session):
+        self.session = session
+        self.user_caches = {}
+        self.rollups = RollupAccumulator()
+        self.writer = get_bulk_writer()
+        self.tagger = get_domain_tagger(session)
+        self.lines = self.inserted_logs = self.inserted_denied = 0
+        self.inserted_users = 0
+
+    def _day(self, date_suffix: str):
+        user_model, log_model = get_dynamic_models(date_suffix)
+        if date_suffix not in self.user_caches:
+            self.user_caches[date_suffix] = preload_user_cache(self.session, user_model)
+        return user_model, log_model, self.user_caches[date_suffix]
+
+    def _log_row(self, user_cache, username, ip, url, response, size, created_at):
+        domain_rev = url_domain_key(url)
+        category_id, blacklisted = self.tagger.tag(domain_rev)
+        return {
+            "user_id": user_cache[(username, ip)],
+            "url": url,
+            "domain_rev": domain_rev,
+            "category_id": category_id,
+            "blacklisted": blacklisted,
+            "response": response,
+            "request_count": 1,
+            "data_transmitted": size,
+            "created_at": created_at,
+        }
+
+    def write(self, lines: int, days: dict):
+        session = self.session
+        for date_suffix, (logs, denied) in sorted(days.items()):
+            user_model, log_model, user_cache = self._day(date_suffix)
+            self.inserted_users += resolve_users(
+                session, user_model, user_cache, {(row[0], row[1]) for row in logs}
+            )
+            day = datetime.strptime(date_suffix, "%Y%m%d").date()
+            for username, ip, url, response, size, created_at in logs:
+                self.rollups.add(
+                    day,
+                    created_at.hour,
+                    username,
+                    ip,
+                    url,
+                    response,
+                    1,
+                    size,
+                    created_at,
+                )
+            self.writer.write(
+                session,
+                log_model.__table__,
+                [self._log_row(user_cache, *log) for log in logs],
+            )
+            self.writer.write(session, DeniedLog.__table__, denied)
+            self.inserted_logs += len(logs)
+            self.inserted_denied += len(denied)
+        self.rollups.flush(session)
+        session.commit()
+        self.rollups.committed()
+        self.lines += lines
+
+
+def import_logs(
+    paths: list[str],
+    workers: int | None = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> BacklogImporter:
+    """Import ``paths`` with ``workers`` processes (default: one per core)."""
+    workers = workers or os.cpu_count() or 1
+    live_log = os.path.realpath(getattr(Config, "SQUID_LOG", ""))
+    imported = []
+    for path in paths:
+        if os.path.realpath(path) == live_log:
+            logger.warning(f"Skipping live log {path}; it is read by process_logs")
+            continue
+        imported.append(path)
+
+    session = get_session()
+    importer = BacklogImporter(session)
+    start_time = time.time()
+    logger.info(f"Importing {len(imported)} files, {workers} workers")
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Submit in order with a bounded window so results are written
+            # oldest first without holding every parsed chunk in memory;
+            # compressed files are only decompressed as far as the window
+            pending = deque()
+            tasks = (
+                task for path in imported for task in import_tasks(path, chunk_size)
+            )
+            for task in tasks:
+                pending.append(pool.submit(parse_range, task))
+                if len(pending) >= workers * IMPORT_QUEUE_DEPTH:
+                    break
+            while pending:
+                importer.write(*pending.popleft().result())
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(pool.submit(parse_range, task))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during import: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    elapsed = time.time() - start_time
+    logger.info(
+        f"Import completed. Lines: {importer.lines}, Logs: {importer.inserted_logs}, "
+        f"New users: {importer.inserted_users}, Denied: {importer.inserted_denied}"
+    )
+    logger.info(
+        f"Time: {elapsed:.2f}s, Speed: {importer.lines / max(elapsed, 1e-6):.2f} lps"
+    )
+    return importer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import rotated squid access logs")
+    parser.add_argument("files", nargs="*", help="defaults to SQUID_LOG.1, .2.gz...")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-mb", type=int, default=IMPORT_CHUNK_SIZE >> 20)
+    args = parser.parse_args()
+    paths = args.files or rotated_logs(Config.SQUID_LOG)
+    if not paths:
+        logger.error(f"No rotated logs found next to {Config.SQUID_LOG}")
+        return
+    import_logs(paths, args.workers, args.chunk_mb << 20)
+
+
+if __name__ == "__main__":
+    main()
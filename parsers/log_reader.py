@@ -0,0 +1,55 @@
+from collections.abc import Iterator
+from typing import BinaryIO
+
+# Read buffer for the access.log; large reads amortise syscalls
+CHUNK_SIZE = 1024 * 1024
+
+
+def open_log(log_file: str) -> BinaryIO:
+    return open(log_file, "rb", buffering=CHUNK_SIZE)
+
+
+class LogTailReader:
+    """Reads complete lines from a binary, buffered access.log handle.
+
+    Lines are handed out as raw bytes so byte offsets never require re-encoding:
+    ``position`` is simply the file offset, read on demand. A trailing line
+    without its newline is not consumed: the handle is moved back to its start
+    so a later :meth:`read_raw_lines` call (or the next run, resuming from
+    ``position``) reads it once the writer has finished it.
+    """
+
+    def __init__(self, f: BinaryIO, position: int = 0):
+        self.file = f
+        self.pending_bytes = 0
+        self.file.seek(position)
+
+    @property
+    def position(self) -> int:
+        """Offset just past the last complete line handed out."""
+        return self.file.tell()
+
+    def read_raw_lines(self) -> Iterator[bytes]:
+        """Yield each complete line (newline included) until EOF."""
+        self.pending_bytes = 0
+        for raw in self.file:
+            if raw[-1] != 10:  # b"\n"
+                self.pending_bytes = len(raw)
+                self.file.seek(-len(raw), 1)
+                return
+            yield raw
+
+    def read_lines(self) -> Iterator[str]:
+        """Yield each complete line decoded as UTF-8."""
+        self.pending_bytes = 0
+        for raw in self.file:
+            if raw[-1] != 10:
+                self.pending_bytes = len(raw)
+                self.file.seek(-len(raw), 1)
+                return
+            # Strict decoding is the fast path; only broken lines pay for
+            # the replacement error handler
+            try:
+                yield raw.decode()
+            except UnicodeDecodeError:
+                yield raw.decode("utf-8", errors="replace")
@@ -0,0 +1,215 @@
+"""Local write-ahead spool for parsed access.log batches.
+
+When the database rejects a batch (a restart, a dropped connection), the
+ingester appends the batch's parsed lines here instead of dropping them and
+keeps reading; the spooled batches are written to the database, in order,
+once it answers again.
+
+Records are ``<payload length><crc32><payload>`` and each append is
+fsync'd before the ingester moves on. The payload holds the log position
+and inode reached by the batch followed by its lines. A record torn by a
+crash fails its length or CRC check and is cut off when the spool is opened.
+
+In AGGREGATE mode the lines are spooled already folded (see
+:class:`FoldedLines`): each one carries the ``request_count`` and summed
+``data_transmitted`` of the lines it stands for, and the replay adds it to
+the aggregates like any other line.
+"""
+
+import math
+import os
+import struct
+import zlib
+from collections.abc import Iterator
+from typing import NamedTuple
+
+_HEADER = struct.Struct("<II")  # payload length, crc32 of the payload
+_BATCH = struct.Struct("<QQI")  # log position, log inode, line count
+# timestamp, is_denied, response, data_transmitted, request_count
+_LINE = struct.Struct("<d?iqI")
+_LENGTH = struct.Struct("<I")
+_NULL = 0xFFFFFFFF
+TEXT_FIELDS = ("username", "ip", "url", "method", "status")
+
+
+class SpoolRecord(NamedTuple):
+    position: int
+    inode: int
+    lines: list[dict]
+
+
+def encode_batch(lines: list[dict], position: int, inode: int) -> bytes:
+    parts = [_BATCH.pack(position, inode, len(lines))]
+    for log_data in lines:
+        timestamp = log_data.get("timestamp")
+        parts.append(
+            _LINE.pack(
+                math.nan if timestamp is None else timestamp,
+                bool(log_data.get("is_denied")),
+                log_data.get("response") or 0,
+                log_data.get("data_transmitted") or 0,
+                log_data.get("request_count", 1),
+            )
+        )
+        for field in TEXT_FIELDS:
+            value = log_data.get(field)
+            if value is None:
+                parts.append(_LENGTH.pack(_NULL))
+            else:
+                encoded = value.encode("utf-8", "surrogateescape")
+                parts.append(_LENGTH.pack(len(encoded)))
+                parts.append(encoded)
+    return b"".join(parts)
+
+
+def decode_batch(payload: bytes) -> SpoolRecord:
+    position, inode, count = _BATCH.unpack_from(payload)
+    offset = _BATCH.size
+    lines = []
+    for _ in range(count):
+        timestamp, is_denied, response, data_transmitted, request_count = (
+            _LINE.unpack_from(payload, offset)
+        )
+        offset += _LINE.size
+        log_data = {
+            "timestamp": None if math.isnan(timestamp) else timestamp,
+            "is_denied": is_denied,
+            "response": response,
+            "data_transmitted": data_transmitted,
+            "request_count": request_count,
+        }
+        for field in TEXT_FIELDS:
+            (length,) = _LENGTH.unpack_from(payload, offset)
+            offset += _LENGTH.size
+            if length == _NULL:
+                log_data[field] = None
+                continue
+            log_data[field] = payload[offset : offset + length].decode(
+                "utf-8", "surrogateescape"
+            )
+            offset += length
+        lines.append(log_data)
+    return SpoolRecord(position, inode, lines)
+
+
+def line_count(lines) -> int:
+    """Log lines behind ``lines``, counting what folded lines stand for."""
+    return sum(log_data.get("request_count", 1) for log_data in lines)
+
+
+class FoldedLines:
+    """Parsed lines folded per user, URL, response and aggregation window.
+
+    Holds the lines behind the aggregates not yet committed, which can span
+    a whole window, in as many entries as the window has distinct rows.
+    """
+
+    def __init__(self, window_seconds: int):
+        self.window_seconds = max(1, int(window_seconds))
+        self.lines: dict[tuple, dict] = {}
+
+    def extend(self, lines: list[dict]):
+        for log_data in lines:
+            timestamp = log_data.get("timestamp")
+            key = (
+                None if timestamp is None else int(timestamp // self.window_seconds),
+                log_data.get("is_denied"),
+                *(log_data.get(field) for field in TEXT_FIELDS),
+                log_data.get("response"),
+            )
+            entry = self.lines.get(key)
+            if entry is None:
+                self.lines[key] = {
+                    **log_data,
+                    "request_count": log_data.get("request_count", 1),
+                    "data_transmitted": log_data.get("data_transmitted") or 0,
+                }
+            else:
+                entry["request_count"] += log_data.get("request_count", 1)
+                entry["data_transmitted"] += log_data.get("data_transmitted") or 0
+
+    def clear(self):
+        self.lines.clear()
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.lines.values())
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+
+class LogSpool:
+    """Append-only file of parsed batches; one writer at a time."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = self._repair()
+
+    def _scan(self) -> Iterator[tuple[int, bytes]]:
+        """Yield ``(end offset, payload)`` of each intact record."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            offset = 0
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                length, checksum = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    return
+                offset += _HEADER.size + length
+                yield offset, payload
+
+    def _repair(self) -> int:
+        """Cut off a record left torn by a crash; returns the valid size."""
+        size = 0
+        for size, _ in self._scan():
+            pass
+        if os.path.exists(self.path) and os.path.getsize(self.path) != size:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+                os.fsync(f.fileno())
+        return size
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def append(self, lines: list[dict], position: int, inode: int):
+        """Write one batch and fsync it."""
+        payload = encode_batch(lines, position, inode)
+        created = not os.path.exists(self.path)
+        with open(self.path, "ab") as f:
+            f.write(_HEADER.pack(len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            # Make the new directory entry durable too
+            directory = os.open(
+                os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY
+            )
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        self.size += _HEADER.size + len(payload)
+
+    def records(self) -> Iterator[SpoolRecord]:
+        for _, payload in self._scan():
+            yield decode_batch(payload)
+
+    def checkpoints(self) -> list[tuple[int, int]]:
+        """``(position, inode)`` reached by each spooled batch, in order."""
+        return [_BATCH.unpack_from(payload)[:2] for _, payload in self._scan()]
+
+    def clear(self):
+        """Drop every record once they are all in the database."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.size = 0
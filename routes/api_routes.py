@@ -1,7 +1,8 @@
 from flask import Blueprint, current_app, jsonify, request
 
-from config import logger
-from database.database import get_session
+from config import Config, logger
+from database.database import dynamic_model_cache, get_read_session
+from services import audit_runner
 from services.auditoria_service import (
     find_by_ip,
     find_by_keyword,
@@ -16,8 +17,10 @@ from services.auditoria_service import (
     get_top_users_by_requests,
     get_user_activity_summary,
 )
+from services.ingest_status import read_ingest_status
 from services.metrics_service import MetricsService
 from services.notifications import get_commit_notifications
+from services.report_cache import report_cache
 
 api_bp = Blueprint("api", __name__)
 
@@ -52,11 +55,26 @@ def get_latest_metric():
         return jsonify({})
 
 
+@api_bp.route("/reports/cache-stats")
+def get_report_cache_stats():
+    return jsonify(report_cache.stats())
+
+
+@api_bp.route("/models/cache-stats")
+def get_model_cache_stats():
+    return jsonify(dynamic_model_cache.stats())
+
+
 @api_bp.route("/all-users", methods=["GET"])
 def api_get_all_users():
-    db = get_session()
+    # Typeahead: ?q=<prefix>&limit=<n>; without them the whole list
+    prefix = request.args.get("q", "").strip()
+    limit = request.args.get("limit", type=int)
+    if limit is not None and not 1 <= limit <= 1000:
+        return jsonify({"error": "limit must be between 1 and 1000"}), 400
+    db = get_read_session()
     try:
-        users = get_all_usernames(db)
+        users = get_all_usernames(db, prefix=prefix or None, limit=limit)
         return jsonify(users)
     except Exception as e:
         logger.exception("Error retrieving all users")
@@ -84,8 +102,10 @@ def api_run_audit():
     ip_address = data.get("ip_address")
     response_code = data.get("response_code")
     social_media_sites = data.get("social_media_sites")
+    audit_id = data.get("audit_id")
 
-    db = get_session()
+    db = get_read_session()
+    cancel = audit_runner.register(audit_id)
     try:
         if audit_type == "user_summary":
             if not username:
@@ -106,28 +126,32 @@ def api_run_audit():
                 return jsonify({"error": "End date is required."}), 400
             result = get_daily_activity(db, start_date, username)
         elif audit_type == "denied_access":
-            result = find_denied_access(db, start_date, end_date, username)
+            result = find_denied_access(
+                db, start_date, end_date, username, cancel=cancel
+            )
         elif audit_type == "keyword_search":
             if not keyword:
                 return jsonify({"error": "Keyword is required."}), 400
-            result = find_by_keyword(db, start_date, end_date, keyword, username)
+            result = find_by_keyword(
+                db, start_date, end_date, keyword, username, cancel=cancel
+            )
         elif audit_type == "social_media_activity":
             if not social_media_sites:
                 return jsonify(
                     {"error": "At least one social media site must be selected."}
                 ), 400
             result = find_social_media_activity(
-                db, start_date, end_date, social_media_sites, username
+                db, start_date, end_date, social_media_sites, username, cancel=cancel
             )
         elif audit_type == "ip_activity":
             if not ip_address:
                 return jsonify({"error": "IP address is required."}), 400
-            result = find_by_ip(db, start_date, end_date, ip_address)
+            result = find_by_ip(db, start_date, end_date, ip_address, cancel=cancel)
         elif audit_type == "response_code_search":
             if not response_code:
                 return jsonify({"error": "Response code is required."}), 400
             result = find_by_response_code(
-                db, start_date, end_date, int(response_code), username
+                db, start_date, end_date, int(response_code), username, cancel=cancel
             )
         else:
             return jsonify({"error": "Invalid audit type."}), 400
@@ -138,9 +162,31 @@ def api_run_audit():
         logger.error(f"Error en la API de auditoría: {e}")
         return jsonify({"error": "Internal server error"}), 500
     finally:
+        audit_runner.release(audit_id)
         db.close()
 
 
+@api_bp.route("/run-audit/cancel", methods=["POST"])
+def api_cancel_audit():
+    # Sent with navigator.sendBeacon when the audit page is left
+    data = request.get_json(force=True, silent=True) or {}
+    audit_id = data.get("audit_id")
+    if not audit_id:
+        return jsonify({"error": "audit_id is required."}), 400
+    return jsonify({"cancelled": audit_runner.cancel(audit_id)})
+
+
+# Estado del proceso de ingesta (squidstats-ingest)
+@api_bp.route("/ingest/status", methods=["GET"])
+def api_ingest_status():
+    if not getattr(Config, "LOG_INGEST_DAEMON", False):
+        return jsonify({"daemon": False})
+    status = read_ingest_status()
+    if status is None:
+        return jsonify({"daemon": True, "running": False}), 503
+    return jsonify({"daemon": True, "running": True, **status})
+
+
 # API para notificaciones del sistema
 @api_bp.route("/notifications", methods=["GET"])
 def api_get_notifications():
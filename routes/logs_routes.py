@@ -1,11 +1,12 @@
-import os
 from datetime import datetime
 
 from flask import Blueprint, current_app, jsonify, render_template, request
+from sqlalchemy.exc import SQLAlchemyError
 
 from config import logger
-from database.database import get_session
-from services.blacklist_users import find_blacklisted_sites
+from database.categories import blacklist_entries
+from database.database import get_read_session
+from services.blacklist_users import find_blacklisted_page
 from services.fetch_data_logs import get_users_logs
 
 logs_bp = Blueprint("logs", __name__)
@@ -14,7 +15,7 @@ logs_bp = Blueprint("logs", __name__)
 @logs_bp.route("/logs")
 def logs():
     try:
-        db = get_session()
+        db = get_read_session()
         users_data = get_users_logs(db)
 
         return render_template(
@@ -40,7 +41,7 @@ def get_logs_by_date():
         selected_date = datetime.strptime(date_str, "%Y-%m-%d")
         date_suffix = selected_date.strftime("%Y%m%d")
 
-        db = get_session()
+        db = get_read_session()
         users_data = get_users_logs(
             db, date_suffix, page=page, per_page=per_page, search=search
         )
@@ -63,36 +64,37 @@ def get_logs_by_date():
             db.close()
 
 
+def _blacklist_page_args():
+    per_page = request.args.get("per_page", 20, type=int)
+    if per_page < 1 or per_page > 100:
+        raise ValueError("per_page must be between 1 and 100")
+    return {
+        "per_page": per_page,
+        "after": request.args.get("after") or None,
+        "before": request.args.get("before") or None,
+    }
+
+
 @logs_bp.route("/blacklist", methods=["GET"])
 def blacklist_logs():
     db = None
     try:
-        # Obtener parámetros de paginación
-        page = request.args.get("page", 1, type=int)
-        per_page = request.args.get("per_page", 20, type=int)
-
-        # Validar parámetros
-        if page < 1 or per_page < 1 or per_page > 100:
+        # Las páginas se recorren por cursor (fecha, id); page solo se muestra
+        page = max(request.args.get("page", 1, type=int), 1)
+        try:
+            page_args = _blacklist_page_args()
+        except ValueError:
             return render_template(
                 "error.html", message="Invalid pagination parameters"
             ), 400
 
-        db = get_session()
-
-        # Obtener blacklist desde variables de entorno
-        blacklist_env = os.getenv("BLACKLIST_DOMAINS")
-        blacklist = (
-            [domain.strip() for domain in blacklist_env.split(",") if domain.strip()]
-            if blacklist_env
-            else []
-        )
-
-        # Obtener resultados paginados
-        result_data = find_blacklisted_sites(db, blacklist, page, per_page)
+        db = get_read_session()
+        result_data = find_blacklisted_page(db, blacklist_entries(), **page_args)
 
         if "error" in result_data:
             return render_template("error.html", message=result_data["error"]), 500
 
+        result_data["pagination"]["page"] = page
         return render_template(
             "blacklist.html",
             results=result_data["results"],
@@ -112,3 +114,23 @@ def blacklist_logs():
     finally:
         if db is not None:
             db.close()
+
+
+@logs_bp.route("/api/blacklist", methods=["GET"])
+def api_blacklist_logs():
+    db = None
+    try:
+        page_args = _blacklist_page_args()
+        db = get_read_session()
+        result_data = find_blacklisted_page(db, blacklist_entries(), **page_args)
+        if "error" in result_data:
+            return jsonify({"error": result_data["error"]}), 500
+        return jsonify(result_data)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+    except SQLAlchemyError:
+        logger.exception("Error in api_blacklist_logs")
+        return jsonify({"error": "Internal server error"}), 500
+    finally:
+        if db is not None:
+            db.close()
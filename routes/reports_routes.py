@@ -3,9 +3,10 @@ from datetime import date, datetime
 from flask import Blueprint, render_template, request
 
 from config import logger
-from database.database import get_dynamic_models, get_session
+from database.database import get_dynamic_models, get_read_session
 from services.fetch_data_logs import get_metrics_for_date
 from services.get_reports import get_important_metrics
+from services.report_cache import report_cache
 from utils.colors import color_map
 
 reports_bp = Blueprint("reports", __name__)
@@ -15,8 +16,9 @@ reports_bp = Blueprint("reports", __name__)
 def reports():
     db = None
     try:
-        db = get_session()
-        current_date = datetime.now().strftime("%Y%m%d")
+        db = get_read_session()
+        today = date.today()
+        current_date = today.strftime("%Y%m%d")
         logger.info(f"Generating reports for date: {current_date}")
         UserModel, LogModel = get_dynamic_models(current_date)
 
@@ -25,7 +27,12 @@ def reports():
                 "error.html", message="Error loading data for reports"
             ), 500
 
-        metrics = get_important_metrics(db, UserModel, LogModel)
+        metrics = report_cache.get_or_compute(
+            db,
+            "important_metrics",
+            today,
+            lambda: get_important_metrics(db, UserModel, LogModel),
+        )
 
         if not metrics:
             return render_template(
@@ -79,7 +86,7 @@ def reports_for_date(date_str: str):
         date_suffix = selected.strftime("%Y%m%d")
         logger.info(f"Generating reports for date: {date_suffix}")
 
-        db = get_session()
+        db = get_read_session()
         UserModel, LogModel = get_dynamic_models(date_suffix)
 
         if not UserModel or not LogModel:
@@ -87,7 +94,12 @@ def reports_for_date(date_str: str):
                 "error.html", message="Error loading data for requested date"
             ), 500
 
-        metrics = get_important_metrics(db, UserModel, LogModel)
+        metrics = report_cache.get_or_compute(
+            db,
+            "important_metrics",
+            selected,
+            lambda: get_important_metrics(db, UserModel, LogModel),
+        )
 
         if not metrics:
             return render_template(
@@ -139,7 +151,13 @@ def dashboard():
     else:
         selected_date = date.today()
 
-    metrics = get_metrics_for_date(selected_date)
+    db = get_read_session()
+    try:
+        metrics = report_cache.get_or_compute(
+            db, "dashboard", selected_date, lambda: get_metrics_for_date(selected_date)
+        )
+    finally:
+        db.close()
 
     return render_template(
         "components/graph_reports.html", metrics=metrics, selected_date=selected_date
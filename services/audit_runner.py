@@ -0,0 +1,90 @@
+"""Concurrent per-day execution of audit queries.
+
+Each query runs on its own pooled connection in a shared, bounded thread
+pool. Running audits are registered by the id the browser sends so they can
+be cancelled when the client goes away; queries that have not started yet
+are then skipped.
+"""
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import Config, logger
+from database.database import get_read_engine
+
+AUDIT_WORKERS = max(1, getattr(Config, "AUDIT_WORKERS", 4))
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_running: dict[str, threading.Event] = {}
+_running_lock = threading.Lock()
+
+
+class AuditCancelled(Exception):
+    pass
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=AUDIT_WORKERS, thread_name_prefix="audit"
+            )
+        return _executor
+
+
+def register(audit_id: str | None) -> threading.Event:
+    """Cancellation event of a new audit; anonymous audits get a private one."""
+    event = threading.Event()
+    if audit_id:
+        with _running_lock:
+            _running[audit_id] = event
+    return event
+
+
+def release(audit_id: str | None):
+    if audit_id:
+        with _running_lock:
+            _running.pop(audit_id, None)
+
+
+def cancel(audit_id: str) -> bool:
+    with _running_lock:
+        event = _running.get(audit_id)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+
+def _execute(query, cancel_event: threading.Event):
+    if cancel_event.is_set():
+        return []
+    with get_read_engine().connect() as conn:
+        return conn.execute(query).all()
+
+
+def run_queries(queries: list, cancel_event: threading.Event | None = None) -> list:
+    """Execute ``queries`` concurrently; returns their rows in query order."""
+    cancel_event = cancel_event or threading.Event()
+    executor = _get_executor()
+    futures = [executor.submit(_execute, query, cancel_event) for query in queries]
+    pending = set(futures)
+    try:
+        while pending:
+            if cancel_event.is_set():
+                raise AuditCancelled()
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        if cancel_event.is_set():
+            raise AuditCancelled()
+    except BaseException:
+        cancel_event.set()
+        for future in futures:
+            future.cancel()
+        if pending:
+            logger.info(f"Audit stopped with {len(pending)} day queries pending")
+        raise
+    return [future.result() for future in futures]
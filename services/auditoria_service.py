@@ -1,20 +1,35 @@
-from collections import defaultdict
+import threading
+from collections.abc import Callable
 from datetime import datetime, timedelta
 from typing import Any
-from venv import logger
 
-from sqlalchemy import func, inspect, or_, text
+from sqlalchemy import desc, func, literal, select, union_all
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from database.database import get_dynamic_models
+from config import Config
+from database.catalog import table_catalog
+from database.categories import get_domain_tagger
+from database.database import (
+    DomainDailyStats,
+    HourlyStats,
+    ResponseDailyStats,
+    UserDailyStats,
+    UserDirectory,
+    get_dynamic_models,
+)
+from services import audit_runner
 from utils.social_media import SOCIAL_MEDIA_DOMAINS
 
+AUDIT_QUERY_MODE = getattr(Config, "AUDIT_QUERY_MODE", "UNION")
+# Daily tables combined into a single UNION ALL query
+AUDIT_UNION_MAX_TABLES = 400
+
 
 def _get_tables_in_range(
-    inspector, start_date: datetime, end_date: datetime
+    bind, start_date: datetime, end_date: datetime
 ) -> list[tuple[str, str]]:
-    all_db_tables = inspector.get_table_names()
+    all_db_tables = table_catalog.tables(bind)
     log_tables_in_range = []
     current_date = start_date
     while current_date <= end_date:
@@ -27,325 +42,225 @@ def _get_tables_in_range(
     return log_tables_in_range
 
 
-def find_by_keyword(
-    db: Session, start_str: str, end_str: str, keyword: str, username: str = None
-) -> dict[str, Any]:
-    start_date, end_date = (
-        datetime.strptime(start_str, "%Y-%m-%d"),
-        datetime.strptime(end_str, "%Y-%m-%d"),
-    )
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
-    if not tables:
-        return {"error": "No data for the selected dates."}
-
-    all_results = []
+def _union_logs(tables: list[str], conditions: Callable):
+    """UNION ALL of the joined user/log rows of ``tables`` as one subquery.
 
+    ``conditions(UserModel, LogModel)`` returns the filters of one day; they
+    are applied inside every branch so each daily table can use its indexes.
+    """
+    selects = []
     for log_table in tables:
         date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-
-            # Crear query usando ORM
-            query = (
-                db.query(
-                    UserModel.username,
-                    UserModel.ip,
-                    LogModel.url,
-                    LogModel.data_transmitted,
-                    LogModel.created_at,
-                    func.count(LogModel.id).label("access_count"),
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                    func.max(LogModel.created_at).label("last_seen"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(LogModel.url.like(f"%{keyword}%"))
-            )
-
-            if username:
-                query = query.filter(UserModel.username == username)
-
-            query = query.group_by(
+        UserModel, LogModel = get_dynamic_models(date_suffix)
+        if UserModel is None or LogModel is None:
+            continue
+        selects.append(
+            select(
+                literal(date_suffix).label("log_date"),
                 UserModel.username,
                 UserModel.ip,
                 LogModel.url,
+                LogModel.response,
+                LogModel.request_count,
                 LogModel.data_transmitted,
                 LogModel.created_at,
             )
-
-            results = query.all()
-
-            for row in results:
-                all_results.append(
-                    {
-                        "log_date": date_suffix,
-                        "username": row.username,
-                        "ip": row.ip,
-                        "url": row.url,
-                        "access_count": row.access_count,
-                        "total_data": row.total_data,
-                        "last_seen": row.last_seen,
-                    }
-                )
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    # Ordenar resultados
-    all_results.sort(
-        key=lambda x: (x["username"], x["log_date"], x["access_count"]), reverse=True
+            .join_from(LogModel, UserModel, LogModel.user_id == UserModel.id)
+            .where(*conditions(UserModel, LogModel))
+        )
+    if not selects:
+        return None
+    return union_all(*selects).subquery("logs")
+
+
+def _table_groups(tables: list[str]):
+    """Tables queried together: one per day in PARALLEL mode, else chunks."""
+    # SQLite caps compound selects at 500 terms
+    size = 1 if AUDIT_QUERY_MODE == "PARALLEL" else AUDIT_UNION_MAX_TABLES
+    for start in range(0, len(tables), size):
+        yield tables[start : start + size]
+
+
+def _run_sorted(
+    db: Session,
+    queries: list,
+    key: Callable,
+    cancel: threading.Event | None = None,
+) -> list:
+    """Execute ``queries`` and return all their rows sorted descending by ``key``.
+
+    The rows are sorted here rather than by the database: its collation
+    (case-insensitive on MySQL by default) may order the text columns
+    differently from Python, so per-query orders could not be merged.
+    """
+    if AUDIT_QUERY_MODE == "PARALLEL":
+        parts = audit_runner.run_queries(queries, cancel)
+    else:
+        parts = []
+        for query in queries:
+            if cancel is not None and cancel.is_set():
+                raise audit_runner.AuditCancelled()
+            parts.append(db.execute(query).all())
+    return sorted((row for rows in parts for row in rows), key=key, reverse=True)
+
+
+def _grouped_query(tables: list[str], conditions: Callable, with_response: bool):
+    logs = _union_logs(tables, conditions)
+    if logs is None:
+        return None
+    keys = [logs.c.log_date, logs.c.username, logs.c.ip, logs.c.url]
+    if with_response:
+        keys.append(logs.c.response)
+    keys += [logs.c.data_transmitted, logs.c.created_at]
+    access_count = func.sum(logs.c.request_count).label("access_count")
+    return select(
+        *keys,
+        access_count,
+        func.sum(logs.c.data_transmitted).label("total_data"),
+        func.max(logs.c.created_at).label("last_seen"),
+    ).group_by(*keys)
+
+
+def _grouped_activity(
+    db: Session,
+    tables: list[str],
+    conditions: Callable,
+    with_response: bool = False,
+    cancel: threading.Event | None = None,
+) -> list[dict[str, Any]]:
+    """Per-day activity rows of every table, aggregated by the database."""
+    queries = [
+        query
+        for group in _table_groups(tables)
+        if (query := _grouped_query(group, conditions, with_response)) is not None
+    ]
+    rows = _run_sorted(
+        db,
+        queries,
+        key=lambda row: (row.username, row.log_date, row.access_count),
+        cancel=cancel,
     )
-
-    return {"results": all_results}
-
-
-def find_social_media_activity(
-    db: Session, start_str: str, end_str: str, sites: list[str], username: str = None
+    all_results = []
+    for row in rows:
+        result = {
+            "log_date": row.log_date,
+            "username": row.username,
+            "ip": row.ip,
+            "url": row.url,
+            "access_count": row.access_count,
+            "total_data": row.total_data,
+            "last_seen": row.last_seen,
+        }
+        if with_response:
+            result["response"] = row.response
+        all_results.append(result)
+    return all_results
+
+
+def _search(
+    db: Session,
+    start_str: str,
+    end_str: str,
+    conditions: Callable,
+    with_response: bool = False,
+    cancel: threading.Event | None = None,
 ) -> dict[str, Any]:
     start_date, end_date = (
         datetime.strptime(start_str, "%Y-%m-%d"),
         datetime.strptime(end_str, "%Y-%m-%d"),
     )
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
-    domain_list = []
-    for site_name in sites:
-        if site_name in SOCIAL_MEDIA_DOMAINS:
-            domain_list.extend(SOCIAL_MEDIA_DOMAINS[site_name])
-    if not domain_list:
-        return {"error": "No valid domains specified for search."}
+    try:
+        results = _grouped_activity(db, tables, conditions, with_response, cancel)
+    except audit_runner.AuditCancelled:
+        return {"error": "Audit cancelled."}
+    except SQLAlchemyError as e:
+        print(f"Database error searching logs: {e}")
+        return {"error": "A database error occurred while searching the logs."}
+    return {"results": results}
 
-    all_results = []
 
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-
-            # Crear condiciones OR para cada dominio usando ORM
-            domain_conditions = []
-            for domain in domain_list:
-                domain_conditions.extend(
-                    [
-                        LogModel.url.like(f"%.{domain}/%"),
-                        LogModel.url.like(f"%.{domain}:%"),
-                        LogModel.url.like(f"%.{domain}"),
-                        LogModel.url.like(f"%//{domain}/%"),
-                        LogModel.url.like(f"%//{domain}:%"),
-                        LogModel.url.like(f"%//{domain}"),
-                    ]
-                )
-
-            # Crear query usando ORM
-            query = (
-                db.query(
-                    UserModel.username,
-                    UserModel.ip,
-                    LogModel.url,
-                    LogModel.data_transmitted,
-                    LogModel.created_at,
-                    func.count(LogModel.id).label("access_count"),
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                    func.max(LogModel.created_at).label("last_seen"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(or_(*domain_conditions))
-            )
+def find_by_keyword(
+    db: Session,
+    start_str: str,
+    end_str: str,
+    keyword: str,
+    username: str | None = None,
+    cancel: threading.Event | None = None,
+) -> dict[str, Any]:
+    def conditions(UserModel, LogModel):
+        filters = [LogModel.url.like(f"%{keyword}%")]
+        if username:
+            filters.append(UserModel.username == username)
+        return filters
 
-            if username:
-                query = query.filter(UserModel.username == username)
+    return _search(db, start_str, end_str, conditions, cancel=cancel)
 
-            query = query.group_by(
-                UserModel.username,
-                UserModel.ip,
-                LogModel.url,
-                LogModel.data_transmitted,
-                LogModel.created_at,
-            )
 
-            results = query.all()
-
-            for row in results:
-                all_results.append(
-                    {
-                        "log_date": date_suffix,
-                        "username": row.username,
-                        "ip": row.ip,
-                        "url": row.url,
-                        "access_count": row.access_count,
-                        "total_data": row.total_data,
-                        "last_seen": row.last_seen,
-                    }
-                )
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
+def find_social_media_activity(
+    db: Session,
+    start_str: str,
+    end_str: str,
+    sites: list[str],
+    username: str | None = None,
+    cancel: threading.Event | None = None,
+) -> dict[str, Any]:
+    category_ids = get_domain_tagger(db).category_ids
+    site_ids = [
+        category_ids[site_name]
+        for site_name in sites
+        if site_name in SOCIAL_MEDIA_DOMAINS and site_name in category_ids
+    ]
+    if not site_ids:
+        return {"error": "No valid domains specified for search."}
 
-    # Ordenar resultados
-    all_results.sort(
-        key=lambda x: (x["username"], x["log_date"], x["access_count"]), reverse=True
-    )
+    def conditions(UserModel, LogModel):
+        # Categoría etiquetada en la ingesta (índice category_id)
+        filters = [LogModel.category_id.in_(site_ids)]
+        if username:
+            filters.append(UserModel.username == username)
+        return filters
 
-    return {"results": all_results}
+    return _search(db, start_str, end_str, conditions, cancel=cancel)
 
 
 def find_by_ip(
-    db: Session, start_str: str, end_str: str, ip_address: str
+    db: Session,
+    start_str: str,
+    end_str: str,
+    ip_address: str,
+    cancel: threading.Event | None = None,
 ) -> dict[str, Any]:
-    start_date, end_date = (
-        datetime.strptime(start_str, "%Y-%m-%d"),
-        datetime.strptime(end_str, "%Y-%m-%d"),
-    )
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
-    if not tables:
-        return {"error": "No data for the selected dates."}
-
-    all_results = []
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-
-            # Crear query usando ORM
-            query = (
-                db.query(
-                    UserModel.username,
-                    UserModel.ip,
-                    LogModel.url,
-                    LogModel.data_transmitted,
-                    LogModel.created_at,
-                    func.count(LogModel.id).label("access_count"),
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                    func.max(LogModel.created_at).label("last_seen"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(UserModel.ip == ip_address)
-                .group_by(
-                    UserModel.username,
-                    UserModel.ip,
-                    LogModel.url,
-                    LogModel.data_transmitted,
-                    LogModel.created_at,
-                )
-            )
-
-            results = query.all()
-
-            for row in results:
-                all_results.append(
-                    {
-                        "log_date": date_suffix,
-                        "username": row.username,
-                        "ip": row.ip,
-                        "url": row.url,
-                        "access_count": row.access_count,
-                        "total_data": row.total_data,
-                        "last_seen": row.last_seen,
-                    }
-                )
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    # Ordenar resultados
-    all_results.sort(
-        key=lambda x: (x["username"], x["log_date"], x["access_count"]), reverse=True
+    return _search(
+        db,
+        start_str,
+        end_str,
+        lambda UserModel, LogModel: [UserModel.ip == ip_address],
+        cancel=cancel,
     )
 
-    return {"results": all_results}
-
 
 def find_by_response_code(
-    db: Session, start_str: str, end_str: str, code: int, username: str = None
+    db: Session,
+    start_str: str,
+    end_str: str,
+    code: int,
+    username: str | None = None,
+    cancel: threading.Event | None = None,
 ) -> dict[str, Any]:
-    start_date, end_date = (
-        datetime.strptime(start_str, "%Y-%m-%d"),
-        datetime.strptime(end_str, "%Y-%m-%d"),
-    )
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
-    if not tables:
-        return {"error": "No data for the selected dates."}
-
-    all_results = []
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-
-            # Crear query usando ORM
-            query = (
-                db.query(
-                    UserModel.username,
-                    UserModel.ip,
-                    LogModel.url,
-                    LogModel.response,
-                    LogModel.data_transmitted,
-                    LogModel.created_at,
-                    func.count(LogModel.id).label("access_count"),
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                    func.max(LogModel.created_at).label("last_seen"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(LogModel.response == code)
-            )
-
-            if username:
-                query = query.filter(UserModel.username == username)
-
-            query = query.group_by(
-                UserModel.username,
-                UserModel.ip,
-                LogModel.url,
-                LogModel.response,
-                LogModel.data_transmitted,
-                LogModel.created_at,
-            )
-
-            results = query.all()
-
-            for row in results:
-                all_results.append(
-                    {
-                        "log_date": date_suffix,
-                        "username": row[0],
-                        "ip": row[1],
-                        "url": row[2],
-                        "response": row[3],
-                        "access_count": row.access_count,
-                        "total_data": row.total_data,
-                        "last_seen": row.last_seen,
-                    }
-                )
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    # Ordenar resultados
-    all_results.sort(
-        key=lambda x: (x["username"], x["log_date"], x["access_count"]), reverse=True
+    def conditions(UserModel, LogModel):
+        filters = [LogModel.response == code]
+        if username:
+            filters.append(UserModel.username == username)
+        return filters
+
+    return _search(
+        db, start_str, end_str, conditions, with_response=True, cancel=cancel
     )
 
-    return {"results": all_results}
-
 
 def get_daily_activity(db: Session, date_str: str, username: str) -> dict[str, Any]:
     try:
@@ -353,40 +268,27 @@ def get_daily_activity(db: Session, date_str: str, username: str) -> dict[str, A
     except ValueError:
         return {"error": "Invalid date format. Use YYYY-MM-DD."}
 
-    date_suffix = selected_date.strftime("%Y%m%d")
-
     try:
-        UserModel, LogModel = get_dynamic_models(date_suffix)
-        if UserModel is None or LogModel is None:
-            return {"total_requests": 0, "hourly_activity": [0] * 24}
-
-        # Crear query usando ORM - compatible con SQLite y MySQL
-        query = (
+        results = (
             db.query(
-                func.cast(
-                    func.strftime("%H", LogModel.created_at), text("INTEGER")
-                ).label("hour_of_day"),
-                func.count(LogModel.id).label("request_count"),
-            )
-            .join(UserModel, LogModel.user_id == UserModel.id)
-            .filter(UserModel.username == username)
-            .group_by(
-                func.cast(func.strftime("%H", LogModel.created_at), text("INTEGER"))
+                HourlyStats.hour,
+                func.sum(HourlyStats.request_count).label("request_count"),
             )
-            .order_by(
-                func.cast(func.strftime("%H", LogModel.created_at), text("INTEGER"))
+            .filter(
+                HourlyStats.day == selected_date.date(),
+                HourlyStats.username == username,
             )
+            .group_by(HourlyStats.hour)
+            .all()
         )
 
-        results = query.all()
-
         # Prepara un array de 24 horas con 0 peticiones
         hourly_counts = [0] * 24
         total_requests = 0
 
         for row in results:
-            hour = row.hour_of_day
-            count = row.request_count
+            hour = row.hour
+            count = int(row.request_count or 0)
             if hour is not None and 0 <= hour < 24:
                 hourly_counts[hour] = count
                 total_requests += count
@@ -403,43 +305,24 @@ def get_daily_activity(db: Session, date_str: str, username: str) -> dict[str, A
         }
 
 
-def get_all_usernames(db: Session) -> list[str]:
-    engine = db.get_bind()
-    inspector = inspect(engine)
-    all_tables = inspector.get_table_names()
-    user_tables = [t for t in all_tables if t.startswith("user_") and len(t) == 13]
-    if not user_tables:
-        return []
-
-    all_usernames = set()
-
-    for table_name in user_tables:
-        date_suffix = table_name.split("_")[1]
-        try:
-            UserModel, _ = get_dynamic_models(date_suffix)
-            if UserModel is None:
-                continue
-
-            # Usar ORM para obtener usernames únicos
-            usernames = (
-                db.query(UserModel.username)
-                .filter(
-                    UserModel.username.isnot(None),
-                    UserModel.username != "",
-                    UserModel.username != "-",
-                )
-                .distinct()
-                .all()
-            )
-
-            for username_row in usernames:
-                all_usernames.add(username_row[0])
-
-        except Exception as e:
-            print(f"Error processing table {table_name}: {e}")
-            continue
-
-    return sorted(all_usernames)
+def get_all_usernames(
+    db: Session, prefix: str | None = None, limit: int | None = None
+) -> list[str]:
+    """Known usernames, optionally only those starting with ``prefix``."""
+    query = db.query(UserDirectory.username).filter(
+        UserDirectory.username != "", UserDirectory.username != "-"
+    )
+    if prefix:
+        # Keys starting with ``key`` form one range of the username_key index
+        key = prefix.lower()
+        query = query.filter(
+            UserDirectory.username_key >= key,
+            UserDirectory.username_key < key[:-1] + chr(ord(key[-1]) + 1),
+        )
+    query = query.order_by(UserDirectory.username_key, UserDirectory.username)
+    if limit:
+        query = query.limit(limit)
+    return [username for (username,) in query]
 
 
 def get_user_activity_summary(
@@ -447,55 +330,23 @@ def get_user_activity_summary(
 ) -> dict[str, Any]:
     start_date = datetime.strptime(start_str, "%Y-%m-%d")
     end_date = datetime.strptime(end_str, "%Y-%m-%d")
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
-    total_requests = 0
-    total_data = 0
-    domain_counts = defaultdict(int)
-    response_counts = defaultdict(int)
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-
-            # Usar ORM para obtener datos del usuario
-            results = (
-                db.query(
-                    LogModel.url,
-                    LogModel.data_transmitted,
-                    LogModel.request_count,
-                    LogModel.response,
-                )
-                .join(UserModel, LogModel.user_id == UserModel.id)
-                .filter(UserModel.username == username)
-                .all()
-            )
-
-            for row in results:
-                total_requests += row[2]
-                total_data += row[1]
-
-                # Extraer dominio
-                try:
-                    domain = row[0].split("//")[-1].split("/")[0].split(":")[0]
-                    domain_counts[domain] += row[2]
-                except Exception as e:
-                    logger.error(
-                        f"Error processing row in get_user_activity_summary: {e}"
-                    )
-                    pass
-
-                response_counts[row[3]] += row[2]
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
+    day_range = (start_date.date(), end_date.date())
+    total_requests, total_data = (
+        db.query(
+            func.sum(UserDailyStats.request_count),
+            func.sum(UserDailyStats.data_transmitted),
+        )
+        .filter(
+            UserDailyStats.day.between(*day_range),
+            UserDailyStats.username == username,
+        )
+        .one()
+    )
+    total_requests = int(total_requests or 0)
 
     if total_requests == 0:
         return {
@@ -505,19 +356,40 @@ def get_user_activity_summary(
             "response_summary": [],
         }
 
-    sorted_domains = sorted(
-        domain_counts.items(), key=lambda item: item[1], reverse=True
+    sorted_domains = (
+        db.query(
+            DomainDailyStats.domain,
+            func.sum(DomainDailyStats.request_count).label("count"),
+        )
+        .filter(
+            DomainDailyStats.day.between(*day_range),
+            DomainDailyStats.username == username,
+        )
+        .group_by(DomainDailyStats.domain)
+        .order_by(desc("count"))
+        .limit(15)
+        .all()
     )
-    sorted_responses = sorted(
-        response_counts.items(), key=lambda item: item[1], reverse=True
+    sorted_responses = (
+        db.query(
+            ResponseDailyStats.response,
+            func.sum(ResponseDailyStats.request_count).label("count"),
+        )
+        .filter(
+            ResponseDailyStats.day.between(*day_range),
+            ResponseDailyStats.username == username,
+        )
+        .group_by(ResponseDailyStats.response)
+        .order_by(desc("count"))
+        .all()
     )
 
     return {
         "total_requests": total_requests,
-        "total_data_gb": round(total_data / (1024**3), 2),
-        "top_domains": [{"domain": d, "count": c} for d, c in sorted_domains[:15]],
+        "total_data_gb": round((total_data or 0) / (1024**3), 2),
+        "top_domains": [{"domain": d, "count": int(c)} for d, c in sorted_domains],
         "response_summary": [
-            {"code": code, "count": count} for code, count in sorted_responses
+            {"code": code, "count": int(count)} for code, count in sorted_responses
         ],
     }
 
@@ -527,42 +399,30 @@ def get_top_users_by_data(
 ) -> dict[str, Any]:
     start_date = datetime.strptime(start_str, "%Y-%m-%d")
     end_date = datetime.strptime(end_str, "%Y-%m-%d")
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
-    user_data = defaultdict(int)
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-            results = (
-                db.query(
-                    UserModel.username,
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(UserModel.username != "-")
-                .group_by(UserModel.username)
-                .all()
-            )
-
-            for row in results:
-                user_data[row[0]] += row.total_data or 0
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    # Ordenar y limitar resultados
-    sorted_users = sorted(user_data.items(), key=lambda x: x[1], reverse=True)[:limit]
+    sorted_users = (
+        db.query(
+            UserDailyStats.username,
+            func.sum(UserDailyStats.data_transmitted).label("total_data"),
+        )
+        .filter(
+            UserDailyStats.day.between(start_date.date(), end_date.date()),
+            UserDailyStats.username != "-",
+        )
+        .group_by(UserDailyStats.username)
+        .order_by(desc("total_data"))
+        .limit(limit)
+        .all()
+    )
 
     top_users_list = [
-        {"username": username, "total_data_gb": float(round(total_data / (1024**3), 2))}
+        {
+            "username": username,
+            "total_data_gb": float(round((total_data or 0) / (1024**3), 2)),
+        }
         for username, total_data in sorted_users
     ]
 
@@ -575,39 +435,27 @@ def get_top_users_by_requests(
     """Aggregate top users by total request_count across the date range."""
     start_date = datetime.strptime(start_str, "%Y-%m-%d")
     end_date = datetime.strptime(end_str, "%Y-%m-%d")
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
-    user_reqs: defaultdict[str, int] = defaultdict(int)
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-            results = (
-                db.query(
-                    UserModel.username,
-                    func.sum(LogModel.request_count).label("total_reqs"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(UserModel.username != "-")
-                .group_by(UserModel.username)
-                .all()
-            )
-            for row in results:
-                user_reqs[row[0]] += row.total_reqs or 0
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    sorted_users = sorted(user_reqs.items(), key=lambda x: x[1], reverse=True)[:limit]
+    sorted_users = (
+        db.query(
+            UserDailyStats.username,
+            func.sum(UserDailyStats.request_count).label("total_reqs"),
+        )
+        .filter(
+            UserDailyStats.day.between(start_date.date(), end_date.date()),
+            UserDailyStats.username != "-",
+        )
+        .group_by(UserDailyStats.username)
+        .order_by(desc("total_reqs"))
+        .limit(limit)
+        .all()
+    )
     return {
         "top_users_requests": [
-            {"username": username, "total_requests": int(total_reqs)}
+            {"username": username, "total_requests": int(total_reqs or 0)}
             for username, total_reqs in sorted_users
         ]
     }
@@ -616,43 +464,31 @@ def get_top_users_by_requests(
 def get_top_urls_by_data(
     db: Session, start_str: str, end_str: str, limit: int = 15
 ) -> dict[str, Any]:
+    """Top sites by data; sites are grouped by domain in the rollups."""
     start_date = datetime.strptime(start_str, "%Y-%m-%d")
     end_date = datetime.strptime(end_str, "%Y-%m-%d")
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
-    url_data = defaultdict(int)
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-            results = (
-                db.query(
-                    LogModel.url,
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                )
-                .group_by(LogModel.url)
-                .all()
-            )
-
-            for row in results:
-                url_data[row[0]] += row.total_data or 0
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    # Ordenar y limitar resultados
-    sorted_urls = sorted(url_data.items(), key=lambda x: x[1], reverse=True)[:limit]
+    sorted_urls = (
+        db.query(
+            DomainDailyStats.domain,
+            func.sum(DomainDailyStats.data_transmitted).label("total_data"),
+        )
+        .filter(DomainDailyStats.day.between(start_date.date(), end_date.date()))
+        .group_by(DomainDailyStats.domain)
+        .order_by(desc("total_data"))
+        .limit(limit)
+        .all()
+    )
 
     top_urls_list = [
-        {"url": url, "total_data_gb": float(round(total_data / (1024**3), 2))}
-        for url, total_data in sorted_urls
+        {
+            "domain": domain,
+            "total_data_gb": float(round((total_data or 0) / (1024**3), 2)),
+        }
+        for domain, total_data in sorted_urls
     ]
 
     return {"top_urls": top_urls_list}
@@ -664,40 +500,26 @@ def get_top_ips_by_data(
     """Aggregate total data transmitted grouped by IP across the date range."""
     start_date = datetime.strptime(start_str, "%Y-%m-%d")
     end_date = datetime.strptime(end_str, "%Y-%m-%d")
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
-    ip_data: defaultdict[str, int] = defaultdict(int)
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-            results = (
-                db.query(
-                    UserModel.ip,
-                    func.sum(LogModel.data_transmitted).label("total_data"),
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .group_by(UserModel.ip)
-                .all()
-            )
-            for row in results:
-                ip_data[row[0]] += row.total_data or 0
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    sorted_ips = sorted(ip_data.items(), key=lambda x: x[1], reverse=True)[:limit]
+    sorted_ips = (
+        db.query(
+            UserDailyStats.ip,
+            func.sum(UserDailyStats.data_transmitted).label("total_data"),
+        )
+        .filter(UserDailyStats.day.between(start_date.date(), end_date.date()))
+        .group_by(UserDailyStats.ip)
+        .order_by(desc("total_data"))
+        .limit(limit)
+        .all()
+    )
     return {
         "top_ips": [
             {
                 "ip": ip,
-                "total_data_gb": float(round(total_data / (1024**3), 2)),
+                "total_data_gb": float(round((total_data or 0) / (1024**3), 2)),
             }
             for ip, total_data in sorted_ips
         ]
@@ -705,63 +527,63 @@ def get_top_ips_by_data(
 
 
 def find_denied_access(
-    db: Session, start_str: str, end_str: str, username: str = None
+    db: Session,
+    start_str: str,
+    end_str: str,
+    username: str | None = None,
+    cancel: threading.Event | None = None,
 ) -> dict[str, Any]:
     start_date = datetime.strptime(start_str, "%Y-%m-%d")
     end_date = datetime.strptime(end_str, "%Y-%m-%d")
-    inspector = inspect(db.get_bind())
-    tables = _get_tables_in_range(inspector, start_date, end_date)
+    tables = _get_tables_in_range(db.get_bind(), start_date, end_date)
     if not tables:
         return {"error": "No data for the selected dates."}
 
+    def conditions(UserModel, LogModel):
+        filters = [LogModel.response == 403]
+        if username:
+            filters.append(UserModel.username == username)
+        return filters
+
+    def denied_query(group):
+        logs = _union_logs(group, conditions)
+        if logs is None:
+            return None
+        return select(logs)
+
+    queries = [
+        query
+        for group in _table_groups(tables)
+        if (query := denied_query(group)) is not None
+    ]
     all_results = []
-
-    for log_table in tables:
-        date_suffix = log_table.split("_")[1]
-        try:
-            UserModel, LogModel = get_dynamic_models(date_suffix)
-            if UserModel is None or LogModel is None:
-                continue
-
-            # Crear query usando ORM
-            query = (
-                db.query(
-                    UserModel.username,
-                    UserModel.ip,
-                    LogModel.url,
-                    LogModel.response,
-                    LogModel.data_transmitted,
-                    LogModel.created_at,
-                )
-                .join(LogModel, LogModel.user_id == UserModel.id)
-                .filter(LogModel.response == 403)
+    try:
+        rows = _run_sorted(
+            db,
+            queries,
+            key=lambda row: (
+                row.log_date,
+                row.username,
+                row.created_at or datetime.min,
+            ),
+            cancel=cancel,
+        )
+        for row in rows:
+            all_results.append(
+                {
+                    "log_date": row.log_date,
+                    "username": row.username,
+                    "ip": row.ip,
+                    "url": row.url,
+                    "response": row.response,
+                    "data_transmitted": row.data_transmitted,
+                    "created_at": row.created_at,
+                }
             )
-
-            if username:
-                query = query.filter(UserModel.username == username)
-
-            query = query.order_by(LogModel.created_at.desc())
-
-            results = query.all()
-
-            for row in results:
-                all_results.append(
-                    {
-                        "log_date": date_suffix,
-                        "username": row[0],
-                        "ip": row[1],
-                        "url": row[2],
-                        "response": row[3],
-                        "data_transmitted": row[4],
-                        "created_at": row[5],
-                    }
-                )
-
-        except Exception as e:
-            print(f"Error processing table {log_table}: {e}")
-            continue
-
-    # Ordenar resultados
-    all_results.sort(key=lambda x: (x["log_date"], x["username"]), reverse=True)
+    except audit_runner.AuditCancelled:
+        return {"error": "Audit cancelled."}
+    except SQLAlchemyError as e:
+        print(f"Database error in find_denied_access: {e}")
+        return {"error": "A database error occurred while searching the logs."}
 
     return {"results": all_results}
@@ -1,122 +1,203 @@
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import func, inspect, or_
+from sqlalchemy import func, or_
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from database.database import get_dynamic_models, get_engine
+from database.catalog import table_catalog
+from database.categories import blacklist_domains, get_domain_tagger
+from database.database import get_dynamic_models
+from utils.domains import domain_filter
+from utils.lru import LRUCache
+
+# (date suffix, blacklist) -> (largest log id when counted, matching rows)
+_day_counts = LRUCache(4096)
+
+
+def _blacklist_conditions(db: Session, LogModel, blacklist: list) -> list:
+    """OR conditions matching the rows of ``blacklist``.
+
+    Domain entries use the ``blacklisted`` flag set at ingest when it was
+    tagged from this same list, or the domain_rev index otherwise; bare
+    words keep matching the URL text.
+    """
+    domains = blacklist_domains(blacklist)
+    if domains and get_domain_tagger(db).tags_blacklist(domains):
+        conditions = [LogModel.blacklisted.is_(True)]
+    else:
+        conditions = [domain_filter(LogModel.domain_rev, site) for site in domains]
+    conditions += [
+        LogModel.url.like(f"%{site}%") for site in blacklist if site not in domains
+    ]
+    return conditions
+
+
+def _blacklist_days(db: Session) -> list[str]:
+    """Date suffixes of the daily tables, newest first."""
+    return table_catalog.daily_suffixes(db.get_bind())[::-1]
+
+
+def _blacklist_query(db: Session, date_str: str, blacklist: list):
+    """Blacklisted rows of one day as ``(id, username, url)``, with their model."""
+    UserModel, LogModel = get_dynamic_models(date_str)
+    if UserModel is None or LogModel is None:
+        return None, None
+    query = (
+        db.query(LogModel.id, UserModel.username, LogModel.url)
+        .join(UserModel, LogModel.user_id == UserModel.id)
+        .filter(or_(*_blacklist_conditions(db, LogModel, blacklist)))
+    )
+    return query, LogModel
+
+
+def blacklist_day_count(db: Session, date_str: str, blacklist: list) -> int:
+    """Blacklisted rows of one day, cached while the day gets no new rows.
+
+    Log rows are only ever appended, so a count stays valid as long as the
+    largest id of the day's table does, whichever process writes to it;
+    checking it is one primary key lookup per day.
+    """
+    query, LogModel = _blacklist_query(db, date_str, blacklist)
+    if query is None:
+        return 0
+    last_id = db.query(func.max(LogModel.id)).scalar() or 0
+    key = (date_str, tuple(blacklist))
+    entry = _day_counts.get(key)
+    if entry is None or entry[0] != last_id:
+        entry = (last_id, query.with_entities(func.count(LogModel.id)).scalar())
+        _day_counts.put(key, entry)
+    return entry[1]
+
+
+def format_cursor(date_str: str, row_id: int) -> str:
+    return f"{date_str}-{row_id}"
+
+
+def parse_cursor(cursor: str) -> tuple[str, int]:
+    """Split a ``YYYYMMDD-id`` cursor; raises ValueError if malformed."""
+    date_str, row_id = cursor.split("-", 1)
+    datetime.strptime(date_str, "%Y%m%d")
+    return date_str, int(row_id)
+
+
+def find_blacklisted_page(
+    db: Session,
+    blacklist: list,
+    per_page: int = 20,
+    after: str | None = None,
+    before: str | None = None,
+) -> dict[str, Any]:
+    """One page of blacklisted requests, newest first, by ``(day, id)`` cursor.
+
+    ``after`` is the ``next_cursor`` of the previous page and ``before`` the
+    ``prev_cursor`` of the next one. Each page reads at most ``per_page + 1``
+    rows from the days it spans, skipping days whose cached count is zero,
+    so deep pages cost the same as the first one.
+    """
+    backwards = before is not None
+    cursor = parse_cursor(before if backwards else after) if (before or after) else None
+    results = []
+    rows = []
+    total = 0
+
+    try:
+        days = _blacklist_days(db)
+        total = sum(blacklist_day_count(db, day, blacklist) for day in days)
+        if cursor:
+            days = [
+                d for d in days if (d >= cursor[0] if backwards else d <= cursor[0])
+            ]
+        if backwards:
+            days.reverse()
+
+        for date_str in days:
+            if not blacklist_day_count(db, date_str, blacklist):
+                continue
+            query, LogModel = _blacklist_query(db, date_str, blacklist)
+            if query is None:
+                continue
+            if cursor and date_str == cursor[0]:
+                query = query.filter(
+                    LogModel.id > cursor[1] if backwards else LogModel.id < cursor[1]
+                )
+            query = query.order_by(
+                LogModel.id.asc() if backwards else LogModel.id.desc()
+            ).limit(per_page + 1 - len(rows))
+            rows.extend((date_str, row) for row in query)
+            if len(rows) > per_page:
+                break
+    except SQLAlchemyError as e:
+        print(f"Database error: {e}")
+        return {"error": str(e)}
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    for date_str, row in rows:
+        results.append(
+            {
+                "fecha": f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}",
+                "usuario": row.username,
+                "url": row.url,
+            }
+        )
+
+    has_next = (not backwards and more) or (backwards and cursor is not None)
+    has_prev = (backwards and more) or (not backwards and cursor is not None)
+    return {
+        "results": results,
+        "pagination": {
+            "total": total,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page,
+            "next_cursor": format_cursor(rows[-1][0], rows[-1][1].id)
+            if rows and has_next
+            else None,
+            "prev_cursor": format_cursor(rows[0][0], rows[0][1].id)
+            if rows and has_prev
+            else None,
+        },
+    }
 
 
 def find_blacklisted_sites(
     db: Session, blacklist: list, page: int = 1, per_page: int = 10
 ) -> dict[str, Any]:
-    engine = get_engine()
-    inspector = inspect(engine)
+    """Numbered page of blacklisted requests, in the order of the cursor pages.
+
+    Whole days are skipped with their cached counts, so the offset is only
+    applied inside the day where the page starts.
+    """
     results = []
     total_results = 0
 
     try:
-        all_tables = inspector.get_table_names()
-        # Cambiar logs_ por log_ y ajustar longitud
-        log_tables = sorted(
-            [t for t in all_tables if t.startswith("log_") and len(t) == 12],
-            reverse=True,
-        )
-
         offset = (page - 1) * per_page
         remaining = per_page
-        count_only = offset >= 1000
-
-        for log_table in log_tables:
-            try:
-                date_str = log_table.split("_")[1]
-                log_date = datetime.strptime(date_str, "%Y%m%d").date()
-                formatted_date = log_date.strftime("%Y-%m-%d")
-            except (IndexError, ValueError):
-                continue
 
-            user_table = f"user_{date_str}"
-            if user_table not in all_tables:
+        for date_str in _blacklist_days(db):
+            table_total = blacklist_day_count(db, date_str, blacklist)
+            total_results += table_total
+            if remaining == 0 or offset >= table_total:
+                offset -= min(offset, table_total)
                 continue
 
-            # Obtener los modelos ORM dinámicos para esta fecha
-            try:
-                UserModel, LogModel = get_dynamic_models(date_str)
-            except Exception as e:
-                print(f"Error getting dynamic models for {date_str}: {e}")
+            query, LogModel = _blacklist_query(db, date_str, blacklist)
+            if query is None:
                 continue
+            query_results = (
+                query.order_by(LogModel.id.desc()).offset(offset).limit(remaining).all()
+            )
+            offset = 0
 
-            # Crear condiciones OR para la blacklist usando ORM
-            blacklist_conditions = [
-                LogModel.url.like(f"%{site}%") for site in blacklist
-            ]
-
-            if not count_only:
-                # Contar total usando ORM con join explícito
-                table_total = (
-                    db.query(func.count(LogModel.id))
-                    .join(UserModel, LogModel.user_id == UserModel.id)
-                    .filter(or_(*blacklist_conditions))
-                    .scalar()
-                )
-
-                total_results += table_total
-
-                if offset >= table_total:
-                    offset -= table_total
-                    continue
-
-                # Consulta principal usando ORM con join explícito
-                query_results = (
-                    db.query(UserModel.username, LogModel.url)
-                    .join(UserModel, LogModel.user_id == UserModel.id)
-                    .filter(or_(*blacklist_conditions))
-                    .offset(offset)
-                    .limit(remaining)
-                    .all()
-                )
-
-                offset = 0
-
-                for row in query_results:
-                    results.append(
-                        {
-                            "fecha": formatted_date,
-                            "usuario": row.username,
-                            "url": row.url,
-                        }
-                    )
-                    remaining -= 1
-                    if remaining == 0:
-                        break
-
-            if remaining == 0:
-                break
-
-        # Si es count_only, calcular el total usando ORM
-        if count_only:
-            total_results = 0
-            for log_table in log_tables:
-                try:
-                    date_str = log_table.split("_")[1]
-                    UserModel, LogModel = get_dynamic_models(date_str)
-                except Exception as e:
-                    print(f"Error getting dynamic models for {date_str}: {e}")
-                    continue
-
-                blacklist_conditions = [
-                    LogModel.url.like(f"%{site}%") for site in blacklist
-                ]
-
-                table_count = (
-                    db.query(func.count(LogModel.id))
-                    .join(UserModel, LogModel.user_id == UserModel.id)
-                    .filter(or_(*blacklist_conditions))
-                    .scalar()
+            formatted_date = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+            for row in query_results:
+                results.append(
+                    {"fecha": formatted_date, "usuario": row.username, "url": row.url}
                 )
-
-                total_results += table_count
+            remaining -= len(query_results)
 
     except SQLAlchemyError as e:
         print(f"Database error: {e}")
@@ -144,8 +225,8 @@ def find_blacklisted_sites_by_date(
         log_table = f"log_{date_suffix}"
 
         # Verificar que las tablas existen
-        inspector = inspect(db.get_bind())
-        if not inspector.has_table(user_table) or not inspector.has_table(log_table):
+        tables = table_catalog.tables(db.get_bind())
+        if user_table not in tables or log_table not in tables:
             return []
 
         # Obtener modelos dinámicos
@@ -155,7 +236,7 @@ def find_blacklisted_sites_by_date(
             return []
 
         # Crear condiciones OR para la blacklist usando ORM
-        blacklist_conditions = [LogModel.url.like(f"%{site}%") for site in blacklist]
+        blacklist_conditions = _blacklist_conditions(db, LogModel, blacklist)
 
         # Consulta usando ORM con join explícito
         query_results = (
@@ -3,11 +3,19 @@ import re
 from datetime import date, datetime
 from typing import Any
 
-from sqlalchemy import func, inspect
+from sqlalchemy import func
 from sqlalchemy.ext.automap import automap_base
 from sqlalchemy.orm import Session
 
-from database.database import get_concat_function, get_dynamic_models, get_session
+from database.catalog import table_catalog
+from database.database import (
+    DomainDailyStats,
+    ResponseDailyStats,
+    UserDailyStats,
+    get_concat_function,
+    get_dynamic_models,
+    get_read_session,
+)
 
 # Configuración básica de logging
 logging.basicConfig(
@@ -46,14 +54,20 @@ def get_dynamic_model(db: Session, table_name: str, date_suffix: str):
 
     # Check if the table exists
     try:
-        inspector = inspect(db.get_bind())
-        if not inspector.has_table(full_table_name):
+        if not table_catalog.has(db.get_bind(), full_table_name):
             logger.warning(f"Table {full_table_name} not found")
             return None
 
-        # Create dynamic model using automap
+        # Daily tables reuse the cached declarative models
+        if table_name in ("user", "log"):
+            UserModel, LogModel = get_dynamic_models(date_suffix)
+            return UserModel if table_name == "user" else LogModel
+
+        # Reflect only the requested table, never the whole database
         Base = automap_base()
-        Base.prepare(autoload_with=db.get_bind())
+        Base.prepare(
+            autoload_with=db.get_bind(), reflection_options={"only": [full_table_name]}
+        )
 
         return getattr(Base.classes, full_table_name, None)
     except Exception as e:
@@ -178,10 +192,10 @@ def get_users_with_logs_by_date(db: Session, date_suffix: str) -> list[dict[str,
 
 
 def get_metrics_for_date(selected_date: date):
-    session = get_session()
+    session = get_read_session()
     date_suffix = selected_date.strftime("%Y%m%d")
     try:
-        User, Log = get_dynamic_models(date_suffix)
+        User, _ = get_dynamic_models(date_suffix)
     except Exception:
         # Si no existen tablas para esa fecha, devuelve métricas vacías
         return {
@@ -204,20 +218,25 @@ def get_metrics_for_date(selected_date: date):
 
     # Total stats
     total_users = session.query(func.count(User.id)).scalar() or 0
-    total_log_entries = session.query(func.count(Log.id)).scalar() or 0
-    total_data_transmitted = (
-        session.query(func.coalesce(func.sum(Log.data_transmitted), 0)).scalar() or 0
-    )
-    total_requests = (
-        session.query(func.coalesce(func.sum(Log.request_count), 0)).scalar() or 0
+    total_data_transmitted, total_requests, total_log_entries = (
+        session.query(
+            func.coalesce(func.sum(UserDailyStats.data_transmitted), 0),
+            func.coalesce(func.sum(UserDailyStats.request_count), 0),
+            func.coalesce(func.sum(UserDailyStats.log_rows), 0),
+        )
+        .filter(UserDailyStats.day == selected_date)
+        .one()
     )
 
     # Top 20 users by activity
     top_users_by_activity = (
-        session.query(User.username, func.sum(Log.request_count).label("total_visits"))
-        .join(Log, Log.user_id == User.id)
-        .group_by(User.username)
-        .order_by(func.sum(Log.request_count).desc())
+        session.query(
+            UserDailyStats.username,
+            func.sum(UserDailyStats.request_count).label("total_visits"),
+        )
+        .filter(UserDailyStats.day == selected_date)
+        .group_by(UserDailyStats.username)
+        .order_by(func.sum(UserDailyStats.request_count).desc())
         .limit(20)
         .all()
     )
@@ -229,11 +248,12 @@ def get_metrics_for_date(selected_date: date):
     # Top 20 users by data transferred
     top_users_by_data_transferred = (
         session.query(
-            User.username, func.sum(Log.data_transmitted).label("total_data_bytes")
+            UserDailyStats.username,
+            func.sum(UserDailyStats.data_transmitted).label("total_data_bytes"),
         )
-        .join(Log, Log.user_id == User.id)
-        .group_by(User.username)
-        .order_by(func.sum(Log.data_transmitted).desc())
+        .filter(UserDailyStats.day == selected_date)
+        .group_by(UserDailyStats.username)
+        .order_by(func.sum(UserDailyStats.data_transmitted).desc())
         .limit(20)
         .all()
     )
@@ -244,7 +264,12 @@ def get_metrics_for_date(selected_date: date):
 
     # HTTP response distribution
     http_codes = (
-        session.query(Log.response, func.count(Log.id)).group_by(Log.response).all()
+        session.query(
+            ResponseDailyStats.response, func.sum(ResponseDailyStats.request_count)
+        )
+        .filter(ResponseDailyStats.day == selected_date)
+        .group_by(ResponseDailyStats.response)
+        .all()
     )
     code_labels = [str(code) for code, _ in http_codes]
     code_data = [count for _, count in http_codes]
@@ -261,24 +286,25 @@ def get_metrics_for_date(selected_date: date):
         for code in code_labels
     ]
 
-    # Top 20 pages
+    # Top 20 sites (by domain)
     top_pages = (
         session.query(
-            Log.url,
-            func.sum(Log.request_count).label("total_requests"),
-            func.count(func.distinct(Log.user_id)).label("unique_visits"),
-            func.sum(Log.data_transmitted).label("total_data_bytes"),
+            DomainDailyStats.domain,
+            func.sum(DomainDailyStats.request_count).label("total_requests"),
+            func.count(DomainDailyStats.username).label("unique_users"),
+            func.sum(DomainDailyStats.data_transmitted).label("total_data_bytes"),
         )
-        .group_by(Log.url)
-        .order_by(func.sum(Log.request_count).desc())
+        .filter(DomainDailyStats.day == selected_date)
+        .group_by(DomainDailyStats.domain)
+        .order_by(func.sum(DomainDailyStats.request_count).desc())
         .limit(20)
         .all()
     )
     top_pages = [
         {
-            "url": p.url,
+            "domain": p.domain,
             "total_requests": p.total_requests,
-            "unique_visits": p.unique_visits,
+            "unique_users": p.unique_users,
             "total_data_bytes": p.total_data_bytes,
         }
         for p in top_pages
@@ -1,22 +1,33 @@
 import datetime
 from datetime import timedelta
 
-from sqlalchemy import Column, Integer, String, desc, func, inspect
+from sqlalchemy import Column, Integer, String, desc, func
 from sqlalchemy.orm import Session, relationship
 
-from database.database import get_concat_function, get_dynamic_models
+from database.catalog import table_catalog
+from database.database import (
+    DomainDailyStats,
+    ResponseDailyStats,
+    UserDailyStats,
+    get_concat_function,
+    get_dynamic_models,
+)
 
 
 def get_important_metrics(db: Session, UserModel, LogModel):
+    """Report metrics of the day of ``LogModel``, read from the rollup tables."""
     results = {}
+    day = datetime.datetime.strptime(LogModel.__tablename__[4:], "%Y%m%d").date()
 
     try:
         # 1. Usuarios más activos (por número de visitas)
-        # Formato corregido: Paréntesis para continuar la consulta
         top_users_by_activity = (
-            db.query(UserModel.username, func.count(LogModel.id).label("total_visits"))
-            .join(LogModel, UserModel.id == LogModel.user_id)  # JOIN explícito
-            .group_by(UserModel.username)
+            db.query(
+                UserDailyStats.username,
+                func.sum(UserDailyStats.request_count).label("total_visits"),
+            )
+            .filter(UserDailyStats.day == day)
+            .group_by(UserDailyStats.username)
             .order_by(desc("total_visits"))
             .limit(20)
             .all()
@@ -30,11 +41,11 @@ def get_important_metrics(db: Session, UserModel, LogModel):
         # 2. Usuarios que más datos transfirieron
         top_users_by_data = (
             db.query(
-                UserModel.username,
-                func.sum(LogModel.data_transmitted).label("total_data"),
+                UserDailyStats.username,
+                func.sum(UserDailyStats.data_transmitted).label("total_data"),
             )
-            .join(LogModel, UserModel.id == LogModel.user_id)
-            .group_by(UserModel.username)
+            .filter(UserDailyStats.day == day)
+            .group_by(UserDailyStats.username)
             .order_by(desc("total_data"))
             .limit(20)
             .all()
@@ -45,15 +56,16 @@ def get_important_metrics(db: Session, UserModel, LogModel):
             for user in top_users_by_data
         ]
 
-        # 3. Páginas más visitadas
+        # 3. Sitios más visitados (por dominio)
         top_pages = (
             db.query(
-                LogModel.url,
-                func.sum(LogModel.request_count).label("total_requests"),
-                func.count(LogModel.id).label("unique_visits"),
-                func.sum(LogModel.data_transmitted).label("total_data"),
+                DomainDailyStats.domain,
+                func.sum(DomainDailyStats.request_count).label("total_requests"),
+                func.count(DomainDailyStats.username).label("unique_users"),
+                func.sum(DomainDailyStats.data_transmitted).label("total_data"),
             )
-            .group_by(LogModel.url)
+            .filter(DomainDailyStats.day == day)
+            .group_by(DomainDailyStats.domain)
             .order_by(desc("total_requests"))
             .limit(20)
             .all()
@@ -61,33 +73,39 @@ def get_important_metrics(db: Session, UserModel, LogModel):
 
         results["top_pages"] = [
             {
-                "url": page[0],
+                "domain": page[0],
                 "total_requests": page[1],
-                "unique_visits": page[2],
+                "unique_users": page[2],
                 "total_data_bytes": page[3],
             }
             for page in top_pages
         ]
 
-        # 4. Páginas por volumen de datos
+        # 4. Sitios por volumen de datos
         top_pages_data = (
             db.query(
-                LogModel.url, func.sum(LogModel.data_transmitted).label("total_data")
+                DomainDailyStats.domain,
+                func.sum(DomainDailyStats.data_transmitted).label("total_data"),
             )
-            .group_by(LogModel.url)
+            .filter(DomainDailyStats.day == day)
+            .group_by(DomainDailyStats.domain)
             .order_by(desc("total_data"))
             .limit(20)
             .all()
         )
 
         results["top_pages_by_data"] = [
-            {"url": page[0], "total_data_bytes": page[1]} for page in top_pages_data
+            {"domain": page[0], "total_data_bytes": page[1]} for page in top_pages_data
         ]
 
         # 5. Distribución de códigos HTTP
         response_distribution = (
-            db.query(LogModel.response, func.count(LogModel.id).label("count"))
-            .group_by(LogModel.response)
+            db.query(
+                ResponseDailyStats.response,
+                func.sum(ResponseDailyStats.request_count).label("count"),
+            )
+            .filter(ResponseDailyStats.day == day)
+            .group_by(ResponseDailyStats.response)
             .order_by(desc("count"))
             .all()
         )
@@ -117,14 +135,20 @@ def get_important_metrics(db: Session, UserModel, LogModel):
         ]
 
         # 7. Estadísticas globales
+        total_data, total_requests, total_log_entries = (
+            db.query(
+                func.sum(UserDailyStats.data_transmitted),
+                func.sum(UserDailyStats.request_count),
+                func.sum(UserDailyStats.log_rows),
+            )
+            .filter(UserDailyStats.day == day)
+            .one()
+        )
         total_stats = {
             "total_users": db.query(func.count(UserModel.id)).scalar() or 0,
-            "total_log_entries": db.query(func.count(LogModel.id)).scalar() or 0,
-            "total_data_transmitted": db.query(
-                func.sum(LogModel.data_transmitted)
-            ).scalar()
-            or 0,
-            "total_requests": db.query(func.sum(LogModel.request_count)).scalar() or 0,
+            "total_log_entries": total_log_entries or 0,
+            "total_data_transmitted": total_data or 0,
+            "total_requests": total_requests or 0,
         }
 
         results["total_stats"] = total_stats
@@ -212,9 +236,8 @@ def get_metrics_by_date_range(start_date: str, end_date: str, db: Session):
 
 def has_table(db: Session, table_name: str) -> bool:
     try:
-        # Usar el inspector para verificar existencia de tabla
-        inspector = inspect(db.get_bind())
-        return inspector.has_table(table_name)
+        # Lista de tablas cacheada, sin consultar el catálogo de la base
+        return table_catalog.has(db.get_bind(), table_name)
     except Exception as e:
         print(f"Error checking table {table_name}: {str(e)}")
         return False
@@ -0,0 +1,69 @@
+"""Status of the squidstats-ingest daemon over a local Unix socket.
+
+The daemon answers every connection on ``INGEST_STATUS_SOCKET`` with one
+JSON document and closes it; the web app reads it with
+:func:`read_ingest_status`.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections.abc import Callable
+
+from config import Config
+
+INGEST_STATUS_SOCKET = getattr(Config, "INGEST_STATUS_SOCKET", "ingest.sock")
+
+
+class _StatusHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        status = self.server.get_status()
+        self.request.sendall(json.dumps(status, default=str).encode())
+
+
+class StatusServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, get_status: Callable[[], dict]):
+        if os.path.exists(path):
+            if read_ingest_status(path) is not None:
+                raise RuntimeError(f"Another ingest daemon is answering on {path}")
+            # Left behind by a daemon that was killed
+            os.unlink(path)
+        self.path = path
+        self.get_status = get_status
+        super().__init__(path, _StatusHandler)
+
+    def start(self):
+        threading.Thread(
+            target=self.serve_forever, name="ingest-status", daemon=True
+        ).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def read_ingest_status(
+    path: str = INGEST_STATUS_SOCKET, timeout: float = 1.0
+) -> dict | None:
+    """Status reported by the daemon, or None if it does not answer."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+    except OSError:
+        return None
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        return None
@@ -0,0 +1,142 @@
+"""Cache of computed report metrics keyed by report name and day.
+
+Entries live in memory for ``REPORT_CACHE_TTL`` seconds and are dropped as
+soon as this process commits new rollups for their day. Closed days are
+additionally persisted in ``report_cache`` together with the day's
+``rollup_version`` read before computing them; a row whose version no longer
+matches is recomputed, whichever process wrote to the day since. Lookups may
+run on a read-only session; persisted rows are written through
+``session_factory`` when one is given.
+"""
+
+import json
+import threading
+import time
+from collections.abc import Callable
+from datetime import date
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from config import Config, logger
+from database.database import ReportCache, get_session
+from database.rollups import rollup_generation, rollup_version
+
+REPORT_CACHE_TTL = getattr(Config, "REPORT_CACHE_TTL", 30)
+REPORT_CACHE_MAX_ENTRIES = 64
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class ReportMetricsCache:
+    def __init__(
+        self,
+        ttl: float = REPORT_CACHE_TTL,
+        max_entries: int = REPORT_CACHE_MAX_ENTRIES,
+        session_factory: Callable[[], Session] | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.session_factory = session_factory
+        # (name, day) -> (rollup generation, stored at, JSON payload)
+        self._entries: dict[tuple[str, date], tuple[int, float, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persisted_hits = 0
+        self.misses = 0
+
+    def get_or_compute(
+        self, db: Session, name: str, day: date, compute: Callable[[], dict]
+    ) -> dict:
+        """Return the cached metrics of ``name`` for ``day`` or compute them.
+
+        Callers get a fresh copy and may modify it. Empty results (errors)
+        are never cached.
+        """
+        key = (name, day)
+        generation = rollup_generation(day)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == generation and now - entry[1] < self.ttl:
+                self.hits += 1
+                return json.loads(entry[2])
+
+        closed = day < date.today()
+        version = None
+        if closed:
+            version = rollup_version(db, day)
+            row = db.get(ReportCache, key)
+            if row is not None and row.version == version:
+                with self._lock:
+                    self.persisted_hits += 1
+                    self._store(key, generation, now, row.payload)
+                return json.loads(row.payload)
+
+        with self._lock:
+            self.misses += 1
+        metrics = compute()
+        if not metrics:
+            return metrics
+        payload = json.dumps(metrics, default=_json_default)
+        # Skip storing if the day changed while the metrics were computed
+        if rollup_generation(day) != generation:
+            return metrics
+        if closed:
+            # Stored with the version read before computing: a batch
+            # committed meanwhile makes the next lookup recompute it
+            self._persist(db, name, day, payload, version)
+        with self._lock:
+            self._store(key, generation, now, payload)
+        return metrics
+
+    def _persist(self, db: Session, name: str, day: date, payload: str, version: int):
+        writer = self.session_factory() if self.session_factory else db
+        try:
+            writer.merge(
+                ReportCache(name=name, day=day, payload=payload, version=version)
+            )
+            writer.commit()
+        except SQLAlchemyError as e:
+            writer.rollback()
+            logger.warning(f"Could not persist {name} report of {day}: {e}")
+        finally:
+            if writer is not db:
+                writer.close()
+
+    def _store(self, key, generation: int, now: float, payload: str):
+        self._entries.pop(key, None)
+        self._entries[key] = (generation, now, payload)
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.persisted_hits + self.misses
+            return {
+                "hits": self.hits,
+                "persisted_hits": self.persisted_hits,
+                "misses": self.misses,
+                "hit_ratio": (
+                    round((self.hits + self.persisted_hits) / lookups, 4)
+                    if lookups
+                    else 0.0
+                ),
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+            }
+
+
+report_cache = ReportMetricsCache(session_factory=get_session)
@@ -95,11 +95,30 @@
     }
   }
 
+  let runningAuditId = null;
+
+  function newAuditId(){
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+  }
+
+  function cancelRunningAudit(){
+    if (!runningAuditId) return;
+    const body = new Blob([JSON.stringify({ audit_id: runningAuditId })], { type:'application/json' });
+    navigator.sendBeacon('/api/run-audit/cancel', body);
+    runningAuditId = null;
+  }
+
   function bindForm(){
+    window.addEventListener('pagehide', cancelRunningAudit);
     els.form.addEventListener('submit', e=>{
       e.preventDefault();
       const data = collectFormData();
       if (!validateRequired(data)) return;
+      cancelRunningAudit();
+      const auditId = newAuditId();
+      runningAuditId = auditId;
+      data.audit_id = auditId;
       const submitButton = els.form.querySelector('button[type="submit"]');
       const buttonIcon = submitButton.querySelector('i');
       submitButton.disabled = true;
@@ -111,12 +130,14 @@
       fetch('/api/run-audit', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(data) })
         .then(r=>r.json())
         .then(result=>{
+          if (runningAuditId === auditId) runningAuditId = null;
           toastr.clear(); restoreSubmitButton();
           if (result.error) { toastr.error(result.error,'Error en la auditoría'); }
           else { toastr.success('Reporte generado exitosamente','Auditoría completada'); }
           renderResults(data.audit_type, result, data);
         })
         .catch(err=>{
+          if (runningAuditId === auditId) runningAuditId = null;
           toastr.clear(); restoreSubmitButton();
           toastr.error('Error de conexión con el servidor','Error de red');
           els.resultsContainer.innerHTML = `<div class=\"bg-white p-6 rounded-lg shadow-lg\"><div class=\"text-center text-red-500 py-10\"><strong>Error de red o del servidor:</strong> ${err}</div></div>`;
@@ -47,8 +47,8 @@
   }
 
   function renderTopUrls(data){
-    const rows = data.top_urls.map((url,i)=>`<tr class="hover:bg-gray-50"><td class="p-3">${i+1}</td><td class="p-3 font-medium"><a href="${url.url.startsWith('http')?url.url:'http://'+url.url}" target="_blank" class="text-blue-600 hover:underline break-all" title="${url.url}">${url.url.length>60?url.url.substring(0,60)+'...':url.url}</a></td><td class="p-3 font-mono">${url.total_data_gb.toFixed(2)} GB</td></tr>`).join('');
-    return `<div class="bg-white p-6 rounded-lg shadow-lg"><h2 class="text-2xl font-bold mb-4">Top 15 URLs por Consumo de Datos</h2><table class="w-full text-left"><thead class="bg-gray-100"><tr><th class="p-3">#</th><th class="p-3">URL</th><th class="p-3">Datos Consumidos</th></tr></thead><tbody class="divide-y">${rows}</tbody></table></div>`;
+    const rows = data.top_urls.map((site,i)=>`<tr class="hover:bg-gray-50"><td class="p-3">${i+1}</td><td class="p-3 font-medium"><a href="http://${site.domain}" target="_blank" class="text-blue-600 hover:underline break-all" title="${site.domain}">${site.domain.length>60?site.domain.substring(0,60)+'...':site.domain}</a></td><td class="p-3 font-mono">${site.total_data_gb.toFixed(2)} GB</td></tr>`).join('');
+    return `<div class="bg-white p-6 rounded-lg shadow-lg"><h2 class="text-2xl font-bold mb-4">Top 15 Sitios por Consumo de Datos</h2><table class="w-full text-left"><thead class="bg-gray-100"><tr><th class="p-3">#</th><th class="p-3">Dominio</th><th class="p-3">Datos Consumidos</th></tr></thead><tbody class="divide-y">${rows}</tbody></table></div>`;
   }
 
   function renderTopUsersRequests(data){
@@ -1,8 +1,10 @@
 // User search & conditional inputs (sin cambios funcionales)
 (function(){
   const conditionalInputs = {};
-  let allUsers = [];
+  const USER_SUGGESTIONS = 50;
   let filteredUsers = [];
+  let searchTimer = null;
+  let searchSeq = 0;
   let selectedUserIndex = -1;
   let elements = {};
 
@@ -50,8 +52,11 @@
       option.dataset.index = index;
       option.addEventListener('click', ()=>selectUser(user, user));
       if (searchTerm){
-        const regex = new RegExp(`(${searchTerm})`, 'gi');
-        option.innerHTML = user.replace(regex, '<mark class="bg-yellow-200">$1</mark>');
+        const mark = document.createElement('mark');
+        mark.className = 'bg-yellow-200';
+        mark.textContent = user.slice(0, searchTerm.length);
+        option.textContent = user.slice(searchTerm.length);
+        option.prepend(mark);
       }
       elements.userOptionsContainer.appendChild(option);
     });
@@ -64,16 +69,20 @@
   }
 
   function selectUser(value, displayText){
+    if (value && ![...elements.usernameSelect.options].some(opt=>opt.value===value)){
+      const opt=document.createElement('option'); opt.value=value; opt.textContent=value;
+      elements.usernameSelect.appendChild(opt);
+    }
     elements.userSearchInput.value = displayText;
     elements.usernameSelect.value = value;
     elements.userDropdown.classList.add('hidden');
     selectedUserIndex = -1;
   }
 
+  // Usernames starting with the typed text, searched on the server
   function filterUsers(term){
-    if (!term) filteredUsers = [...allUsers];
-    else filteredUsers = allUsers.filter(u=>u.toLowerCase().includes(term.toLowerCase()));
-    renderUserOptions(filteredUsers, term);
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(()=>fetchUsers(term), term ? 150 : 0);
   }
 
   function updateSelectedOption(options){
@@ -94,13 +103,16 @@
     document.addEventListener('click', e=>{ if(!input.contains(e.target) && !elements.userDropdown.contains(e.target)){ elements.userDropdown.classList.add('hidden'); selectedUserIndex=-1; }});
   }
 
-  function fetchUsers(){
-    fetch('/api/all-users')
+  function fetchUsers(term=''){
+    const seq = ++searchSeq;
+    const params = new URLSearchParams({ limit: USER_SUGGESTIONS });
+    if (term && term !== '-- Todos --') params.set('q', term);
+    fetch(`/api/all-users?${params}`)
       .then(r=>r.json())
       .then(users=>{
-        allUsers = users; filteredUsers=[...users];
-        users.forEach(u=>{ const opt=document.createElement('option'); opt.value=u; opt.textContent=u; elements.usernameSelect.appendChild(opt); });
-        renderUserOptions(filteredUsers);
+        if (seq !== searchSeq) return; // a newer search is on its way
+        filteredUsers = users;
+        renderUserOptions(filteredUsers, params.get('q') || '');
       })
       .catch(()=> toastr.error('Error al cargar la lista de usuarios','Error de carga'));
   }
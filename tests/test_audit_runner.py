@@ -0,0 +1,46 @@
+import sys
+import threading
+from pathlib import Path
+from unittest import mock
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import create_engine, literal, select
+
+from services import audit_runner
+
+
+class TestAuditRunner(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        patcher = mock.patch.object(
+            audit_runner, "get_read_engine", lambda: self.engine
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.engine.dispose)
+
+    def test_results_keep_query_order(self):
+        queries = [select(literal(day).label("day")) for day in range(8)]
+        parts = audit_runner.run_queries(queries)
+        self.assertEqual([rows[0].day for rows in parts], list(range(8)))
+
+    def test_cancelled_audit_raises(self):
+        event = audit_runner.register("audit-1")
+        self.assertTrue(audit_runner.cancel("audit-1"))
+        with self.assertRaises(audit_runner.AuditCancelled):
+            audit_runner.run_queries([select(literal(1))], event)
+        audit_runner.release("audit-1")
+        self.assertFalse(audit_runner.cancel("audit-1"))
+
+    def test_anonymous_audits_are_not_registered(self):
+        event = audit_runner.register(None)
+        self.assertIsInstance(event, threading.Event)
+        self.assertFalse(audit_runner.cancel(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import create_dynamic_tables, dynamic_model_cache
+from services import auditoria_service
+from services.auditoria_service import (
+    find_by_ip,
+    find_by_keyword,
+    find_by_response_code,
+    find_denied_access,
+)
+
+DAYS = ("20240501", "20240502", "20240503")
+# Ordered differently by a case-insensitive collation than by code point
+USERS = (
+    ("alice", "10.0.0.1"),
+    ("Bob", "10.0.0.2"),
+    ("carol", "10.0.0.1"),
+    ("Zed", "10.0.0.4"),
+)
+
+
+class TestAuditUnion(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.engine = create_engine(f"sqlite:///{Path(workdir.name) / 'audit.db'}")
+        self.addCleanup(self.engine.dispose)
+        for target, value in (
+            ("database.database.get_engine", self.engine),
+            ("services.audit_runner.get_read_engine", self.engine),
+        ):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        dynamic_model_cache.clear()
+        self.addCleanup(dynamic_model_cache.clear)
+
+        for day in DAYS:
+            # NOCASE stands in for MySQL's case-insensitive collations
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql(
+                    f"CREATE TABLE user_{day} (id INTEGER PRIMARY KEY, "
+                    "username VARCHAR(255) COLLATE NOCASE NOT NULL, "
+                    "ip VARCHAR(255) NOT NULL, created_at DATETIME)"
+                )
+            create_dynamic_tables(self.engine, day)
+        with self.engine.begin() as conn:
+            for index, day in enumerate(DAYS):
+                for user_id, (username, ip) in enumerate(USERS, 1):
+                    conn.exec_driver_sql(
+                        f"INSERT INTO user_{day} (id, username, ip) VALUES (?, ?, ?)",
+                        (user_id, username, ip),
+                    )
+                    for n in range(user_id + index):
+                        created_at = datetime(2024, 5, 1 + index, 8 + n, user_id)
+                        response = 403 if n % 3 == 2 else 200
+                        conn.exec_driver_sql(
+                            f"INSERT INTO log_{day} (user_id, url, response, "
+                            "request_count, data_transmitted, created_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (
+                                user_id,
+                                f"http://example.com/{n % 2}",
+                                response,
+                                n + 1,
+                                100 * n,
+                                created_at,
+                            ),
+                        )
+        self.db = sessionmaker(bind=self.engine)()
+        self.addCleanup(self.db.close)
+
+    def searches(self):
+        return {
+            "keyword": lambda s, e: find_by_keyword(self.db, s, e, "example"),
+            "ip": lambda s, e: find_by_ip(self.db, s, e, "10.0.0.1"),
+            "response": lambda s, e: find_by_response_code(self.db, s, e, 403),
+            "denied": lambda s, e: find_denied_access(self.db, s, e),
+        }
+
+    def run_mode(self, mode: str, union_tables: int = 400) -> dict:
+        with (
+            mock.patch.object(auditoria_service, "AUDIT_QUERY_MODE", mode),
+            mock.patch.object(
+                auditoria_service, "AUDIT_UNION_MAX_TABLES", union_tables
+            ),
+        ):
+            return {
+                name: search("2024-05-01", "2024-05-03")["results"]
+                for name, search in self.searches().items()
+            }
+
+    def test_modes_return_the_same_rows(self):
+        union = self.run_mode("UNION")
+        self.assertTrue(all(union.values()))
+        self.assertEqual(self.run_mode("UNION", union_tables=2), union)
+        self.assertEqual(self.run_mode("PARALLEL"), union)
+
+    def test_range_matches_single_days(self):
+        union = self.run_mode("UNION")
+        for name, search in self.searches().items():
+            single_days = []
+            for day in DAYS:
+                iso = f"{day[:4]}-{day[4:6]}-{day[6:]}"
+                single_days += search(iso, iso)["results"]
+            with self.subTest(search=name):
+                key = lambda row: sorted(row.items(), key=str)  # noqa: E731
+                self.assertEqual(
+                    sorted(union[name], key=key), sorted(single_days, key=key)
+                )
+
+    def test_rows_are_ordered_by_code_point(self):
+        for mode, union_tables in (("UNION", 1), ("PARALLEL", 400)):
+            results = self.run_mode(mode, union_tables)
+            with self.subTest(mode=mode):
+                keyword = [
+                    (row["username"], row["log_date"], row["access_count"])
+                    for row in results["keyword"]
+                ]
+                self.assertEqual(keyword, sorted(keyword, reverse=True))
+                self.assertEqual(
+                    list(dict.fromkeys(username for username, _, _ in keyword)),
+                    ["carol", "alice", "Zed", "Bob"],
+                )
+                denied = [
+                    (row["log_date"], row["username"]) for row in results["denied"]
+                ]
+                self.assertEqual(denied, sorted(denied, reverse=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from parsers.batch_sizer import BatchSizer
+
+
+class TestBatchSizer(unittest.TestCase):
+    def commit(self, sizer, per_line):
+        sizer.record(sizer.size, sizer.size * per_line)
+
+    def test_grows_while_time_per_line_falls(self):
+        sizer = BatchSizer(500, 100, 5000, target_seconds=10)
+        for per_line in (1e-3, 8e-4, 6e-4, 5e-4):
+            self.commit(sizer, per_line)
+        self.assertGreater(sizer.size, 500)
+
+        grown = sizer.size
+        self.commit(sizer, 1e-3)
+        self.assertLess(sizer.size, grown)
+
+    def test_failed_and_slow_commits_halve_within_bounds(self):
+        sizer = BatchSizer(1000, 300, 5000, target_seconds=1)
+        sizer.record(1000, 0.1, failed=True)
+        self.assertEqual(sizer.size, 500)
+        sizer.record(500, 2.0)
+        self.assertEqual(sizer.size, 300)
+
+    def test_early_flushes_are_ignored(self):
+        sizer = BatchSizer(500, 100, 5000, target_seconds=1)
+        sizer.record(20, 0.01)
+        self.assertEqual((sizer.size, sizer.per_line), (500, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
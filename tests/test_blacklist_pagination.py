@@ -0,0 +1,103 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import categories
+from database.database import create_dynamic_tables, dynamic_model_cache
+from services import blacklist_users
+from services.blacklist_users import find_blacklisted_page, find_blacklisted_sites
+from utils.domains import url_domain_key
+
+DAYS = ("20240501", "20240502")
+BLACKLIST = ["bad.com"]
+
+
+class TestBlacklistPagination(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        patcher = mock.patch("database.database.get_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.engine.dispose)
+        self.addCleanup(dynamic_model_cache.clear)
+        self.addCleanup(blacklist_users._day_counts.clear)
+        self.addCleanup(setattr, categories, "_tagger", None)
+        dynamic_model_cache.clear()
+        categories._tagger = None
+
+        with self.engine.begin() as conn:
+            for day in DAYS:
+                create_dynamic_tables(self.engine, day)
+                conn.exec_driver_sql(
+                    f"INSERT INTO user_{day} (username, ip) VALUES ('u', '10.0.0.1')"
+                )
+                for n in range(5):
+                    for url in (f"http://www.bad.com/{day}/{n}", "http://good.org/"):
+                        conn.exec_driver_sql(
+                            f"INSERT INTO log_{day} (user_id, url, domain_rev, "
+                            "response, request_count, data_transmitted) "
+                            "VALUES (1, ?, ?, 200, 1, 0)",
+                            (url, url_domain_key(url)),
+                        )
+        self.db = sessionmaker(bind=self.engine)()
+        self.addCleanup(self.db.close)
+
+    def test_cursor_pages_walk_both_ways(self):
+        pages = []
+        data = find_blacklisted_page(self.db, BLACKLIST, per_page=3)
+        while True:
+            pages.append(data)
+            cursor = data["pagination"]["next_cursor"]
+            if cursor is None:
+                break
+            data = find_blacklisted_page(self.db, BLACKLIST, per_page=3, after=cursor)
+
+        self.assertEqual(len(pages), 4)
+        self.assertEqual(pages[0]["pagination"]["total"], 10)
+        self.assertIsNone(pages[0]["pagination"]["prev_cursor"])
+        urls = [row["url"] for page in pages for row in page["results"]]
+        expected = [
+            f"http://www.bad.com/{d}/{n}" for d in DAYS[::-1] for n in (4, 3, 2, 1, 0)
+        ]
+        self.assertEqual(urls, expected)
+        for number, page in enumerate(pages, start=1):
+            numbered = find_blacklisted_sites(self.db, BLACKLIST, number, 3)
+            self.assertEqual(numbered["results"], page["results"])
+
+        back = find_blacklisted_page(
+            self.db, BLACKLIST, per_page=3, before=pages[2]["pagination"]["prev_cursor"]
+        )
+        self.assertEqual(back["results"], pages[1]["results"])
+        self.assertIsNotNone(back["pagination"]["prev_cursor"])
+        self.assertIsNotNone(back["pagination"]["next_cursor"])
+
+    def test_counts_follow_rows_written_elsewhere(self):
+        data = find_blacklisted_page(self.db, BLACKLIST, per_page=3)
+        self.assertEqual(data["pagination"]["total"], 10)
+        # Another process (the ingest daemon) appends to a closed day
+        with self.engine.begin() as conn:
+            url = "http://bad.com/late"
+            conn.exec_driver_sql(
+                f"INSERT INTO log_{DAYS[0]} (user_id, url, domain_rev, response, "
+                "request_count, data_transmitted) VALUES (1, ?, ?, 200, 1, 0)",
+                (url, url_domain_key(url)),
+            )
+
+        data = find_blacklisted_page(self.db, BLACKLIST, per_page=3)
+        self.assertEqual(data["pagination"]["total"], 11)
+
+    def test_malformed_cursor(self):
+        with self.assertRaises(ValueError):
+            find_blacklisted_page(self.db, BLACKLIST, after="yesterday")
+
+
+if __name__ == "__main__":
+    unittest.main()
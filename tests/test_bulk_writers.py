@@ -0,0 +1,87 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    create_engine,
+    select,
+)
+from sqlalchemy.orm import sessionmaker
+
+from database.bulk_writers import (
+    BulkWriter,
+    CopyWriter,
+    MultiRowInsertWriter,
+    copy_text,
+    get_bulk_writer,
+)
+
+ROWS = [
+    {"url": "http://a.com/", "blacklisted": True, "created_at": datetime(2024, 5, 1)},
+    {"url": "tab\there", "blacklisted": False, "created_at": None},
+    {"url": "c:\\new\nline", "blacklisted": None, "created_at": datetime(2024, 5, 2)},
+]
+
+
+class TestBulkWriters(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.addCleanup(self.engine.dispose)
+        self.table = Table(
+            "log_20240501",
+            MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("url", Text),
+            Column("blacklisted", Boolean),
+            Column("created_at", DateTime),
+        )
+        self.table.create(self.engine)
+
+    def test_writers_store_the_same_rows(self):
+        for writer in (BulkWriter(), MultiRowInsertWriter(chunk_size=2)):
+            with self.subTest(writer=writer.name):
+                with self.engine.begin() as conn:
+                    conn.execute(self.table.delete())
+                session = sessionmaker(bind=self.engine)()
+                writer.write(session, self.table, ROWS)
+                writer.write(session, self.table, [])
+                session.commit()
+                session.close()
+                with self.engine.connect() as conn:
+                    stored = conn.execute(
+                        select(
+                            self.table.c.url,
+                            self.table.c.blacklisted,
+                            self.table.c.created_at,
+                        ).order_by(self.table.c.id)
+                    ).all()
+                self.assertEqual([tuple(row.values()) for row in ROWS], stored)
+
+    def test_copy_text_escapes_values(self):
+        self.assertEqual(
+            copy_text(ROWS, ("url", "blacklisted", "created_at")),
+            "http://a.com/\tt\t2024-05-01 00:00:00\n"
+            "tab\\there\tf\t\\N\n"
+            "c:\\\\new\\nline\t\\N\t2024-05-02 00:00:00\n",
+        )
+
+    def test_writer_follows_database_type(self):
+        self.assertIsInstance(get_bulk_writer("postgresql"), CopyWriter)
+        self.assertIsInstance(get_bulk_writer("MARIADB"), MultiRowInsertWriter)
+        self.assertIs(type(get_bulk_writer("SQLITE")), BulkWriter)
+
+
+if __name__ == "__main__":
+    unittest.main()
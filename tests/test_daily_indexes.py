@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, inspect
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from database.database import create_dynamic_tables, user_key_index
+from parsers.log import resolve_users
+
+Base = declarative_base()
+
+
+class DayUser(Base):
+    __tablename__ = "user_20240501"
+    __table_args__ = (user_key_index("user_20240501"),)
+    id = Column(Integer, primary_key=True)
+    username = Column(String(255), nullable=False)
+    ip = Column(String(255), nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class TestDailyIndexes(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.addCleanup(self.engine.dispose)
+
+    def test_daily_tables_are_created_with_indexes(self):
+        create_dynamic_tables(self.engine, "20240501")
+        inspector = inspect(self.engine)
+        log_indexes = {index["name"] for index in inspector.get_indexes("log_20240501")}
+        for column_name in ("user_id", "response", "created_at", "domain_rev"):
+            self.assertIn(f"ix_log_20240501_{column_name}", log_indexes)
+        user_index = inspector.get_indexes("user_20240501")[0]
+        self.assertEqual(user_index["column_names"], ["username", "ip"])
+        self.assertTrue(user_index["unique"])
+
+    def test_users_added_by_another_writer_are_reused(self):
+        Base.metadata.create_all(self.engine)
+        session = sessionmaker(bind=self.engine)()
+        self.addCleanup(session.close)
+        session.add(DayUser(username="alice", ip="10.0.0.1"))
+        session.commit()
+
+        cache = {}
+        keys = {("alice", "10.0.0.1"), ("bob", "10.0.0.2")}
+        self.assertEqual(resolve_users(session, DayUser, cache, keys), 1)
+        self.assertEqual(set(cache), keys)
+        self.assertEqual(session.query(DayUser).count(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
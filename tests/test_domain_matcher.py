@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    create_engine,
+    select,
+)
+
+from database.categories import BLACKLIST_CATEGORY, DomainTagger, retag_table
+from utils.domain_matcher import DomainMatcher
+from utils.domains import url_domain_key
+
+
+class TestDomainMatcher(unittest.TestCase):
+    def test_longest_suffix_wins(self):
+        matcher = DomainMatcher({"google.com": "search", "mail.google.com": "mail"})
+        self.assertEqual(matcher.match(url_domain_key("https://google.com/")), "search")
+        self.assertEqual(
+            matcher.match(url_domain_key("https://www.google.com")), "search"
+        )
+        self.assertEqual(
+            matcher.match(url_domain_key("https://x.mail.google.com/")), "mail"
+        )
+        self.assertIsNone(matcher.match(url_domain_key("https://notgoogle.com/")))
+        self.assertIsNone(matcher.match(url_domain_key("https://google.com.evil.org/")))
+        self.assertEqual(len(matcher), 2)
+
+    def test_tagger_and_retag(self):
+        categories = {"Facebook": ["facebook.com"], BLACKLIST_CATEGORY: ["fbcdn.net"]}
+        tagger = DomainTagger({"Facebook": 3, BLACKLIST_CATEGORY: 9}, categories)
+        self.assertEqual(tagger.tag("com.facebook.www"), (3, False))
+        self.assertEqual(tagger.tag("net.fbcdn.static"), (None, True))
+        self.assertEqual(tagger.tag("org.example"), (None, False))
+        self.assertTrue(tagger.tags_blacklist(["FBCDN.net"]))
+        self.assertFalse(tagger.tags_blacklist(["fbcdn.net", "example.org"]))
+
+        engine = create_engine("sqlite://")
+        table = Table(
+            "log_20240101",
+            MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("domain_rev", String(255)),
+            Column("category_id", SmallInteger),
+            Column("blacklisted", Boolean),
+        )
+        table.create(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                table.insert(),
+                [
+                    {"domain_rev": "com.facebook.m", "blacklisted": False},
+                    {"domain_rev": "net.fbcdn", "blacklisted": False},
+                    {
+                        "domain_rev": "org.example",
+                        "category_id": 3,
+                        "blacklisted": True,
+                    },
+                ],
+            )
+        self.assertEqual(retag_table(engine, table.name, tagger), 2)
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.category_id, table.c.blacklisted).order_by(table.c.id)
+            ).all()
+        self.assertEqual(rows, [(3, False), (None, True), (None, False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+
+from database.database import DOMAIN_KEY_TYPE
+from utils.domains import domain_filter, url_domain_key, url_host
+
+
+class TestDomains(unittest.TestCase):
+    def test_url_host(self):
+        self.assertEqual(url_host("http://Example.com:8080/a/b"), "example.com")
+        self.assertEqual(url_host("example.com:443"), "example.com")
+        self.assertEqual(url_host("https://user@www.example.com./"), "www.example.com")
+        self.assertEqual(url_host("http://[2001:db8::1]:80/"), "2001:db8::1")
+
+    def test_domain_filter_matches_domain_and_subdomains(self):
+        engine = create_engine("sqlite://")
+        table = Table(
+            "logs",
+            MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("domain_rev", DOMAIN_KEY_TYPE, index=True),
+        )
+        table.create(engine)
+        urls = [
+            "https://facebook.com/",
+            "https://www.facebook.com/x",
+            "m.facebook.com:443",
+            "https://notfacebook.com/",
+            "https://facebook.com.evil.org/",
+            "https://facebook.community/",
+        ]
+        with engine.begin() as conn:
+            conn.execute(
+                table.insert(), [{"domain_rev": url_domain_key(url)} for url in urls]
+            )
+            matched = conn.execute(
+                select(table.c.id).where(
+                    domain_filter(table.c.domain_rev, "*.Facebook.com")
+                )
+            ).all()
+        self.assertEqual(sorted(row.id for row in matched), [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
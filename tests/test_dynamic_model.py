@@ -0,0 +1,74 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.catalog import table_catalog
+from database.database import (
+    create_dynamic_tables,
+    dynamic_model_cache,
+    get_dynamic_models,
+)
+from services.fetch_data_logs import get_dynamic_model
+
+
+class TestGetDynamicModel(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.engine = create_engine(f"sqlite:///{Path(workdir.name) / 'models.db'}")
+        self.addCleanup(self.engine.dispose)
+        patcher = mock.patch("database.database.get_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dynamic_model_cache.clear()
+        self.addCleanup(dynamic_model_cache.clear)
+        table_catalog.invalidate()
+        self.addCleanup(table_catalog.invalidate)
+
+        create_dynamic_tables(self.engine, "20240501")
+        with self.engine.begin() as conn:
+            for name in ("stats_20240501", "other_20240501"):
+                conn.exec_driver_sql(
+                    f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, total INTEGER)"
+                )
+        table_catalog.invalidate()
+        self.db = sessionmaker(bind=self.engine)()
+        self.addCleanup(self.db.close)
+
+    def test_daily_tables_use_the_cached_models(self):
+        user_model, log_model = get_dynamic_models("20240501")
+        self.assertIs(get_dynamic_model(self.db, "user", "20240501"), user_model)
+        self.assertIs(get_dynamic_model(self.db, "log", "20240501"), log_model)
+
+    def test_missing_table_returns_none(self):
+        self.assertIsNone(get_dynamic_model(self.db, "log", "20240502"))
+        self.assertIsNone(get_dynamic_model(self.db, "stats", "20240502"))
+
+    def test_only_the_requested_table_is_reflected(self):
+        table_catalog.tables(self.engine)
+        statements = []
+        event.listen(
+            self.engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        model = get_dynamic_model(self.db, "stats", "20240501")
+        self.assertEqual(model.__table__.name, "stats_20240501")
+        self.assertEqual(list(model.metadata.tables), ["stats_20240501"])
+        self.assertTrue(statements)
+        for name in ("other_20240501", "log_20240501", "user_20240501"):
+            self.assertFalse([s for s in statements if name in s])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from unittest import mock
+
+from config import APP_DIR, _data_file
+from services.ingest_status import StatusServer, read_ingest_status
+
+
+class TestIngestStatus(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = str(Path(workdir.name) / "ingest.sock")
+
+    def test_status_round_trip(self):
+        self.assertIsNone(read_ingest_status(self.path))
+        server = StatusServer(self.path, lambda: {"pid": 42, "following": True})
+        server.start()
+        try:
+            self.assertEqual(
+                read_ingest_status(self.path), {"pid": 42, "following": True}
+            )
+            with self.assertRaises(RuntimeError):
+                StatusServer(self.path, dict)
+        finally:
+            server.stop()
+        self.assertFalse(Path(self.path).exists())
+
+    def test_stale_socket_is_replaced(self):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+
+        server = StatusServer(self.path, dict)
+        server.start()
+        try:
+            self.assertEqual(read_ingest_status(self.path), {})
+        finally:
+            server.stop()
+
+
+class TestSocketPath(unittest.TestCase):
+    def test_default_sits_next_to_the_sqlite_database(self):
+        env = {"DATABASE_STRING_CONNECTION": "sqlite:////var/lib/squidstats/s.db"}
+        with mock.patch.dict(os.environ, env):
+            os.environ.pop("INGEST_STATUS_SOCKET", None)
+            os.environ.pop("DATABASE_TYPE", None)
+            self.assertEqual(
+                _data_file("INGEST_STATUS_SOCKET", "ingest.sock"),
+                "/var/lib/squidstats/ingest.sock",
+            )
+
+    def test_relative_paths_are_anchored_in_the_app_directory(self):
+        for value, expected in (
+            ("run/ingest.sock", os.path.join(APP_DIR, "run/ingest.sock")),
+            ("/run/squidstats.sock", "/run/squidstats.sock"),
+            ("", ""),
+        ):
+            with mock.patch.dict(os.environ, {"INGEST_STATUS_SOCKET": value}):
+                self.assertEqual(
+                    _data_file("INGEST_STATUS_SOCKET", "ingest.sock"), expected
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from database.database import DeniedLog
+from parsers.log_aggregator import LogAggregator
+
+KEY = ("username", "ip", "url", "method", "status", "response")
+
+
+def _line(url="http://example.com/", username="alice"):
+    return {
+        "username": username,
+        "ip": "10.0.0.1",
+        "url": url,
+        "method": "GET",
+        "status": "TCP_DENIED/403",
+        "response": 403,
+    }
+
+
+class TestLogAggregator(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        DeniedLog.__table__.create(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.created_at = datetime(2024, 5, 1, 10, 0, 0)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _commit(self, aggregator):
+        aggregator.flush(self.session)
+        self.session.commit()
+        aggregator.committed()
+
+    def test_lines_are_folded_per_key(self):
+        aggregator = LogAggregator(DeniedLog, KEY, window_seconds=60)
+        for _ in range(5):
+            aggregator.add(_line(), 100, self.created_at)
+        aggregator.add(_line(url="http://other.com/"), 10, self.created_at)
+        self._commit(aggregator)
+
+        rows = self.session.query(DeniedLog).order_by(DeniedLog.url).all()
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[0].request_count, rows[0].data_transmitted), (5, 500))
+        self.assertEqual(aggregator.stats()["rows_in"], 6)
+        self.assertEqual(aggregator.stats()["rows_out"], 2)
+
+    def test_open_rows_are_incremented_across_flushes(self):
+        aggregator = LogAggregator(DeniedLog, KEY, window_seconds=60)
+        aggregator.add(_line(), 100, self.created_at)
+        self._commit(aggregator)
+        aggregator.add(_line(), 50, self.created_at)
+        self._commit(aggregator)
+
+        row = self.session.query(DeniedLog).one()
+        self.assertEqual((row.request_count, row.data_transmitted), (2, 150))
+        self.assertEqual(aggregator.stats()["rows_updated"], 1)
+
+    def test_add_tells_which_lines_open_a_row(self):
+        aggregator = LogAggregator(DeniedLog, KEY, window_seconds=60)
+        opened = [aggregator.add(_line(), 1, self.created_at) for _ in range(2)]
+        self._commit(aggregator)
+        opened.append(aggregator.add(_line(), 1, self.created_at))
+        opened.append(aggregator.add(_line(username="bob"), 1, self.created_at))
+        self._commit(aggregator)
+
+        self.assertEqual(opened, [True, False, False, True])
+        self.assertEqual(self.session.query(func.count(DeniedLog.id)).scalar(), 2)
+
+    def test_new_window_starts_new_row(self):
+        aggregator = LogAggregator(DeniedLog, KEY, window_seconds=60)
+        aggregator.add(_line(), 1, self.created_at)
+        self._commit(aggregator)
+        aggregator.add(_line(), 1, self.created_at.replace(minute=5))
+        self._commit(aggregator)
+
+        self.assertEqual(self.session.query(func.count(DeniedLog.id)).scalar(), 2)
+
+    def test_rollback_keeps_aggregates_for_retry(self):
+        aggregator = LogAggregator(DeniedLog, KEY, window_seconds=60)
+        aggregator.add(_line(), 100, self.created_at)
+        aggregator.flush(self.session)
+        self.session.rollback()
+        aggregator.rolled_back()
+        self.assertEqual(len(aggregator.pending), 1)
+
+        self._commit(aggregator)
+        self.assertEqual(self.session.query(DeniedLog).one().request_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
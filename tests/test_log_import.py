@@ -0,0 +1,98 @@
+import gzip
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from parsers import log
+from parsers.log_import import (
+    gzip_blocks,
+    import_tasks,
+    parse_range,
+    rotated_logs,
+    split_ranges,
+)
+
+DAY_ONE = datetime(2024, 5, 1, 23, 59, 59).timestamp()
+DAY_TWO = datetime(2024, 5, 2, 0, 0, 1).timestamp()
+
+
+def _line(ts, status="TCP_MISS/200", user="alice"):
+    return (
+        f"{ts:.3f}    12 10.0.0.1 {status} 1500 GET http://example.com/ "
+        f"{user} HIER_DIRECT/203.0.113.1 text/html\n"
+    )
+
+
+class TestLogImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.format = log.LOG_FORMAT
+        log.LOG_FORMAT = "DEFAULT"
+
+    def tearDown(self):
+        log.LOG_FORMAT = self.format
+        self.tmp.cleanup()
+
+    def test_ranges_end_on_line_boundaries(self):
+        path = self.dir / "access.log.1"
+        path.write_text("".join(_line(DAY_ONE + i) for i in range(100)))
+        ranges = split_ranges(str(path), chunk_size=1000)
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], path.stat().st_size)
+        data = path.read_bytes()
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1 : end], b"\n")
+        lines = sum(parse_range((str(path), r, 0))[0] for r in ranges)
+        self.assertEqual(lines, 100)
+
+    def test_compressed_logs_are_read_in_blocks(self):
+        path = self.dir / "access.log.2.gz"
+        data = "".join(_line(DAY_ONE + i) for i in range(100)).encode()
+        with gzip.open(path, "wb") as f:
+            f.write(data)
+        blocks = list(gzip_blocks(str(path), chunk_size=1000))
+        self.assertGreater(len(blocks), 1)
+        self.assertTrue(all(len(block) <= 1000 + len(_line(0)) for block in blocks))
+        self.assertTrue(all(block.endswith(b"\n") for block in blocks))
+        self.assertEqual(b"".join(blocks), data)
+
+        tasks = list(import_tasks(str(path), chunk_size=1000))
+        self.assertEqual([block for _, block, _ in tasks], blocks)
+        self.assertEqual(sum(parse_range(task)[0] for task in tasks), 100)
+
+    def test_rows_are_routed_by_line_timestamp(self):
+        path = self.dir / "access.log.2.gz"
+        with gzip.open(path, "wt") as f:
+            f.write(_line(DAY_ONE))
+            f.write(_line(DAY_TWO))
+            f.write(_line(DAY_TWO, status="TCP_DENIED/403"))
+        (task,) = import_tasks(str(path))
+        lines, days = parse_range(task)
+        self.assertEqual(lines, 3)
+        self.assertEqual(sorted(days), ["20240501", "20240502"])
+        logs, denied = days["20240502"]
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs[0][5], datetime(2024, 5, 2, 0, 0, 1))
+        self.assertEqual(denied[0]["response"], 403)
+
+    def test_rotated_logs_oldest_first(self):
+        for name in ("access.log", "access.log.1", "access.log.2.gz", "access.log.10"):
+            (self.dir / name).touch()
+        names = [
+            os.path.basename(p) for p in rotated_logs(str(self.dir / "access.log"))
+        ]
+        self.assertEqual(names, ["access.log.10", "access.log.2.gz", "access.log.1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
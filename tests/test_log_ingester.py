@@ -0,0 +1,461 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import categories
+from database.database import (
+    LogMetadata,
+    UserDailyStats,
+    create_dynamic_tables,
+    dynamic_model_cache,
+    get_dynamic_models,
+)
+from parsers import log
+from parsers.log_follower import LogFollower
+
+START = datetime(2024, 5, 1, 10, 0, 0).timestamp()
+USERS = ("alice", "bob", "carol")
+USERS_IPS = [(user, f"10.0.0.{n}") for n, user in enumerate(USERS, 1)]
+
+
+def _line(index: int, start: float = START) -> str:
+    user = USERS[index % len(USERS)]
+    return (
+        f"{start + index * 0.01:.3f}    12 10.0.0.{index % len(USERS) + 1} "
+        f"TCP_MISS/200 1000 GET http://example.com/ {user} "
+        "HIER_DIRECT/203.0.113.1 text/html\n"
+    )
+
+
+class IngesterTestCase(unittest.TestCase):
+    """A file-backed SQLite database and access.log for one ingester."""
+
+    settings = {}
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.dir = Path(workdir.name)
+        self.log_file = self.dir / "access.log"
+        self.log_file.touch()
+        self.engine = create_engine(f"sqlite:///{self.dir / 'squidstats.db'}")
+        self.addCleanup(self.engine.dispose)
+        for target in ("database.database.get_engine", "parsers.log.get_engine"):
+            patcher = mock.patch(target, return_value=self.engine)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        settings = {
+            "LOG_FORMAT": "DEFAULT",
+            "LOG_INGEST_MODE": "RAW",
+            "LOG_SPOOL_FILE": str(self.dir / "ingest.spool"),
+            **self.settings,
+        }
+        for name, value in settings.items():
+            patcher = mock.patch.object(log, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self._reset_state()
+        self.addCleanup(self._reset_state)
+        create_dynamic_tables(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.session = self.Session()
+        self.addCleanup(self.session.close)
+
+    @staticmethod
+    def _reset_state():
+        dynamic_model_cache.clear()
+        categories._tagger = None
+        log._log_aggregators.clear()
+        log._denied_aggregator = None
+        log._batch_sizer = None
+
+    def append(self, lines):
+        with open(self.log_file, "a") as f:
+            f.writelines(lines)
+
+    def ingester(self) -> log.LogIngester:
+        ingester = log.LogIngester(str(self.log_file), self.session)
+        ingester.open()
+        self.addCleanup(ingester.close)
+        return ingester
+
+    def stored(self, date_suffix: str = "20240501") -> tuple[int, int]:
+        """(raw rows, requests) in the log table of ``date_suffix``."""
+        _, log_model = get_dynamic_models(date_suffix)
+        with self.Session() as session:
+            return session.query(
+                func.count(log_model.id),
+                func.coalesce(func.sum(log_model.request_count), 0),
+            ).one()
+
+    def checkpoint(self) -> int | None:
+        with self.Session() as session:
+            metadata = session.query(LogMetadata).first()
+            return metadata.last_position if metadata else None
+
+
+class TestResolveUsers(IngesterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_model, _ = get_dynamic_models("20240501")
+
+    def users(self) -> dict:
+        with self.Session() as session:
+            return {
+                (row.username, row.ip): row.id for row in session.query(self.user_model)
+            }
+
+    def test_new_and_known_users_in_one_batch(self):
+        cache = {}
+        self.assertEqual(
+            log.resolve_users(self.session, self.user_model, cache, {USERS_IPS[0]}), 1
+        )
+        inserted = log.resolve_users(
+            self.session, self.user_model, cache, set(USERS_IPS)
+        )
+        self.assertEqual(inserted, 2)
+        self.assertEqual(cache, self.users())
+        self.assertEqual(len(cache), 3)
+
+    def test_pairs_repeated_in_a_batch_are_inserted_once(self):
+        cache = {}
+        keys = [USERS_IPS[0], USERS_IPS[1], USERS_IPS[0]]
+        self.assertEqual(
+            log.resolve_users(self.session, self.user_model, cache, keys), 2
+        )
+        self.assertEqual(cache, self.users())
+
+    def test_users_added_by_another_writer(self):
+        log.resolve_users(self.session, self.user_model, {}, {USERS_IPS[0]})
+        # A stale cache: the insert conflicts and the existing id is loaded
+        cache = {}
+        inserted = log.resolve_users(
+            self.session, self.user_model, cache, set(USERS_IPS)
+        )
+        self.assertEqual(inserted, 2)
+        self.assertEqual(cache, self.users())
+
+    def test_pairs_that_cannot_be_stored_are_left_out(self):
+        cache = {}
+        keys = {USERS_IPS[0], (None, "10.0.0.9"), ("", "10.0.0.9")}
+        self.assertEqual(
+            log.resolve_users(self.session, self.user_model, cache, keys), 1
+        )
+        self.assertEqual(cache, self.users())
+
+    def test_refused_pair_after_a_conflict_costs_only_itself(self):
+        log.resolve_users(self.session, self.user_model, {}, {USERS_IPS[0]})
+        refused = ("dave", "10.0.0.4")
+        real_execute = self.session.execute
+
+        def execute(statement, rows=None, **kwargs):
+            if rows and any((r["username"], r["ip"]) == refused for r in rows):
+                if len(rows) == 1:
+                    raise IntegrityError("INSERT", {}, Exception("NOT NULL"))
+            return real_execute(statement, rows, **kwargs)
+
+        cache = {}
+        with mock.patch.object(self.session, "execute", side_effect=execute):
+            inserted = log.resolve_users(
+                self.session, self.user_model, cache, {*USERS_IPS, refused}
+            )
+        self.assertEqual(inserted, 2)
+        self.assertNotIn(refused, cache)
+        self.assertEqual(cache, self.users())
+
+    def test_ids_survive_a_rolled_back_batch(self):
+        cache = {}
+        log.resolve_users(self.session, self.user_model, cache, set(USERS_IPS))
+        ids = dict(cache)
+        _, log_model = get_dynamic_models("20240501")
+        self.session.add(
+            log_model(user_id=ids[USERS_IPS[0]], url="http://a.com/", response=200)
+        )
+        self.session.flush()
+        self.session.rollback()
+
+        # Users are committed on their own, so the cached ids stay valid
+        self.assertEqual(self.users(), ids)
+        self.assertEqual(
+            log.resolve_users(self.session, self.user_model, cache, set(USERS_IPS)), 0
+        )
+        self.assertEqual(cache, ids)
+
+
+class TestUnknownUsers(IngesterTestCase):
+    settings = {"LOG_FORMAT": "DETAILED"}
+
+    def test_line_without_client_is_skipped_alone(self):
+        # DETAILED logs the client IP as the username, None when it is "-"
+        bad = _line(5).replace(" 10.0.0.3 ", " - ")
+        self.append([*(_line(i) for i in range(5)), bad])
+        self.append(_line(i) for i in range(6, 11))
+        ingester = self.ingester()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+        self.assertEqual(self.stored(), (10, 10))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+        self.assertEqual(ingester.inserted_users, 3)
+
+
+class TestAggregateWithSpool(IngesterTestCase):
+    settings = {"LOG_INGEST_MODE": "AGGREGATE"}
+
+    def test_follow_mode_waits_for_the_window(self):
+        self.append(_line(i) for i in range(300))
+        ingester = self.ingester()
+        self.assertIsNotNone(ingester.spool)
+        ingester.read_available()
+
+        # Past the follower's max delay the lines are folded, not written
+        self.assertFalse(ingester.flush_if_due(0))
+        self.assertEqual(self.stored(), (0, 0))
+        self.assertGreater(ingester.flush_delay(0), 1)
+
+        self.assertTrue(ingester.commit_batch())
+        self.assertEqual(self.stored(), (3, 300))
+        with self.Session() as session:
+            log_rows = session.query(func.sum(UserDailyStats.log_rows)).scalar()
+        self.assertEqual(log_rows, 3)
+
+    def test_spooled_aggregates_merge_on_replay(self):
+        self.append(_line(i) for i in range(30))
+        ingester = self.ingester()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+
+        self.append(_line(i) for i in range(30, 330))
+        ingester.read_available()
+        ingester.aggregates_due()
+        down = OperationalError("INSERT", {}, Exception("database is locked"))
+        with mock.patch.object(ingester, "write_batch", side_effect=down):
+            self.assertTrue(ingester.commit_batch())
+        records = list(ingester.spool.records())
+        self.assertEqual(len(records), 1)
+        # Three folded lines stand for the 300 read while the database was down
+        self.assertEqual(len(records[0].lines), 3)
+        self.assertEqual(ingester.spooled_lines, 300)
+        self.assertEqual(self.stored(), (3, 30))
+
+        ingester.spool_retry_at = 0
+        self.assertTrue(ingester.commit_batch())
+        self.assertFalse(ingester.spool)
+        # The replay increments the rows of the same window
+        self.assertEqual(self.stored(), (3, 330))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+
+
+class TestCheckpoints(IngesterTestCase):
+    settings = {"BATCH_SIZE": 100, "LOG_SPOOL_FILE": ""}
+
+    def test_budgeted_runs_resume_where_they_stopped(self):
+        self.append(
+            _line(i).replace("example.com/", f"example.com/{i}") for i in range(250)
+        )
+        with mock.patch.object(log, "get_session", side_effect=self.Session):
+            log.process_logs(str(self.log_file), max_seconds=0, max_lines=100)
+            self.assertEqual(self.stored(), (100, 100))
+            self.assertLess(self.checkpoint(), self.log_file.stat().st_size)
+
+            # A run killed before its commit leaves the checkpoint behind it
+            ingester = self.ingester()
+            ingester.read_available(max_lines=100)
+            ingester.close()
+            self.assertEqual(self.stored(), (100, 100))
+
+            for _ in range(2):
+                log.process_logs(str(self.log_file), max_seconds=0, max_lines=100)
+        self.assertEqual(self.stored(), (250, 250))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+        _, log_model = get_dynamic_models("20240501")
+        with self.Session() as session:
+            distinct = session.query(func.count(func.distinct(log_model.url)))
+            self.assertEqual(distinct.scalar(), 250)
+
+    def test_rolled_back_batch_keeps_the_checkpoint(self):
+        self.append(_line(i) for i in range(10))
+        ingester = self.ingester()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+        committed = self.checkpoint()
+
+        self.append(_line(i) for i in range(10, 20))
+        ingester.read_available()
+        down = OperationalError("COMMIT", {}, Exception("database is locked"))
+        with mock.patch.object(self.session, "commit", side_effect=down):
+            self.assertFalse(ingester.commit_batch())
+        self.assertEqual(self.checkpoint(), committed)
+        self.assertEqual(self.stored(), (10, 10))
+
+        # The rows stay queued and go out with the next commit
+        self.assertTrue(ingester.commit_batch())
+        self.assertEqual(self.stored(), (20, 20))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+
+    def test_retried_batch_is_stored_before_the_checkpoint_moves(self):
+        ingester = self.ingester()
+        for target, attribute in ((log, "resolve_users"), (ingester.writer, "write")):
+            real = getattr(target, attribute)
+            failures = [IntegrityError("INSERT", {}, Exception("UNIQUE failed"))]
+
+            def fail_once(*args, real=real, failures=failures):
+                if failures:
+                    raise failures.pop()
+                return real(*args)
+
+            with self.subTest(failing=attribute):
+                start = self.stored()[0]
+                self.append(_line(i) for i in range(start, start + 10))
+                ingester.read_available()
+                with mock.patch.object(target, attribute, side_effect=fail_once):
+                    self.assertTrue(ingester.commit_batch())
+                self.assertEqual(self.stored(), (start + 10, start + 10))
+                self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+
+
+class TestRotation(IngesterTestCase):
+    def rotate(self, lines):
+        """logrotate's rename/create, with ``lines`` in the new access.log."""
+        os.rename(self.log_file, f"{self.log_file}.1")
+        self.log_file.touch()
+        self.append(lines)
+
+    def truncate(self, lines):
+        """copytruncate, with fewer ``lines`` written back than were read."""
+        with open(self.log_file, "w") as f:
+            f.writelines(lines)
+
+    def wait_for(self, stored: tuple[int, int]):
+        deadline = time.monotonic() + 10
+        while self.stored() != stored and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.stored(), stored)
+
+    def test_reopen_drains_the_rotated_file(self):
+        self.append(_line(i) for i in range(10))
+        ingester = self.ingester()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+        self.assertFalse(ingester.rotated())
+
+        # Squid writes to the old file until it reopens its log
+        self.append(_line(i) for i in range(10, 15))
+        self.rotate(_line(i) for i in range(15, 22))
+        self.assertTrue(ingester.rotated())
+        ingester.reopen()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+        self.assertEqual(self.stored(), (22, 22))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+        self.assertFalse(ingester.rotated())
+
+    def test_truncated_file_is_read_from_the_start(self):
+        self.append(_line(i) for i in range(10))
+        ingester = self.ingester()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+
+        self.truncate(_line(i) for i in range(10, 13))
+        self.assertTrue(ingester.rotated())
+        ingester.reopen()
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+        self.assertEqual(self.stored(), (13, 13))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+
+    def test_follower_survives_rotation_and_truncation(self):
+        follower = LogFollower(str(self.log_file), max_delay=0, poll_interval=0.05)
+        with mock.patch("parsers.log_follower.get_session", side_effect=self.Session):
+            thread = threading.Thread(target=follower.run)
+            thread.start()
+            try:
+                self.append(_line(i) for i in range(10))
+                self.wait_for((10, 10))
+                self.rotate(_line(i) for i in range(10, 25))
+                self.wait_for((25, 25))
+                self.truncate(_line(i) for i in range(25, 30))
+                self.wait_for((30, 30))
+            finally:
+                follower.stop()
+                thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+
+
+class TestRejectedBatches(IngesterTestCase):
+    def test_batch_failing_integrity_checks_is_set_aside(self):
+        self.append(_line(i) for i in range(10))
+        ingester = self.ingester()
+        ingester.read_available()
+        conflict = IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+        with mock.patch.object(ingester.writer, "write", side_effect=conflict):
+            self.assertFalse(ingester.commit_batch())
+
+        # The checkpoint moves past the batch, whose lines wait in the file
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+        records = list(ingester.rejected.records())
+        self.assertEqual([len(r.lines) for r in records], [10])
+        self.assertEqual(ingester.status()["rejected_lines"], 10)
+        self.assertFalse(ingester.spool)
+
+        self.append(_line(i) for i in range(10, 15))
+        ingester.read_available()
+        self.assertTrue(ingester.commit_batch())
+        self.assertEqual(self.stored(), (5, 5))
+
+    def test_spooled_batch_failing_every_replay_is_set_aside(self):
+        # Too long for the url column on PostgreSQL or MySQL
+        self.append(
+            _line(i).replace("example.com/", "long.example/") for i in range(10)
+        )
+        ingester = self.ingester()
+        ingester.read_available()
+        down = OperationalError("INSERT", {}, Exception("database is locked"))
+        with mock.patch.object(ingester.writer, "write", side_effect=down):
+            self.assertTrue(ingester.commit_batch())
+        self.assertEqual(ingester.spooled_lines, 10)
+
+        write = ingester.writer.write
+        too_long = DataError("INSERT", {}, Exception("value too long"))
+
+        def refuse_long_urls(session, table, rows):
+            if any("long.example" in row.get("url", "") for row in rows):
+                raise too_long
+            return write(session, table, rows)
+
+        with (
+            mock.patch.object(log, "LOG_SPOOL_MAX_ATTEMPTS", 3),
+            mock.patch.object(ingester.writer, "write", side_effect=refuse_long_urls),
+        ):
+            for attempt in range(3):
+                self.append([_line(10 + attempt)])
+                ingester.read_available()
+                ingester.spool_retry_at = 0
+                ingester.commit_batch()
+                self.assertEqual(len(list(ingester.rejected.records())), attempt // 2)
+            # The batches queued behind it go through
+            self.assertTrue(ingester.commit_batch())
+
+        self.assertFalse(ingester.spool)
+        records = list(ingester.rejected.records())
+        self.assertEqual([len(r.lines) for r in records], [10])
+        self.assertEqual(self.stored(), (3, 3))
+        self.assertEqual(self.checkpoint(), self.log_file.stat().st_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
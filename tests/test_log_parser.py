@@ -0,0 +1,115 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from parsers import log
+from parsers.log import batch_created_at, make_line_parser, parse_log_line
+
+LINE = (
+    "1714600800.123    12 10.0.0.1 TCP_MISS/200 1500 GET http://example.com/ "
+    "alice HIER_DIRECT/203.0.113.1 text/html\n"
+)
+
+CLASSIC_LINES = [
+    LINE,
+    "1714600800.5 7 10.0.0.2 TCP_DENIED/403 0 CONNECT bad.com:443 - HIER_NONE/- -\n",
+    "1714600800.5 7 10.0.0.2 NONE/000 0 NONE error:invalid-request - HIER_NONE/- -\n",
+    # Ignored errors are dropped wherever they appear in the line
+    "1714600800.5 7 10.0.0.2 TCP_MISS/200 9 GET http://example.com/Error:Invalid-Request"
+    " bob HIER_DIRECT/203.0.113.1 text/html\n",
+    "1714600800.5 7 10.0.0.2 TCP_MISS/200 9 GET http://example.com/ bob HIER_NONE/- "
+    "error:transaction-end-before-headers\n",
+    "1714600800.5 7 10.0.0.2 TCP_MISS/200 9 GET http://example.com/error:other bob "
+    "HIER_DIRECT/203.0.113.1 text/html\n",
+    "1714600800.5 7 10.0.0.2 TCP_MISS/200 9 GET cache_object://localhost/info a\n",
+    "1714600800.5 7 10.0.0.2 TCP_MISS 9 GET http://example.com/ bob\n",
+    "garbage line\n",
+]
+PIPE_LINES = [
+    "1714600800.1|10.0.0.1|-|alice|-|GET|http://example.com/|HTTP/1.1|200|1500|"
+    "-|text/html|HIER_DIRECT|TCP_MISS\n",
+    "1714600800.1|10.0.0.1|-|-|-|GET|http://example.com/|HTTP/1.1|200|1500|"
+    "-|text/html|HIER_DIRECT|TCP_MISS\n",
+    "1714600800.1|10.0.0.1|short\n",
+]
+SPACE_LINES = [
+    "1714600800.1 10.0.0.1 - alice - GET TCP_MISS http://example.com/ HTTP/1.1 "
+    "200 1500 text/html\n",
+    "1714600800.1 10.0.0.1 - alice - GET TCP_DENIED http://example.com/ HTTP/1.1 "
+    "403 0\n",
+]
+
+
+class TestLineParser(unittest.TestCase):
+    def setUp(self):
+        self.format = log.LOG_FORMAT
+
+    def tearDown(self):
+        log.LOG_FORMAT = self.format
+
+    def assertSameAsGeneric(self, log_format, detected, lines):
+        log.LOG_FORMAT = log_format
+        parse = make_line_parser(detected)
+        for line in lines:
+            with self.subTest(line=line):
+                self.assertEqual(parse(line), parse_log_line(line))
+
+    def test_default_parser_matches_generic(self):
+        self.assertSameAsGeneric("DEFAULT", "default", CLASSIC_LINES)
+
+    def test_ignored_errors_anywhere_are_dropped(self):
+        for log_format, detected in (
+            ("DEFAULT", "default"),
+            ("DETAILED", "space"),
+            ("DETAILED", "pipe"),
+        ):
+            log.LOG_FORMAT = log_format
+            parse = make_line_parser(detected)
+            with self.subTest(detected=detected):
+                self.assertIsNone(parse(CLASSIC_LINES[3]))
+                self.assertIsNone(parse(CLASSIC_LINES[4]))
+                self.assertIsNotNone(parse(CLASSIC_LINES[5]))
+
+    def test_detailed_parsers_match_generic(self):
+        lines = CLASSIC_LINES + PIPE_LINES + SPACE_LINES
+        self.assertSameAsGeneric("DETAILED", "space", lines)
+        self.assertSameAsGeneric("DETAILED", "pipe", lines)
+
+
+class TestLogTimestamps(unittest.TestCase):
+    def setUp(self):
+        self.format = log.LOG_FORMAT
+
+    def tearDown(self):
+        log.LOG_FORMAT = self.format
+
+    def test_parsers_return_squid_timestamp(self):
+        for log_format in ("DEFAULT", "DETAILED"):
+            log.LOG_FORMAT = log_format
+            self.assertEqual(parse_log_line(LINE)["timestamp"], 1714600800.123)
+
+    def test_batch_shares_one_datetime_per_second(self):
+        fallback = datetime(2024, 1, 1)
+        base = datetime(2024, 5, 1, 23, 59, 59).timestamp()
+        stamps = batch_created_at(
+            [
+                {"timestamp": base + 0.1},
+                {"timestamp": base + 0.9},
+                {"timestamp": base + 1.2},
+                {"timestamp": None},
+            ],
+            fallback,
+        )
+        self.assertIs(stamps[0][0], stamps[1][0])
+        self.assertEqual(stamps[1], (datetime(2024, 5, 1, 23, 59, 59), "20240501"))
+        self.assertEqual(stamps[2], (datetime(2024, 5, 2), "20240502"))
+        self.assertEqual(stamps[3], (fallback, "20240101"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import io
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from parsers.log_reader import LogTailReader
+
+
+class TestLogTailReader(unittest.TestCase):
+    def test_offsets_match_bytes_consumed(self):
+        data = "línea uno\nline two\n".encode()
+        reader = LogTailReader(io.BytesIO(data))
+        lines = reader.read_lines()
+        self.assertEqual(next(lines), "línea uno\n")
+        self.assertEqual(reader.position, len("línea uno\n".encode()))
+        self.assertEqual(list(lines), ["line two\n"])
+        self.assertEqual(reader.position, len(data))
+
+    def test_partial_trailing_line_is_not_consumed(self):
+        f = io.BytesIO(b"first\nsecond-incompl")
+        reader = LogTailReader(f)
+        self.assertEqual(list(reader.read_raw_lines()), [b"first\n"])
+        self.assertEqual(reader.position, 6)
+        self.assertEqual(reader.pending_bytes, len(b"second-incompl"))
+
+        # Squid finishes the line; its writes do not move our file offset
+        resume = reader.position
+        f.seek(0, io.SEEK_END)
+        f.write(b"ete\n")
+        f.seek(resume)
+        self.assertEqual(list(reader.read_raw_lines()), [b"second-incomplete\n"])
+        self.assertEqual(reader.pending_bytes, 0)
+        self.assertEqual(reader.position, len(b"first\nsecond-incomplete\n"))
+
+    def test_resume_from_stored_position(self):
+        reader = LogTailReader(io.BytesIO(b"a\nb\nc\n"), position=2)
+        self.assertEqual(list(reader.read_raw_lines()), [b"b\n", b"c\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
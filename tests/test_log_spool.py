@@ -0,0 +1,87 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from parsers.spool import FoldedLines, LogSpool, line_count
+
+LINES = [
+    {
+        "timestamp": 1714550400.123,
+        "ip": "10.0.0.1",
+        "username": "alice",
+        "url": "http://ejemplo.com/año",
+        "response": 200,
+        "data_transmitted": 1234,
+        "request_count": 1,
+        "method": "GET",
+        "status": "TCP_MISS/200",
+        "is_denied": False,
+    },
+    {
+        "timestamp": None,
+        "ip": "10.0.0.2",
+        "username": None,
+        "url": "blocked.example.com:443",
+        "response": 403,
+        "data_transmitted": 0,
+        "request_count": 3,
+        "method": "CONNECT",
+        "status": "TCP_DENIED/403",
+        "is_denied": True,
+    },
+]
+
+
+class TestLogSpool(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = str(Path(workdir.name) / "ingest.spool")
+
+    def test_batches_round_trip_in_order(self):
+        spool = LogSpool(self.path)
+        self.assertFalse(spool)
+        spool.append(LINES, 100, 7)
+        spool.append(LINES[:1], 250, 7)
+
+        records = list(LogSpool(self.path).records())
+        self.assertEqual([(r.position, r.inode) for r in records], [(100, 7), (250, 7)])
+        self.assertEqual(records[0].lines, LINES)
+        self.assertEqual(spool.checkpoints(), [(100, 7), (250, 7)])
+
+        spool.clear()
+        self.assertFalse(spool)
+        self.assertEqual(list(spool.records()), [])
+
+    def test_torn_record_is_cut_off(self):
+        spool = LogSpool(self.path)
+        spool.append(LINES, 100, 7)
+        intact = spool.size
+        with open(self.path, "ab") as f:
+            f.write(b"\xff\x00\x00\x00partial")
+
+        spool = LogSpool(self.path)
+        self.assertEqual(spool.size, intact)
+        spool.append(LINES[:1], 250, 7)
+        self.assertEqual(spool.checkpoints(), [(100, 7), (250, 7)])
+
+    def test_folded_lines_keep_their_counts(self):
+        folded = FoldedLines(60)
+        folded.extend([LINES[0], LINES[0], {**LINES[0], "url": "http://b.com/"}])
+        folded.extend([{**LINES[0], "timestamp": LINES[0]["timestamp"] + 60}])
+        self.assertEqual(len(folded), 3)
+        self.assertEqual(line_count(folded), 4)
+
+        spool = LogSpool(self.path)
+        spool.append(list(folded), 100, 7)
+        first = next(spool.records()).lines[0]
+        self.assertEqual((first["request_count"], first["data_transmitted"]), (2, 2468))
+
+
+if __name__ == "__main__":
+    unittest.main()
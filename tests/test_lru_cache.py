@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from utils.lru import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_least_recently_used_day_is_evicted(self):
+        cache = LRUCache(max_size=2)
+        cache.put("user_log_20240501", "may1")
+        cache.put("user_log_20240502", "may2")
+        self.assertEqual(cache.get("user_log_20240501"), "may1")
+        cache.put("user_log_20240503", "may3")
+
+        self.assertIsNone(cache.get("user_log_20240502"))
+        self.assertEqual(cache.get("user_log_20240503"), "may3")
+        self.assertEqual(len(cache), 2)
+        stats = cache.stats()
+        self.assertEqual(
+            (stats["hits"], stats["misses"], stats["evictions"]), (2, 1, 1)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
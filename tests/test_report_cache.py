@@ -0,0 +1,98 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import ROLLUP_MODELS, ReportCache
+from database.rollups import RollupAccumulator
+from services.report_cache import ReportMetricsCache
+
+CLOSED_DAY = date.today() - timedelta(days=3)
+
+
+class TestReportMetricsCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        for model in (*ROLLUP_MODELS, ReportCache):
+            model.__table__.create(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.computed = 0
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def compute(self):
+        self.computed += 1
+        return {"total_stats": {"total_requests": self.computed}}
+
+    def lookup(self, cache, day=CLOSED_DAY):
+        return cache.get_or_compute(self.session, "metrics", day, self.compute)
+
+    def test_closed_days_are_persisted(self):
+        self.lookup(ReportMetricsCache())
+        cache = ReportMetricsCache()
+        self.assertEqual(self.lookup(cache)["total_stats"]["total_requests"], 1)
+        self.lookup(cache)
+        self.assertEqual(self.computed, 1)
+        stats = cache.stats()
+        self.assertEqual((stats["persisted_hits"], stats["hits"]), (1, 1))
+
+    def test_new_rollups_invalidate_the_day(self):
+        cache = ReportMetricsCache()
+        self.lookup(cache)
+        accumulator = RollupAccumulator()
+        accumulator.add(CLOSED_DAY, 9, "alice", "10.0.0.1", "http://a.com/", 200, 1, 1)
+        accumulator.flush(self.session)
+        self.session.commit()
+        accumulator.committed()
+
+        self.assertEqual(self.lookup(cache)["total_stats"]["total_requests"], 2)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def _write_elsewhere(self):
+        """Commit a batch of CLOSED_DAY the way another process would."""
+        accumulator = RollupAccumulator()
+        accumulator.add(CLOSED_DAY, 9, "bob", "10.0.0.2", "http://b.com/", 200, 1, 1)
+        accumulator.flush(self.session)
+        self.session.commit()
+
+    def test_rows_of_another_version_are_recomputed(self):
+        self.lookup(ReportMetricsCache())
+        self._write_elsewhere()
+        # The batch leaves the row in place; its version no longer matches
+        self.assertEqual(self.session.query(ReportCache).count(), 1)
+        self.assertEqual(
+            self.lookup(ReportMetricsCache())["total_stats"], {"total_requests": 2}
+        )
+
+    def test_batch_committed_while_computing_is_not_hidden(self):
+        def compute():
+            metrics = self.compute()
+            self._write_elsewhere()
+            return metrics
+
+        ReportMetricsCache().get_or_compute(
+            self.session, "metrics", CLOSED_DAY, compute
+        )
+        self.assertEqual(
+            self.lookup(ReportMetricsCache())["total_stats"], {"total_requests": 2}
+        )
+
+    def test_today_expires_after_ttl(self):
+        cache = ReportMetricsCache(ttl=0)
+        self.lookup(cache, date.today())
+        self.lookup(cache, date.today())
+        self.assertEqual(self.computed, 2)
+        self.assertEqual(self.session.query(ReportCache).count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
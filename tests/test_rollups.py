@@ -0,0 +1,111 @@
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import (
+    ROLLUP_MODELS,
+    DomainDailyStats,
+    HourlyStats,
+    ReportCache,
+    UserDailyStats,
+    UserDirectory,
+)
+from database.rollups import RollupAccumulator
+from services.auditoria_service import get_all_usernames
+
+DAY = date(2024, 5, 1)
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        for model in (*ROLLUP_MODELS, ReportCache):
+            model.__table__.create(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _commit(self, accumulator):
+        accumulator.flush(self.session)
+        self.session.commit()
+        accumulator.committed()
+
+    def test_flushes_increment_existing_rows(self):
+        accumulator = RollupAccumulator()
+        accumulator.add(DAY, 10, "alice", "10.0.0.1", "http://a.com/x", 200, 1, 100)
+        accumulator.add(DAY, 10, "alice", "10.0.0.1", "http://a.com/y", 200, 1, 50)
+        self._commit(accumulator)
+        accumulator.add(DAY, 11, "alice", "10.0.0.1", "http://b.com/", 404, 1, 10)
+        self._commit(accumulator)
+
+        user = self.session.query(UserDailyStats).one()
+        self.assertEqual((user.request_count, user.data_transmitted), (3, 160))
+        domains = dict(
+            self.session.query(DomainDailyStats.domain, DomainDailyStats.request_count)
+        )
+        self.assertEqual(domains, {"a.com": 2, "b.com": 1})
+        hours = dict(self.session.query(HourlyStats.hour, HourlyStats.request_count))
+        self.assertEqual(hours, {10: 2, 11: 1})
+
+    def test_log_rows_count_stored_rows(self):
+        accumulator = RollupAccumulator()
+        accumulator.add(DAY, 10, "alice", "10.0.0.1", "http://a.com/", 200, 1, 1)
+        # Folded into the row the first line opened
+        accumulator.add(
+            DAY, 10, "alice", "10.0.0.1", "http://a.com/", 200, 1, 1, log_rows=0
+        )
+        self._commit(accumulator)
+        accumulator.add(DAY, 11, "alice", "10.0.0.1", "http://b.com/", 200, 1, 1)
+        self._commit(accumulator)
+
+        user = self.session.query(UserDailyStats).one()
+        self.assertEqual((user.request_count, user.log_rows), (3, 2))
+
+    def test_rolled_back_sums_are_written_again(self):
+        accumulator = RollupAccumulator()
+        accumulator.add(DAY, 10, "alice", "10.0.0.1", "http://a.com/", 200, 1, 100)
+        accumulator.flush(self.session)
+        self.session.rollback()
+
+        self._commit(accumulator)
+        self.assertEqual(self.session.query(UserDailyStats).one().request_count, 1)
+        self.assertFalse(accumulator.has_pending())
+
+    def test_user_directory_keeps_first_and_last_seen(self):
+        accumulator = RollupAccumulator()
+        for username, ip, hour in (
+            ("Alice", "10.0.0.2", 12),
+            ("Alice", "10.0.0.1", 9),
+            ("alan", "10.0.0.3", 10),
+            ("bob", "10.0.0.4", 10),
+        ):
+            seen_at = datetime(2024, 5, 1, hour)
+            accumulator.add(
+                DAY, hour, username, ip, "http://a.com/", 200, 1, 1, seen_at
+            )
+        self._commit(accumulator)
+        accumulator.add(DAY, 8, "Alice", "10.0.0.9", "http://a.com/", 200, 1, 1)
+        self._commit(accumulator)
+
+        alice = self.session.query(UserDirectory).filter_by(username="Alice").one()
+        self.assertEqual(alice.first_seen, datetime(2024, 5, 1, 8))
+        self.assertEqual(alice.last_seen, datetime(2024, 5, 1, 12))
+        self.assertEqual(alice.last_ip, "10.0.0.2")
+        self.assertEqual(get_all_usernames(self.session), ["alan", "Alice", "bob"])
+        self.assertEqual(get_all_usernames(self.session, "AL"), ["alan", "Alice"])
+        self.assertEqual(get_all_usernames(self.session, "ali", limit=1), ["Alice"])
+        self.assertEqual(get_all_usernames(self.session, "x"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database.database import configure_sqlite
+
+
+class TestSqliteSettings(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        url = f"sqlite:///{Path(workdir.name) / 'squidstats.db'}"
+        self.engine = create_engine(url)
+        self.read_engine = create_engine(url)
+        configure_sqlite(self.engine)
+        configure_sqlite(self.read_engine, read_only=True)
+        self.addCleanup(self.engine.dispose)
+        self.addCleanup(self.read_engine.dispose)
+
+    def test_writer_uses_wal(self):
+        with self.engine.connect() as conn:
+            mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        self.assertEqual(mode, "wal")
+
+    def test_read_engine_reads_but_never_writes(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER)"))
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+
+        with self.read_engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT id FROM t")).scalar(), 1)
+            with self.assertRaises(OperationalError):
+                conn.execute(text("INSERT INTO t VALUES (2)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+# add the parent directory to the system path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+
+from sqlalchemy import create_engine, event
+
+from database.catalog import TableCatalog
+from database.database import create_dynamic_tables
+
+
+class TestTableCatalog(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.addCleanup(self.engine.dispose)
+        self.statements = []
+        event.listen(
+            self.engine,
+            "before_cursor_execute",
+            lambda *args: self.statements.append(args[2]),
+        )
+
+    def test_lookups_do_not_query_the_database(self):
+        create_dynamic_tables(self.engine, "20240502")
+        catalog = TableCatalog(refresh_seconds=0)
+        self.assertTrue(catalog.has(self.engine, "log_20240502"))
+        self.statements.clear()
+
+        with self.engine.connect() as conn:
+            self.assertTrue(catalog.has(conn, "user_20240502"))
+        self.assertFalse(catalog.has(self.engine, "log_20240503"))
+        self.assertEqual(catalog.daily_suffixes(self.engine), ["20240502"])
+        self.assertEqual(self.statements, [])
+        self.assertEqual(catalog.loads, 1)
+
+        catalog.add(self.engine, "user_20240501", "log_20240501")
+        self.assertEqual(catalog.daily_suffixes(self.engine), ["20240501", "20240502"])
+
+        catalog.invalidate(self.engine)
+        self.assertEqual(catalog.daily_suffixes(self.engine), ["20240502"])
+        self.assertEqual(catalog.loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Suffix trie over host labels.
+
+Domains are stored label by label from the TLD down, so matching a host is
+one dictionary lookup per label whatever the number of configured domains.
+Hosts are given in the reversed ``domain_rev`` form (``com.facebook.www``).
+"""
+
+from utils.domains import normalize_domain
+
+_VALUE = None  # key of the value stored on a node; labels are never None
+
+
+class DomainMatcher:
+    def __init__(self, domains: dict[str, object] | None = None):
+        self.root: dict = {}
+        self.size = 0
+        for domain, value in (domains or {}).items():
+            self.add(domain, value)
+
+    def add(self, domain: str, value):
+        """Match ``domain`` and its subdomains to ``value``."""
+        host = normalize_domain(domain)
+        if not host:
+            return
+        node = self.root
+        for label in reversed(host.split(".")):
+            node = node.setdefault(label, {})
+        if _VALUE not in node:
+            self.size += 1
+        node[_VALUE] = value
+
+    def match(self, domain_rev: str):
+        """Value of the longest configured suffix of the host, or None."""
+        node = self.root
+        value = None
+        for label in domain_rev.split("."):
+            node = node.get(label)
+            if node is None:
+                break
+            if _VALUE in node:
+                value = node[_VALUE]
+        return value
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,49 @@
+"""Host normalization for logged URLs and index-friendly domain filters.
+
+Daily log tables store the host of every URL with its labels reversed
+(``www.facebook.com`` -> ``com.facebook.www``) in ``domain_rev``. A domain
+and all of its subdomains then form one contiguous range of that indexed
+column, so suffix lookups never need a leading-wildcard ``LIKE``.
+"""
+
+from functools import lru_cache
+
+from sqlalchemy import and_, or_
+
+
+@lru_cache(maxsize=65536)
+def url_host(url: str) -> str:
+    """Lower-cased host of a logged URL (``CONNECT host:443`` lines included)."""
+    host = url.split("//", 1)[-1].split("/", 1)[0]
+    host = host.rsplit("@", 1)[-1]
+    if host.startswith("["):
+        # IPv6 literal, keep the brackets out
+        host = host[1:].split("]", 1)[0]
+    else:
+        host = host.split(":", 1)[0]
+    return host.rstrip(".").lower()[:255]
+
+
+def reverse_host(host: str) -> str:
+    return ".".join(reversed(host.split(".")))
+
+
+@lru_cache(maxsize=65536)
+def url_domain_key(url: str) -> str:
+    """Value stored in ``domain_rev`` for ``url``."""
+    return reverse_host(url_host(url))
+
+
+def normalize_domain(domain: str) -> str:
+    """Host part of a configured domain (``*.example.com``, URLs and ports too)."""
+    domain = domain.strip().lower()
+    if domain.startswith("*."):
+        domain = domain[2:]
+    return url_host(domain).lstrip(".")
+
+
+def domain_filter(column, domain: str):
+    """Condition matching ``domain`` and its subdomains on a ``domain_rev`` column."""
+    key = reverse_host(normalize_domain(domain))
+    # "/" sorts right after ".", so the range holds exactly key + ".*"
+    return or_(column == key, and_(column > key + ".", column < key + "/"))